@@ -0,0 +1,292 @@
+from collections import OrderedDict
+from hashlib import sha1
+import logging
+from threading import Lock
+from time import monotonic
+
+from hnac.helpers import load_json_file, save_json_file
+
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache(object):
+    """Thread safe bounded cache that evicts the least recently used items"""
+
+    def __init__(self, max_size):
+        """Create a new LRUCache object
+
+        :param int max_size: the maximum number of items in the cache
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        """Get a cached value
+
+        :param object key: the key of the value
+        :param object default: the value to return if the key is not cached
+        :rtype: object
+        :return: the cached value
+        """
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._items.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key, value):
+        """Add a value to the cache
+
+        :param object key: the key of the value
+        :param object value: the value to cache
+        """
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def remove(self, key):
+        """Remove a value from the cache
+
+        :param object key: the key of the value to remove
+        """
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """Remove all the cached values"""
+        with self._lock:
+            self._items.clear()
+
+    def items(self):
+        """Get the cached items ordered from the least to the most recently
+        used
+
+        :rtype: list
+        :return: a list with the key and value tuples
+        """
+        with self._lock:
+            return list(self._items.items())
+
+
+class TTLCache(object):
+    """Thread safe bounded cache whose items expire after a fixed time"""
+
+    def __init__(self, max_size, ttl, clock=monotonic):
+        """Create a new TTLCache object
+
+        :param int max_size: the maximum number of items in the cache
+        :param float ttl: the number of seconds the items stay in the cache
+        :param callable clock: the function that returns the current time
+        """
+        self.ttl = ttl
+
+        self._items = LRUCache(max_size)
+        self._clock = clock
+
+    @property
+    def hits(self):
+        return self._items.hits
+
+    @property
+    def misses(self):
+        return self._items.misses
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        """Get a cached value that hasn't expired
+
+        :param object key: the key of the value
+        :param object default: the value to return if the key is not cached
+        :rtype: object
+        :return: the cached value
+        """
+        item = self._items.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if self._clock() >= expires_at:
+            self._items.remove(key)
+            return default
+
+        return value
+
+    def set(self, key, value):
+        """Add a value to the cache
+
+        :param object key: the key of the value
+        :param object value: the value to cache
+        """
+        self._items.set(key, (self._clock() + self.ttl, value))
+
+    def remove(self, key):
+        """Remove a value from the cache
+
+        :param object key: the key of the value to remove
+        """
+        self._items.remove(key)
+
+    def clear(self):
+        """Remove all the cached values"""
+        self._items.clear()
+
+
+class FingerprintCache(object):
+    """Cache with the fingerprints of the processed hackernews stories
+
+    The cache is used in order to detect the stories that haven't changed
+    since the last time they were processed.
+    """
+
+    def __init__(self, max_size=10000, filename=None):
+        """Create a new FingerprintCache object
+
+        :param int max_size: the maximum number of cached fingerprints
+        :param str filename: the file in which the fingerprints are persisted
+        """
+        self.filename = filename
+
+        self._fingerprints = LRUCache(max_size)
+        self._loaded = False
+
+    @staticmethod
+    def fingerprint(item):
+        """Calculate the fingerprint of a hackernews story
+
+        :param HackernewsStoryItem item: the story
+        :rtype: str
+        :return: the story fingerprint
+        """
+        content = "{}:{}:{}".format(item.score, item.descendants, item.title)
+
+        return sha1(content.encode("utf-8")).hexdigest()
+
+    def is_unchanged(self, item):
+        """Check if the story hasn't changed since it was last processed
+
+        :param HackernewsStoryItem item: the story
+        :rtype: bool
+        :return: True if the story hasn't changed
+        """
+        return self._fingerprints.get(item.id) == self.fingerprint(item)
+
+    def update(self, item):
+        """Save the fingerprint of a processed story
+
+        :param HackernewsStoryItem item: the story
+        """
+        self._fingerprints.set(item.id, self.fingerprint(item))
+
+    def remove(self, item):
+        """Forget the fingerprint of a story
+
+        :param HackernewsStoryItem item: the story
+        """
+        self._fingerprints.remove(item.id)
+
+    def load(self):
+        """Load the persisted fingerprints"""
+        if self._loaded or not self.filename:
+            return
+
+        fingerprints = load_json_file(self.filename, default=[])
+        for story_id, fingerprint in fingerprints:
+            self._fingerprints.set(story_id, fingerprint)
+
+        self._loaded = True
+        logger.info("loaded %d story fingerprints", len(self._fingerprints))
+
+    def save(self):
+        """Persist the fingerprints"""
+        if not self.filename:
+            return
+
+        save_json_file(self.filename, self._fingerprints.items())
+        logger.info("saved %d story fingerprints", len(self._fingerprints))
+
+
+class IdentityCache(object):
+    """Cache with the database ids of objects that have a unique key
+
+    The cache follows the database transactions. The ids that are added during
+    a transaction are only cached after the transaction has been committed.
+    The keys that were used in a transaction that was rolled back are removed
+    from the cache since their ids might no longer be valid.
+    """
+
+    def __init__(self, max_size):
+        """Create a new IdentityCache object
+
+        :param int max_size: the maximum number of cached ids
+        """
+        self._ids = LRUCache(max_size)
+        self._pending = {}
+        self._used_keys = set()
+
+    @property
+    def hits(self):
+        return self._ids.hits
+
+    @property
+    def misses(self):
+        return self._ids.misses
+
+    def get(self, key):
+        """Get the id of an object
+
+        :param object key: the object key
+        :rtype: int|None
+        :return: the object id or None if it is not cached
+        """
+        object_id = self._pending.get(key)
+        if object_id is not None:
+            return object_id
+
+        object_id = self._ids.get(key)
+        if object_id is not None:
+            self._used_keys.add(key)
+
+        return object_id
+
+    def add(self, key, object_id):
+        """Add the id of an object that was used in the current transaction
+
+        :param object key: the object key
+        :param int object_id: the object id
+        """
+        self._pending[key] = object_id
+
+    def commit(self):
+        """Cache the ids that were added in the committed transaction"""
+        for key, object_id in self._pending.items():
+            self._ids.set(key, object_id)
+
+        self._pending = {}
+        self._used_keys = set()
+
+    def rollback(self):
+        """Forget the ids that were used in the rolled back transaction"""
+        for key in self._used_keys:
+            self._ids.remove(key)
+
+        self._pending = {}
+        self._used_keys = set()
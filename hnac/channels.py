@@ -1,20 +1,223 @@
+from collections import OrderedDict
+import logging
+from time import monotonic
+
+from pika.spec import Basic, BasicProperties
+
+
+logger = logging.getLogger(__name__)
+
+
 class MessageChannel(object):
     """Message channel wrapper for rabbitmq's channels"""
 
-    def __init__(self, channel, exchange, routing_key):
+    def __init__(self, channel, exchange, routing_key, compressor=None):
         self._channel = channel
         self._exchange = exchange
         self._routing_key = routing_key
+        self._compressor = compressor
+
+    def _encode_message(self, message):
+        body = message.dumps()
+        content_encoding = None
+
+        if self._compressor is not None:
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+
+            if self._compressor.should_compress(body):
+                body = self._compressor.compress(body)
+                content_encoding = self._compressor.content_encoding
+
+        if message.content_type is None and content_encoding is None:
+            return body, None
+
+        properties = BasicProperties(
+            content_type=message.content_type,
+            content_encoding=content_encoding
+        )
+
+        return body, properties
 
     def publish_message(self, message):
         """Publish a message to the channel
 
         :param MessageBase message: the message to publish
         """
-        serialized_message = message.dumps()
+        body, properties = self._encode_message(message)
 
         self._channel.basic_publish(
             exchange=self._exchange,
-            routing_key=self._routing_key,
-            body=serialized_message
+            routing_key=message.routing_key or self._routing_key,
+            body=body,
+            properties=properties
+        )
+
+    def flush(self):
+        """Publish the messages that are waiting to be published"""
+        pass
+
+
+class ConfirmedMessageChannel(MessageChannel):
+    """Message channel that uses publisher confirms
+
+    The messages are published in batches without waiting for the broker to
+    confirm each one of them. The channel only blocks when the number of
+    unconfirmed messages exceeds the in flight window. The messages that the
+    broker rejected are kept in the nacked_messages list.
+    """
+
+    def __init__(self, channel, connection, exchange, routing_key,
+                 max_in_flight=1000, batch_size=50, compressor=None,
+                 confirm_callback=None):
+        """Create a new ConfirmedMessageChannel object
+
+        :param BlockingChannel channel: the pika channel
+        :param BlockingConnection connection: the pika connection
+        :param str exchange: the exchange to publish the messages
+        :param str routing_key: the routing key to use
+        :param int max_in_flight: the maximum number of unconfirmed messages
+        :param int batch_size: the number of messages to publish at once
+        :param Compressor compressor: the compressor of the message bodies
+        :param callable confirm_callback: the function that is called with
+            every message that the broker confirmed or rejected and a boolean
+            that is True if the message was rejected
+        """
+        super(ConfirmedMessageChannel, self).__init__(
+            channel, exchange, routing_key, compressor)
+
+        self._connection = connection
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.confirm_callback = confirm_callback
+
+        self.nacked_messages = []
+
+        self._batch = []
+        self._unconfirmed = OrderedDict()
+        self._delivery_tag = 0
+
+    def enable_confirms(self):
+        """Put the channel in confirm mode"""
+        confirm_select_ok = []
+
+        # the blocking channel waits for the confirmation of every message
+        # when confirms are enabled, so the asynchronous channel it wraps is
+        # used instead
+        self._channel._impl.confirm_delivery(
+            ack_nack_callback=self._on_delivery_confirmation,
+            callback=confirm_select_ok.append
         )
+
+        while not confirm_select_ok:
+            self._connection.process_data_events(time_limit=1)
+
+    @property
+    def unconfirmed_message_count(self):
+        return len(self._unconfirmed)
+
+    def _on_delivery_confirmation(self, method_frame):
+        method = method_frame.method
+
+        if method.multiple:
+            delivery_tags = [
+                delivery_tag
+                for delivery_tag in self._unconfirmed
+                if delivery_tag <= method.delivery_tag
+            ]
+        else:
+            delivery_tags = [method.delivery_tag]
+
+        nacked = isinstance(method, Basic.Nack)
+
+        for delivery_tag in delivery_tags:
+            message = self._unconfirmed.pop(delivery_tag, None)
+            if message is None:
+                continue
+
+            if nacked:
+                logger.warning(
+                    "message with delivery tag %s was rejected by the broker",
+                    delivery_tag
+                )
+                self.nacked_messages.append(message)
+
+            if self.confirm_callback is not None:
+                self.confirm_callback(message, nacked)
+
+    def _wait_for_confirms(self, max_unconfirmed, timeout=None):
+        started_at = monotonic()
+
+        while len(self._unconfirmed) > max_unconfirmed:
+            if timeout is not None and monotonic() - started_at >= timeout:
+                return False
+
+            self._connection.process_data_events(time_limit=0.1)
+
+        return True
+
+    def publish_message(self, message):
+        self._batch.append(message)
+
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        while self._batch:
+            message = self._batch[0]
+            body, properties = self._encode_message(message)
+
+            self._channel._impl.basic_publish(
+                exchange=self._exchange,
+                routing_key=message.routing_key or self._routing_key,
+                body=body,
+                properties=properties
+            )
+
+            self._batch.pop(0)
+            self._delivery_tag += 1
+            self._unconfirmed[self._delivery_tag] = message
+
+        # send the published messages and process any confirmations that have
+        # been received
+        self._connection.process_data_events(time_limit=0)
+
+        self._wait_for_confirms(self.max_in_flight)
+
+    def wait_for_confirms(self, timeout=None):
+        """Publish the waiting messages and wait for all of them to be
+        confirmed
+
+        :param float timeout: the maximum number of seconds to wait
+        :rtype: bool
+        :return: True if all the messages have been confirmed
+        """
+        self.flush()
+
+        return self._wait_for_confirms(0, timeout)
+
+    def pop_pending_messages(self):
+        """Get the messages that haven't been published or confirmed yet
+
+        The channel forgets about these messages.
+
+        :rtype: list[MessageBase]
+        :return: the pending messages in the order they were published
+        """
+        pending_messages = list(self._unconfirmed.values()) + self._batch
+
+        self._unconfirmed.clear()
+        self._batch = []
+
+        return pending_messages
+
+    def pop_nacked_messages(self):
+        """Get the messages that were rejected by the broker
+
+        :rtype: list[MessageBase]
+        :return: the rejected messages
+        """
+        nacked_messages = self.nacked_messages
+        self.nacked_messages = []
+
+        return nacked_messages
@@ -0,0 +1,49 @@
+import os
+
+from hnac.helpers import load_json_file, save_json_file
+
+
+class CheckpointStore(object):
+    """Store for the checkpoints of the crawl jobs
+
+    Every checkpoint is saved in a json file that is named after the job id.
+    """
+
+    def __init__(self, directory):
+        """Create a new CheckpointStore object
+
+        :param str directory: the directory of the checkpoint files
+        """
+        self.directory = directory
+
+    def _checkpoint_filename(self, job_id):
+        return os.path.join(self.directory, "{}.json".format(job_id))
+
+    def load(self, job_id):
+        """Load the checkpoint of a job
+
+        :param str job_id: the job id
+        :rtype: dict|None
+        :return: the checkpoint or None if the job doesn't have one
+        """
+        return load_json_file(self._checkpoint_filename(job_id))
+
+    def save(self, job_id, checkpoint):
+        """Save the checkpoint of a job
+
+        :param str job_id: the job id
+        :param dict checkpoint: the checkpoint
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        save_json_file(self._checkpoint_filename(job_id), checkpoint)
+
+    def delete(self, job_id):
+        """Delete the checkpoint of a job
+
+        :param str job_id: the job id
+        """
+        try:
+            os.remove(self._checkpoint_filename(job_id))
+        except FileNotFoundError:
+            pass
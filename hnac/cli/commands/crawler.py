@@ -1,10 +1,16 @@
+import asyncio
 import logging
+import signal
 
-from flask_script import Command
+from flask_script import Command, Option
 from flask import current_app
 from sqlalchemy.exc import SQLAlchemyError
 
-from hnac.crawlers import create_hackernews_api_crawler_job
+from hnac.cli.datatypes import job_id_string
+from hnac.crawlers import create_hackernews_api_crawler_job, create_processors
+from hnac.jobs import create_job_id
+from hnac.schedulers import IntervalScheduler
+from hnac.sources import create_backfill_source, create_source
 from hnac.web.database import db
 from hnac.models import Report
 
@@ -15,10 +21,41 @@ logger = logging.getLogger(__name__)
 class Crawl(Command):
     """Start the crawler"""
 
-    def _run_hackernews_crawl_job(self):
-        job = create_hackernews_api_crawler_job(current_app.config, db.session)
+    option_list = (
+        Option("action", nargs="?", default=None, choices=["backfill"],
+               help="backfill the stories in a range of item ids"),
+        Option("--from-id", dest="from_id", type=int, default=None,
+               help="the largest item id to backfill"),
+        Option("--to-id", dest="to_id", type=int, default=1,
+               help="the smallest item id to backfill"),
+        Option("--daemon", action="store_true", default=False,
+               help="run the crawl jobs repeatedly"),
+        Option("--interval", type=float, default=None,
+               help="the number of seconds between the daemon's jobs"),
+        Option("--jitter", type=float, default=None,
+               help="the maximum fraction of the interval to randomize"),
+        Option("--job-id", dest="job_id", type=job_id_string, default=None,
+               help="the id of an interrupted job to resume"),
+    )
+
+    def _run_hackernews_crawl_job(self, processors=None, source=None,
+                                  job_id=None, use_async=None):
+        if use_async is None:
+            use_async = current_app.config.get("CRAWLER_ASYNC", False)
+
+        # the processors might be executed on a different thread so they are
+        # given the session object itself instead of the thread local proxy
+        job = create_hackernews_api_crawler_job(
+            current_app.config, db.session(), processors, source, job_id)
         logger.info("running hackernews crawl job %s", job.id)
-        job_execution_result = job.run()
+
+        if use_async:
+            job_execution_result = asyncio.run(job.run_async())
+        else:
+            job_execution_result = job.run()
+
+        for name, value in job_execution_result.metrics.items():
+            logger.info("job %s metric %s=%s", job.id, name, value)
 
         Report.save_report(db.session, job_execution_result)
 
@@ -32,10 +69,92 @@ class Crawl(Command):
 
         logger.info("executed hackernews crawl job %s", job.id)
 
-    def run(self):
+    def _run_scheduled_crawl_job(self, processors, source, job_id=None):
+        try:
+            self._run_hackernews_crawl_job(processors, source, job_id)
+        except Exception:
+            db.session.rollback()
+            logger.exception("failed to execute hackernews crawl job")
+
+    def _run_daemon(self, interval, jitter, job_id=None):
+        config = current_app.config
+
+        # the processors and the source are reused by all the jobs so that
+        # their connections and caches stay warm between the runs
+        session = db.session()
+        processors = create_processors(config, session)
+        source = create_source(config, session)
+
+        scheduler = IntervalScheduler(interval, jitter)
+
+        def stop_scheduler(signum, frame):
+            logger.info("received signal %d, stopping the crawler", signum)
+            scheduler.stop()
+
+        previous_handlers = {
+            signum: signal.signal(signum, stop_scheduler)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        logger.info("starting crawler daemon with a %f seconds interval",
+                    interval)
+
+        # every job uses the same id so that a job that is interrupted is
+        # resumed from its checkpoint by the next one
+        if job_id is None:
+            job_id = create_job_id("daemon", config)
+
+        def run_job():
+            self._run_scheduled_crawl_job(processors, source, job_id)
+
+        try:
+            scheduler.run(run_job)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+            source.close()
+
+    def _run_backfill(self, from_id, to_id, job_id=None):
+        config = current_app.config
+
+        if not config.get("CRAWLER_CHECKPOINT_DIRECTORY"):
+            logger.warning("the backfill progress will not be saved since "
+                           "the checkpoint directory is not set")
+
+        source = create_backfill_source(config, from_id, to_id)
+
+        # running the same backfill again resumes it from its checkpoint
+        if job_id is None:
+            job_id = "backfill-{}-{}".format(from_id or "max", to_id)
+
+        # the backfill source fetches the items on its own worker threads
+        # and doesn't have an asynchronous implementation
+        try:
+            self._run_hackernews_crawl_job(
+                source=source, job_id=job_id, use_async=False)
+        finally:
+            source.close()
+
+    def run(self, action=None, from_id=None, to_id=1, daemon=False,
+            interval=None, jitter=None, job_id=None):
         """Start the crawler"""
+        if interval is None:
+            interval = current_app.config.get("CRAWLER_DAEMON_INTERVAL", 300.0)
+
+        if jitter is None:
+            jitter = current_app.config.get("CRAWLER_DAEMON_JITTER", 0.1)
+
         try:
-            self._run_hackernews_crawl_job()
+            if action == "backfill":
+                self._run_backfill(from_id, to_id, job_id)
+            elif daemon:
+                self._run_daemon(interval, jitter, job_id)
+            else:
+                if job_id is None:
+                    job_id = create_job_id("crawl", current_app.config)
+
+                self._run_hackernews_crawl_job(job_id=job_id)
         except (KeyboardInterrupt, SystemExit):
             db.session.rollback()
             logger.info("crawler stopped by user or system")
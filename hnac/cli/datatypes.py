@@ -1,8 +1,11 @@
+from argparse import ArgumentTypeError
 from datetime import datetime
 
 from dateutil.parser import parse as parse_date
 from dateutil.tz import tzutc
 
+from hnac.models import Report
+
 
 def date_string(value):
     if isinstance(value, datetime):
@@ -15,3 +18,13 @@ def date_string(value):
         dt = dt.astimezone(tz=tzutc())
 
     return dt
+
+
+def job_id_string(value):
+    max_length = Report.__table__.c.job_id.type.length
+    if len(value) > max_length:
+        raise ArgumentTypeError(
+            "the job id can't be longer than {} characters".format(
+                max_length))
+
+    return value
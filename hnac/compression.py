@@ -0,0 +1,138 @@
+from abc import ABCMeta, abstractmethod
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from hnac.exceptions import HnacError
+
+
+class CompressionError(HnacError):
+    pass
+
+
+class Compressor(metaclass=ABCMeta):
+    """Message body compressor base"""
+
+    content_encoding = None
+
+    def __init__(self, level=None, threshold=0):
+        """Create a new Compressor object
+
+        :param int level: the compression level
+        :param int threshold: the minimum size in bytes of the messages that
+            will be compressed
+        """
+        self.level = level
+        self.threshold = threshold
+
+    def should_compress(self, data):
+        """Check if the given data must be compressed
+
+        :param bytes data: the message body
+        :rtype: bool
+        :return: True if the data must be compressed
+        """
+        return len(data) >= self.threshold
+
+    @abstractmethod
+    def compress(self, data):
+        """Compress the message body
+
+        :param bytes data: the message body
+        :rtype: bytes
+        :return: the compressed message body
+        """
+        pass
+
+    @abstractmethod
+    def decompress(self, data):
+        """Decompress the message body
+
+        :param bytes data: the compressed message body
+        :rtype: bytes
+        :return: the message body
+        """
+        pass
+
+
+class ZlibCompressor(Compressor):
+    """Compressor that uses zlib"""
+
+    content_encoding = "deflate"
+
+    def compress(self, data):
+        level = self.level if self.level is not None else -1
+
+        return zlib.compress(data, level)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    """Compressor that uses zstandard"""
+
+    content_encoding = "zstd"
+
+    def __init__(self, level=None, threshold=0):
+        if zstandard is None:
+            raise CompressionError(
+                "zstandard is required for zstd compression")
+
+        super(ZstdCompressor, self).__init__(level, threshold)
+
+        level = self.level if self.level is not None else 3
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def decompress(self, data):
+        return self._decompressor.decompress(data)
+
+
+_COMPRESSORS = {
+    "zlib": ZlibCompressor,
+    "zstd": ZstdCompressor
+}
+
+
+def create_compressor(name, level=None, threshold=0):
+    """Create a message compressor
+
+    :param str name: the compression algorithm
+    :param int level: the compression level
+    :param int threshold: the minimum size in bytes of the messages that
+        will be compressed
+    :rtype: Compressor
+    :return: the compressor
+    """
+    try:
+        compressor_class = _COMPRESSORS[name]
+    except KeyError:
+        raise CompressionError("unknown compression {}".format(name))
+
+    return compressor_class(level=level, threshold=threshold)
+
+
+def decompress(data, content_encoding):
+    """Decompress a message body
+
+    :param bytes data: the message body
+    :param str content_encoding: the content encoding of the message
+    :rtype: bytes
+    :return: the decompressed message body
+    """
+    if content_encoding is None:
+        return data
+
+    for compressor_class in _COMPRESSORS.values():
+        if compressor_class.content_encoding == content_encoding:
+            return compressor_class().decompress(data)
+
+    raise CompressionError(
+        "unsupported content encoding {}".format(content_encoding))
@@ -16,9 +16,60 @@ SQLALCHEMY_DATABASE_URI = os.environ["SQLALCHEMY_DATABASE_URI"]
 CRAWLER_WAIT_TIME = float(os.getenv("CRAWLER_WAIT_TIME", 1.0))
 CRAWLER_BACKOFF_TIME = float(os.getenv("CRAWLER_BACKOFF_TIME", 1.0))
 CRAWLER_ABORT_AFTER = int(os.getenv("CRAWLER_ABORT_AFTER", 3))
+CRAWLER_WORKERS = int(os.getenv("CRAWLER_WORKERS", 1))
+CRAWLER_PRESERVE_ORDER = bool(
+    strtobool(os.getenv("CRAWLER_PRESERVE_ORDER", "True"))
+)
+CRAWLER_ASYNC = bool(strtobool(os.getenv("CRAWLER_ASYNC", "False")))
+CRAWLER_REQUEST_TIMEOUT = float(os.getenv("CRAWLER_REQUEST_TIMEOUT", 5.0))
+CRAWLER_POOL_SIZE = int(os.getenv("CRAWLER_POOL_SIZE", 10))
+CRAWLER_MAX_RETRIES = int(os.getenv("CRAWLER_MAX_RETRIES", 0))
+CRAWLER_BURST = int(os.getenv("CRAWLER_BURST", 1))
+CRAWLER_MAX_REQUESTS_PER_SECOND = float(
+    os.getenv("CRAWLER_MAX_REQUESTS_PER_SECOND", 5.0))
+CRAWLER_RATE_INCREASE = float(os.getenv("CRAWLER_RATE_INCREASE", 0.1))
+CRAWLER_RATE_DECREASE_FACTOR = float(
+    os.getenv("CRAWLER_RATE_DECREASE_FACTOR", 0.5))
+CRAWLER_MODE = os.getenv("CRAWLER_MODE", "newstories")
+CRAWLER_SHARD_INDEX = int(os.getenv("CRAWLER_SHARD_INDEX", 0))
+CRAWLER_SHARD_COUNT = int(os.getenv("CRAWLER_SHARD_COUNT", 1))
+CRAWLER_STATE_FILE = os.getenv("CRAWLER_STATE_FILE")
+CRAWLER_INCREMENTAL_MAX_ITEMS = int(
+    os.getenv("CRAWLER_INCREMENTAL_MAX_ITEMS", 1000))
+CRAWLER_FINGERPRINT_CACHE_SIZE = int(
+    os.getenv("CRAWLER_FINGERPRINT_CACHE_SIZE", 10000))
+CRAWLER_FINGERPRINT_CACHE_FILE = os.getenv("CRAWLER_FINGERPRINT_CACHE_FILE")
+CRAWLER_PRIORITY_MAX_STORIES = int(
+    os.getenv("CRAWLER_PRIORITY_MAX_STORIES", 500))
+CRAWLER_PRIORITY_MIN_INTERVAL = float(
+    os.getenv("CRAWLER_PRIORITY_MIN_INTERVAL", 300.0))
+CRAWLER_PRIORITY_MAX_INTERVAL = float(
+    os.getenv("CRAWLER_PRIORITY_MAX_INTERVAL", 21600.0))
+CRAWLER_PRIORITY_MAX_AGE = float(
+    os.getenv("CRAWLER_PRIORITY_MAX_AGE", 172800.0))
+CRAWLER_BACKFILL_WORKERS = int(os.getenv("CRAWLER_BACKFILL_WORKERS", 32))
+CRAWLER_BACKFILL_MAX_REQUESTS_PER_SECOND = float(
+    os.getenv("CRAWLER_BACKFILL_MAX_REQUESTS_PER_SECOND", 50.0))
+CRAWLER_CHECKPOINT_DIRECTORY = os.getenv("CRAWLER_CHECKPOINT_DIRECTORY")
+CRAWLER_CHECKPOINT_INTERVAL = int(
+    os.getenv("CRAWLER_CHECKPOINT_INTERVAL", 100))
+CRAWLER_DAEMON_INTERVAL = float(os.getenv("CRAWLER_DAEMON_INTERVAL", 300.0))
+CRAWLER_DAEMON_JITTER = float(os.getenv("CRAWLER_DAEMON_JITTER", 0.1))
+
+SQLALCHEMY_STORAGE_BATCH_SIZE = int(
+    os.getenv("SQLALCHEMY_STORAGE_BATCH_SIZE", 1))
+SQLALCHEMY_STORAGE_BATCH_TIMEOUT = float(
+    os.getenv("SQLALCHEMY_STORAGE_BATCH_TIMEOUT", 10.0))
+SQLALCHEMY_STORAGE_IDENTITY_CACHE_SIZE = int(
+    os.getenv("SQLALCHEMY_STORAGE_IDENTITY_CACHE_SIZE", 10000))
 
 API_HOST = os.getenv("API_HOST", "127.0.0.1")
 API_PORT = int(os.getenv("API_PORT", 5000))
+API_EXPORT_BATCH_SIZE = int(os.getenv("API_EXPORT_BATCH_SIZE", 1000))
+API_TOKEN_CACHE_SIZE = int(os.getenv("API_TOKEN_CACHE_SIZE", 10000))
+API_TOKEN_CACHE_TTL = float(os.getenv("API_TOKEN_CACHE_TTL", 30.0))
+API_TOKEN_CACHE_REVISION_CHECK_INTERVAL = float(
+    os.getenv("API_TOKEN_CACHE_REVISION_CHECK_INTERVAL", 2.0))
 
 PROPAGATE_EXCEPTIONS = bool(
     strtobool(os.getenv("PROPAGATE_EXCEPTIONS", "True"))
@@ -43,11 +94,50 @@ RABBITMQ_PROCESSOR_ROUTING_KEY = os.getenv(
     "RABBITMQ_PROCESSOR_ROUTING_KEY",
     "stories.new"
 )
+RABBITMQ_PROCESSOR_CONFIRM_DELIVERY = bool(
+    strtobool(os.getenv("RABBITMQ_PROCESSOR_CONFIRM_DELIVERY", "False"))
+)
+RABBITMQ_PROCESSOR_MAX_IN_FLIGHT = int(
+    os.getenv("RABBITMQ_PROCESSOR_MAX_IN_FLIGHT", 1000))
+RABBITMQ_PROCESSOR_PUBLISH_BATCH_SIZE = int(
+    os.getenv("RABBITMQ_PROCESSOR_PUBLISH_BATCH_SIZE", 50))
+RABBITMQ_PROCESSOR_CONFIRM_TIMEOUT = float(
+    os.getenv("RABBITMQ_PROCESSOR_CONFIRM_TIMEOUT", 30.0))
+RABBITMQ_PROCESSOR_SERIALIZER = os.getenv(
+    "RABBITMQ_PROCESSOR_SERIALIZER", "json")
+RABBITMQ_PROCESSOR_COMPRESSION = os.getenv("RABBITMQ_PROCESSOR_COMPRESSION")
+RABBITMQ_PROCESSOR_COMPRESSION_THRESHOLD = int(
+    os.getenv("RABBITMQ_PROCESSOR_COMPRESSION_THRESHOLD", 1024))
+RABBITMQ_PROCESSOR_COMPRESSION_LEVEL = (
+    int(os.getenv("RABBITMQ_PROCESSOR_COMPRESSION_LEVEL"))
+    if os.getenv("RABBITMQ_PROCESSOR_COMPRESSION_LEVEL") else None
+)
+RABBITMQ_PROCESSOR_BATCH_MAX_STORIES = int(
+    os.getenv("RABBITMQ_PROCESSOR_BATCH_MAX_STORIES", 1))
+RABBITMQ_PROCESSOR_BATCH_MAX_DELAY = float(
+    os.getenv("RABBITMQ_PROCESSOR_BATCH_MAX_DELAY", 1.0))
+RABBITMQ_PROCESSOR_BATCH_ROUTING_KEY = os.getenv(
+    "RABBITMQ_PROCESSOR_BATCH_ROUTING_KEY",
+    "stories.batch"
+)
+RABBITMQ_PROCESSOR_SPOOL_DIRECTORY = os.getenv(
+    "RABBITMQ_PROCESSOR_SPOOL_DIRECTORY")
+RABBITMQ_PROCESSOR_SPOOL_SEGMENT_SIZE = int(
+    os.getenv("RABBITMQ_PROCESSOR_SPOOL_SEGMENT_SIZE", 1000))
+RABBITMQ_PROCESSOR_SPOOL_DRAIN_INTERVAL = float(
+    os.getenv("RABBITMQ_PROCESSOR_SPOOL_DRAIN_INTERVAL", 5.0))
 
 PROCESSORS = []
 if RABBITMQ_PROCESSOR:
     PROCESSORS.append("hnac.processors.RabbitMQProcessor")
 
+PROCESSORS_PARALLEL = bool(
+    strtobool(os.getenv("PROCESSORS_PARALLEL", "False"))
+)
+PROCESSORS_QUEUE_SIZE = int(os.getenv("PROCESSORS_QUEUE_SIZE", 100))
+
+JOB_PIPELINE_BUFFER_SIZE = int(os.getenv("JOB_PIPELINE_BUFFER_SIZE", 0))
+
 STORY_DUMP_BATCH_SIZE = int(os.getenv("STORY_DUMP_BATCH_SIZE", 300))
 
 if not TESTING:
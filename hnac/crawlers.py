@@ -1,23 +1,41 @@
 import logging
 
+from hnac.caches import FingerprintCache
 from hnac.jobs import HackernewsCrawlJob
-from hnac.processors import SQLAlchemyStorage, Processors
+from hnac.sources import create_source
+from hnac.processors import (
+    SQLAlchemyStorage, Processors, ParallelProcessors
+)
 from hnac.utilities.modules import import_string
 
 
 logger = logging.getLogger(__name__)
 
 
-def create_hackernews_api_crawler_job(config, session):
-    """Create the job that will crawl hackernews
+def create_processors(config, session):
+    """Create the processors of the crawl jobs
 
-    :param dict config: the job configuration
+    :param dict config: the processor configuration
     :param Session session: the sqlalchemy Session object to use
-    :rtype: HackernewsCrawlJob
-    :return: the job object
+    :rtype: Processors
+    :return: the configured processors
     """
     logger.info("Initializing data processors")
-    processors = Processors()
+
+    fingerprint_cache = None
+    if config.get("CRAWLER_FINGERPRINT_CACHE_SIZE", 0) > 0:
+        fingerprint_cache = FingerprintCache(
+            max_size=config["CRAWLER_FINGERPRINT_CACHE_SIZE"],
+            filename=config.get("CRAWLER_FINGERPRINT_CACHE_FILE")
+        )
+
+    if config.get("PROCESSORS_PARALLEL", False):
+        processors = ParallelProcessors(
+            fingerprint_cache=fingerprint_cache,
+            queue_size=config.get("PROCESSORS_QUEUE_SIZE", 100)
+        )
+    else:
+        processors = Processors(fingerprint_cache=fingerprint_cache)
     processors.add(SQLAlchemyStorage(session))
     processors.add_multiple([
         import_string(processor)() for processor in config["PROCESSORS"]
@@ -26,7 +44,31 @@ def create_hackernews_api_crawler_job(config, session):
 
     logger.info("Data processors initialized")
 
-    job = HackernewsCrawlJob(config, processors)
+    return processors
+
+
+def create_hackernews_api_crawler_job(config, session, processors=None,
+                                      source=None, job_id=None):
+    """Create the job that will crawl hackernews
+
+    :param dict config: the job configuration
+    :param Session session: the sqlalchemy Session object to use
+    :param Processors processors: the processors to use. New processors are
+        created if this is None
+    :param Source source: the source to use. A new source is created if this
+        is None
+    :param str job_id: the job id. The job resumes from the checkpoint of a
+        previous job with the same id if there is one
+    :rtype: HackernewsCrawlJob
+    :return: the job object
+    """
+    if processors is None:
+        processors = create_processors(config, session)
+
+    if source is None:
+        source = create_source(config, session)
+
+    job = HackernewsCrawlJob(config, processors, source, job_id)
     logger.info("Created job with id %s", job.id)
 
     return job
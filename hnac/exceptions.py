@@ -35,3 +35,11 @@ class InvalidQueryParsingOperation(QueryParsingError):
             "invalid query operation {}".format(operation))
 
         self.operation = operation
+
+
+class InvalidCursor(QueryParsingError):
+    def __init__(self, cursor=None):
+        super(InvalidCursor, self).__init__(
+            "invalid pagination cursor {}".format(cursor))
+
+        self.cursor = cursor
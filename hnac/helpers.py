@@ -1,5 +1,7 @@
 import sys
+import os
 import contextlib
+import json
 from datetime import datetime
 
 
@@ -23,3 +25,37 @@ def current_date():
 
 def current_date_with_timedelta(timedelta):
     return current_date() - timedelta
+
+
+def load_json_file(filename, default=None):
+    """Load the contents of a json file
+
+    :param str filename: the file to load
+    :param object default: the value to return if the file doesn't exist
+    :rtype: object
+    :return: the file contents
+    """
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def save_json_file(filename, data):
+    """Save the given data to a json file
+
+    The data are written to a temporary file which then replaces the target
+    file so that the file is never left half written.
+
+    :param str filename: the file to save the data to
+    :param object data: the data to save
+    """
+    temporary_filename = "{}.tmp".format(filename)
+
+    with open(temporary_filename, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temporary_filename, filename)
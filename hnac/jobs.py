@@ -1,37 +1,81 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from uuid import uuid4
+from queue import Queue, Full
+from threading import Thread, Event
+from time import monotonic
 from datetime import datetime
 
-from hnac.sources import HackernewsStories, SourceError
+from hnac.checkpoints import CheckpointStore
+from hnac.sources import create_source, SourceError
 from hnac.exceptions import JobExecutionError
 
 
 logger = logging.getLogger(__name__)
 
 
+def create_job_id(mode, config):
+    """Create the default id of the crawl jobs that run in the given mode
+
+    The id only depends on the mode and the shard of the crawler, so a job
+    that is interrupted is resumed from its checkpoint by the next job of
+    the same mode and shard.
+
+    :param str mode: the crawl mode
+    :param dict config: the crawler configuration
+    :rtype: str
+    :return: the job id
+    """
+    return "{}-{}-{}".format(
+        mode,
+        config.get("CRAWLER_SHARD_INDEX", 0),
+        config.get("CRAWLER_SHARD_COUNT", 1)
+    )
+
+
 class JobExecutionResult(object):
     def __init__(self, job, start_time, end_time, processed_item_count,
-                 failed):
+                 failed, metrics=None):
         self.job = job
         self.start_time = start_time
         self.end_time = end_time
         self.processed_item_count = processed_item_count
         self.failed = failed
+        self.metrics = metrics or {}
 
 
 class Job(object):
     """Crawl job base class"""
 
-    def __init__(self, source, processors):
+    _END = object()
+
+    def __init__(self, source, processors, buffer_size=0, job_id=None,
+                 checkpoint_store=None, checkpoint_interval=100):
         """Create a new Job object
 
         :param Source source: the hackernews source object to use
         :param Processors processors: the hackernews item processors
+        :param int buffer_size: the number of items the source can retrieve
+            ahead of the processors. The items are retrieved and processed
+            on the same thread when this is 0
+        :param str job_id: the job id. The id is "job" if this is None
+        :param CheckpointStore checkpoint_store: the store in which the crawl
+            position is saved. A job that is started with the id of a job
+            that didn't finish resumes from the saved position
+        :param int checkpoint_interval: the number of processed items between
+            the checkpoints
         """
         self._source = source
         self._processors = processors
+        self.buffer_size = buffer_size
+        self.checkpoint_interval = checkpoint_interval
+
+        self._checkpoint_store = checkpoint_store
 
-        self.id = uuid4().hex
+        self.id = job_id or "job"
+
+        self._fetch_blocked_time = 0.0
+        self._process_blocked_time = 0.0
 
     def _notify_job_started(self):
         self._source.job_started(self)
@@ -41,13 +85,171 @@ class Job(object):
         self._source.job_finished(self)
         self._processors.job_finished(self)
 
+    def _collect_metrics(self):
+        metrics = {}
+        metrics.update(self._source.metrics())
+        metrics.update(self._processors.metrics())
+
+        if self.buffer_size > 0:
+            metrics["pipeline_fetch_blocked_time"] = self._fetch_blocked_time
+            metrics["pipeline_process_blocked_time"] = \
+                self._process_blocked_time
+
+        return metrics
+
+    def _checkpoint_due(self, item_count):
+        return (
+            self._checkpoint_store is not None and
+            item_count % self.checkpoint_interval == 0
+        )
+
+    def _save_checkpoint(self, checkpoint):
+        if checkpoint is None:
+            return
+
+        # the items before the checkpoint might still be waiting in the
+        # processor queues or batches and they would be skipped if the job
+        # was resumed from the checkpoint before they were processed
+        self._processors.flush()
+
+        try:
+            self._checkpoint_store.save(self.id, checkpoint)
+        except Exception:
+            logger.exception("failed to save checkpoint for job %s", self.id)
+
+    def _restore_checkpoint(self):
+        if self._checkpoint_store is None:
+            return
+
+        checkpoint = self._checkpoint_store.load(self.id)
+        if checkpoint is not None:
+            logger.info("resuming job %s from checkpoint", self.id)
+            self._source.restore(checkpoint)
+
+    def _delete_checkpoint(self):
+        if self._checkpoint_store is not None:
+            self._checkpoint_store.delete(self.id)
+
+    def _put_in_buffer(self, buffer, entry, stop):
+        started_at = monotonic()
+
+        try:
+            while not stop.is_set():
+                try:
+                    buffer.put(entry, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+
+            return False
+        finally:
+            self._fetch_blocked_time += monotonic() - started_at
+
+    def _produce_items(self, buffer, stop):
+        items = None
+
+        try:
+            items = iter(self._source.items())
+            for item_count, item in enumerate(items, start=1):
+                # the checkpoint is taken when the item is retrieved since
+                # the source might have moved further ahead by the time the
+                # item is processed
+                checkpoint = None
+                if self._checkpoint_due(item_count):
+                    checkpoint = self._source.checkpoint()
+
+                entry = (item, None, checkpoint)
+                if not self._put_in_buffer(buffer, entry, stop):
+                    break
+        except Exception as e:
+            self._put_in_buffer(buffer, (None, e, None), stop)
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+
+            self._put_in_buffer(buffer, self._END, stop)
+
+    def _retrieve_and_process_buffered_items(self):
+        buffer = Queue(maxsize=self.buffer_size)
+        stop = Event()
+
+        producer = Thread(
+            target=self._produce_items,
+            args=(buffer, stop),
+            name="job-{}-source".format(self.id),
+            daemon=True
+        )
+        producer.start()
+
+        processed_item_count = 0
+
+        try:
+            while True:
+                started_at = monotonic()
+                entry = buffer.get()
+                self._process_blocked_time += monotonic() - started_at
+
+                if entry is self._END:
+                    break
+
+                item, error, checkpoint = entry
+                if isinstance(error, SourceError):
+                    logger.info(
+                        "an error occurred while retrieving hackernews "
+                        "stories")
+                    raise JobExecutionError(
+                        "failed to retrieve items") from error
+                elif error is not None:
+                    raise error
+
+                self._processors.process_item(self._source, item)
+                processed_item_count += 1
+
+                if checkpoint is not None:
+                    self._save_checkpoint(checkpoint)
+        finally:
+            stop.set()
+            producer.join()
+
+        return processed_item_count
+
     def _retrieve_and_process_items(self):
+        if self.buffer_size > 0:
+            return self._retrieve_and_process_buffered_items()
+
         processed_item_count = 0
 
         try:
             for item in self._source.items():
                 self._processors.process_item(self._source, item)
                 processed_item_count += 1
+
+                if self._checkpoint_due(processed_item_count):
+                    self._save_checkpoint(self._source.checkpoint())
+        except SourceError as e:
+            logger.info(
+                "an error occurred while retrieving hackernews stories")
+            raise JobExecutionError("failed to retrieve items") from e
+
+        return processed_item_count
+
+    async def _retrieve_and_process_items_async(self, executor):
+        loop = asyncio.get_event_loop()
+        processed_item_count = 0
+
+        try:
+            async for item in self._source.items():
+                await loop.run_in_executor(
+                    executor, self._processors.process_item, self._source,
+                    item
+                )
+                processed_item_count += 1
+
+                if self._checkpoint_due(processed_item_count):
+                    await loop.run_in_executor(
+                        executor, self._save_checkpoint,
+                        self._source.checkpoint()
+                    )
         except SourceError as e:
             logger.info(
                 "an error occurred while retrieving hackernews stories")
@@ -60,6 +262,7 @@ class Job(object):
         logger.info("starting job with id %s", self.id)
 
         start_time = datetime.utcnow()
+        self._restore_checkpoint()
         self._notify_job_started()
 
         failed = False
@@ -76,6 +279,63 @@ class Job(object):
         finally:
             self._notify_job_finished()
 
+        if not failed:
+            self._delete_checkpoint()
+
+        logger.info("Finished executing job with id %s", self.id)
+
+        end_time = datetime.utcnow()
+        return JobExecutionResult(
+            job=self,
+            start_time=start_time,
+            end_time=end_time,
+            processed_item_count=processed_item_count,
+            failed=failed,
+            metrics=self._collect_metrics()
+        )
+
+    async def run_async(self):
+        """Start the job on the running asyncio event loop
+
+        The source must return an async generator from its items method. The
+        processors are executed on a separate thread so that they don't block
+        the event loop.
+        """
+        logger.info("starting job with id %s", self.id)
+
+        loop = asyncio.get_event_loop()
+
+        # all the processor calls are made from the same thread since
+        # processors like the RabbitMQ processor are not thread safe
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        start_time = datetime.utcnow()
+        self._restore_checkpoint()
+        self._source.job_started(self)
+        await loop.run_in_executor(
+            executor, self._processors.job_started, self)
+
+        failed = False
+        processed_item_count = 0
+        try:
+            processed_item_count = \
+                await self._retrieve_and_process_items_async(executor)
+        except JobExecutionError:
+            logger.info("Failed to execute job with id %s", self.id)
+            failed = True
+        except Exception:
+            logger.exception(
+                "failed to retrieve and process items for job %s", self.id)
+            failed = True
+        finally:
+            self._source.job_finished(self)
+            await loop.run_in_executor(
+                executor, self._processors.job_finished, self)
+            executor.shutdown()
+
+        if not failed:
+            self._delete_checkpoint()
+
         logger.info("Finished executing job with id %s", self.id)
 
         end_time = datetime.utcnow()
@@ -84,20 +344,37 @@ class Job(object):
             start_time=start_time,
             end_time=end_time,
             processed_item_count=processed_item_count,
-            failed=failed
+            failed=failed,
+            metrics=self._collect_metrics()
         )
 
 
 class HackernewsCrawlJob(Job):
     """Hackaernews crawl job"""
 
-    def __init__(self, config, processors):
+    def __init__(self, config, processors, source=None, job_id=None):
         """Create a new HackernewsCrawlJob object
 
         :param dict config: the job configuration
         :param Processors processors: the hackernews item processors
+        :param Source source: the source to use. A new source is created
+            from the configuration if this is None
+        :param str job_id: the job id. The id is derived from the crawler
+            shard if this is None
         """
-        source = HackernewsStories()
-        source.configure(config)
+        if source is None:
+            source = create_source(config)
+
+        checkpoint_store = None
+        if config.get("CRAWLER_CHECKPOINT_DIRECTORY"):
+            checkpoint_store = CheckpointStore(
+                config["CRAWLER_CHECKPOINT_DIRECTORY"])
 
-        super(HackernewsCrawlJob, self).__init__(source, processors)
+        super(HackernewsCrawlJob, self).__init__(
+            source=source,
+            processors=processors,
+            buffer_size=config.get("JOB_PIPELINE_BUFFER_SIZE", 0),
+            job_id=job_id or create_job_id("crawl", config),
+            checkpoint_store=checkpoint_store,
+            checkpoint_interval=config.get("CRAWLER_CHECKPOINT_INTERVAL", 100)
+        )
@@ -0,0 +1,117 @@
+import logging
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep
+
+
+logger = logging.getLogger(__name__)
+
+
+def add_jitter(value, jitter):
+    """Randomize the given value by up to the given fraction
+
+    :param float value: the value to randomize
+    :param float jitter: the maximum fraction of the value to add or remove
+    :rtype: float
+    :return: the randomized value
+    """
+    return value * uniform(1.0 - jitter, 1.0 + jitter)
+
+
+class AdaptiveRateLimiter(object):
+    """Token bucket rate limiter with an adaptive rate
+
+    The rate is increased additively after every successful request and it is
+    decreased multiplicatively after every failed request. The limiter is
+    thread safe so that it can be shared by multiple workers.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=None, max_rate=None,
+                 increase=0.1, decrease_factor=0.5, jitter=0.1):
+        """Create a new AdaptiveRateLimiter object
+
+        :param float rate: the initial number of requests per second
+        :param int burst: the maximum number of requests that can be executed
+            without waiting
+        :param float min_rate: the minimum number of requests per second
+        :param float max_rate: the maximum number of requests per second
+        :param float increase: the requests per second to add after every
+            successful request
+        :param float decrease_factor: the factor with which the rate is
+            multiplied after a failed request
+        :param float jitter: the fraction of randomness to add to the rate
+            decrease
+        """
+        self.burst = burst
+        self.min_rate = min_rate if min_rate is not None else min(rate, 0.1)
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.jitter = jitter
+
+        self._rate = rate
+        self._tokens = float(burst)
+        self._last_update = monotonic()
+        self._lock = Lock()
+
+    @property
+    def rate(self):
+        """The current number of requests per second
+
+        :rtype: float
+        :return: the current rate
+        """
+        return self._rate
+
+    def _refill(self, now):
+        elapsed = now - self._last_update
+        self._last_update = now
+
+        self._tokens = min(self.burst, self._tokens + elapsed * self._rate)
+
+    def reserve(self):
+        """Reserve a token for a request
+
+        :rtype: float
+        :return: the number of seconds to wait before executing the request
+        """
+        with self._lock:
+            self._refill(monotonic())
+
+            # the balance is allowed to become negative. Every worker then
+            # waits for the tokens that have been reserved before it
+            self._tokens -= 1.0
+
+            if self._tokens >= 0.0:
+                return 0.0
+
+            return -self._tokens / self._rate
+
+    def acquire(self):
+        """Wait until a request can be executed"""
+        wait_time = self.reserve()
+
+        if wait_time > 0.0:
+            logger.info("sleeping due to throttling for %f seconds", wait_time)
+            sleep(wait_time)
+
+    def on_success(self):
+        """Signal the rate limiter that a request was successful"""
+        with self._lock:
+            self._refill(monotonic())
+            self._rate = min(self.max_rate, self._rate + self.increase)
+
+    def on_failure(self):
+        """Signal the rate limiter that a request failed due to overloading"""
+        with self._lock:
+            self._refill(monotonic())
+
+            decrease_factor = min(
+                add_jitter(self.decrease_factor, self.jitter), 1.0)
+            self._rate = max(self.min_rate, self._rate * decrease_factor)
+
+            # don't allow a burst of requests right after a failure
+            self._tokens = min(self._tokens, 0.0)
+
+        logger.info("request rate decreased to %f requests per second",
+                    self._rate)
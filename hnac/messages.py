@@ -1,12 +1,22 @@
 from abc import ABCMeta, abstractmethod
-import json
 
 import arrow
 
+from hnac.serializers import JsonSerializer
+
+
+_default_serializer = JsonSerializer()
+
 
 class MessageBase(metaclass=ABCMeta):
     """RabbitMQ message base"""
 
+    # the routing key to use instead of the publisher's default one
+    routing_key = None
+
+    # the mime type of the serialized message
+    content_type = None
+
     @abstractmethod
     def dumps(self):
         """Dump the mesage into a string
@@ -17,9 +27,40 @@ class MessageBase(metaclass=ABCMeta):
         pass
 
 
+class RawMessage(MessageBase):
+    """Message with an already serialized body"""
+
+    def __init__(self, body, routing_key=None, content_type=None):
+        """Create a new RawMessage object
+
+        :param str|bytes body: the serialized message
+        :param str routing_key: the routing key of the message
+        :param str content_type: the mime type of the message
+        """
+        self.body = body
+        self.routing_key = routing_key
+        self.content_type = content_type
+
+    def dumps(self):
+        return self.body
+
+
 class JsonDocumentMessageBase(MessageBase, metaclass=ABCMeta):
     """JSON based message"""
 
+    def __init__(self, serializer=None):
+        """Create a new JsonDocumentMessageBase object
+
+        :param Serializer serializer: the serializer to use
+        """
+        self.serializer = serializer or _default_serializer
+
+        self._serialized_message = None
+
+    @property
+    def content_type(self):
+        return self.serializer.content_type
+
     @abstractmethod
     def to_json(self):
         """Dump the message into json compatible dictionary
@@ -30,26 +71,88 @@ class JsonDocumentMessageBase(MessageBase, metaclass=ABCMeta):
         pass
 
     def dumps(self):
-        json_data = self.to_json()
-        return json.dumps(json_data)
+        # the message might be published more than once, for example when it
+        # is spooled, so it is only serialized once
+        if self._serialized_message is None:
+            json_data = self.to_json()
+            self._serialized_message = self.serializer.dumps(json_data)
+
+        return self._serialized_message
 
 
 class StoryDocumentMessage(JsonDocumentMessageBase):
     """Hackernews story document message"""
 
-    def __init__(self, story):
+    source = "hackernews-api"
+
+    # the fields that are the same in every story message
+    envelope = {
+        "type": "story",
+        "meta": {
+            "source": source,
+            "retrieved_by": "hnac"
+        }
+    }
+
+    def __init__(self, story, serializer=None, created_at=None):
+        """Create a new StoryDocumentMessage object
+
+        :param dict story: the serialized story
+        :param Serializer serializer: the serializer to use
+        :param arrow.Arrow created_at: the message creation time
+        """
+        super(StoryDocumentMessage, self).__init__(serializer)
+
         self.story = story
-        self.source = "hackernews-api"
-        self.created_at = arrow.utcnow()
+        self.created_at = created_at or arrow.utcnow()
 
     def to_json(self):
-        return {
-            "type": "story",
-            "data": self.story,
-            "created_at": self.created_at.format('YYYY-MM-DD HH:mm:ss ZZ'),
-            "created_at_timestamp": self.created_at.timestamp,
-            "meta": {
-                "source": self.source,
-                "retrieved_by": "hnac"
-            }
+        message = dict(self.envelope)
+
+        message["data"] = self.story
+        message["created_at"] = self.created_at.format(
+            'YYYY-MM-DD HH:mm:ss ZZ')
+        message["created_at_timestamp"] = self.created_at.timestamp
+
+        return message
+
+
+class StoryBatchMessage(JsonDocumentMessageBase):
+    """Message with a batch of hackernews story documents"""
+
+    source = "hackernews-api"
+
+    # the fields that are the same in every story batch message
+    envelope = {
+        "type": "story_batch",
+        "meta": {
+            "source": source,
+            "retrieved_by": "hnac"
         }
+    }
+
+    def __init__(self, stories, serializer=None, created_at=None,
+                 routing_key=None):
+        """Create a new StoryBatchMessage object
+
+        :param list[dict] stories: the serialized stories
+        :param Serializer serializer: the serializer to use
+        :param arrow.Arrow created_at: the message creation time
+        :param str routing_key: the routing key of the message
+        """
+        super(StoryBatchMessage, self).__init__(serializer)
+
+        self.stories = stories
+        self.created_at = created_at or arrow.utcnow()
+        self.routing_key = routing_key
+
+    def to_json(self):
+        message = dict(self.envelope)
+
+        message["data"] = self.stories
+        message["count"] = len(self.stories)
+        message["created_at"] = self.created_at.format(
+            'YYYY-MM-DD HH:mm:ss ZZ')
+        message["created_at_timestamp"] = self.created_at.timestamp
+
+        return message
@@ -2,6 +2,7 @@ from datetime import datetime
 from uuid import uuid4
 from collections import namedtuple
 
+from sqlalchemy.dialects import postgresql
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from flask_uauth.mixins import TokenMixin
@@ -11,6 +12,40 @@ from hnac.web.queries import operations
 from hnac.exceptions import UnsupportedSearchOperation
 
 
+def is_postgresql(session):
+    """Check if the session is connected to a PostgreSQL database
+
+    :param Session session: the sqlalchemy session
+    :rtype: bool
+    :return: True if the database is PostgreSQL
+    """
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def insert_ignoring_conflicts(session, table, rows, index_elements):
+    """Insert multiple rows using a single multi row INSERT statement
+
+    On PostgreSQL the rows that violate a unique constraint are ignored using
+    INSERT ... ON CONFLICT DO NOTHING.
+
+    :param Session session: the sqlalchemy session
+    :param Table table: the table to insert the rows into
+    :param list[dict] rows: the rows to insert
+    :param list[str] index_elements: the columns of the unique constraint
+    """
+    if not rows:
+        return
+
+    if is_postgresql(session):
+        statement = postgresql.insert(table).values(rows)
+        statement = statement.on_conflict_do_nothing(
+            index_elements=index_elements)
+    else:
+        statement = table.insert().values(rows)
+
+    session.execute(statement)
+
+
 class User(db.Model, UserMixin):
     __tablename__ = "users"
 
@@ -109,6 +144,55 @@ class Token(db.Model, TokenMixin):
         session.delete(self)
 
 
+class TokenRevision(db.Model):
+    """The revision of the tokens
+
+    The revision is incremented every time that a token is created, modified
+    or deleted so that every process that caches the tokens can detect the
+    changes.
+    """
+
+    __tablename__ = "token_revisions"
+
+    _row_id = 1
+
+    id = db.Column(db.Integer, nullable=False, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False)
+
+    @classmethod
+    def get(cls, session):
+        """Get the current revision of the tokens
+
+        :param Session session: the sqlalchemy session
+        :rtype: int
+        :return: the revision
+        """
+        revision = session.query(cls.revision)\
+                          .filter_by(id=cls._row_id)\
+                          .scalar()
+
+        return revision or 0
+
+    @classmethod
+    def increment(cls, connection):
+        """Increment the revision of the tokens
+
+        :param Connection connection: the connection of the transaction that
+            modified the tokens
+        """
+        table = cls.__table__
+
+        result = connection.execute(
+            table.update()
+                 .where(table.c.id == cls._row_id)
+                 .values(revision=table.c.revision + 1)
+        )
+
+        if result.rowcount == 0:
+            connection.execute(
+                table.insert().values(id=cls._row_id, revision=1))
+
+
 class Report(db.Model):
     __tablename__ = "reports"
 
@@ -173,6 +257,37 @@ class HackernewsUser(db.Model):
 
         return user
 
+    @classmethod
+    def get_ids_by_usernames(cls, session, usernames):
+        rows = session.query(cls.username, cls.id)\
+                      .filter(cls.username.in_(usernames))\
+                      .all()
+
+        return dict(rows)
+
+    @classmethod
+    def get_or_create_ids_by_usernames(cls, session, usernames):
+        usernames = set(usernames)
+        user_ids = cls.get_ids_by_usernames(session, usernames)
+
+        missing_usernames = usernames - user_ids.keys()
+        if missing_usernames:
+            created_at = datetime.utcnow()
+            insert_ignoring_conflicts(
+                session=session,
+                table=cls.__table__,
+                rows=[
+                    {"username": username, "created_at": created_at}
+                    for username in missing_usernames
+                ],
+                index_elements=["username"]
+            )
+
+            user_ids.update(
+                cls.get_ids_by_usernames(session, missing_usernames))
+
+        return user_ids
+
 
 class Url(db.Model):
     __tablename__ = "urls"
@@ -195,8 +310,25 @@ class Url(db.Model):
         return url_object
 
     @classmethod
-    def get_by_url(cls, session, url):
-        return session.query(cls).filter_by(url=url).one_or_none()
+    def get_by_url(cls, session, url, load_stories=False):
+        """Get a url
+
+        :param Session session: the sqlalchemy session
+        :param str url: the url
+        :param bool load_stories: load the stories of the url along with their
+            users using a constant number of queries
+        :rtype: Url|None
+        :return: the url or None if it doesn't exist
+        """
+        query_object = session.query(cls).filter_by(url=url)
+
+        if load_stories:
+            query_object = query_object.options(
+                db.selectinload(cls.stories)
+                  .joinedload(Story.hackernews_user)
+            )
+
+        return query_object.one_or_none()
 
     @classmethod
     def get_or_create_by_url(cls, session, url):
@@ -207,9 +339,45 @@ class Url(db.Model):
 
         return url_object
 
+    @classmethod
+    def get_ids_by_urls(cls, session, urls):
+        rows = session.query(cls.url, cls.id)\
+                      .filter(cls.url.in_(urls))\
+                      .all()
+
+        return dict(rows)
+
+    @classmethod
+    def get_or_create_ids_by_urls(cls, session, urls):
+        urls = set(urls)
+        url_ids = cls.get_ids_by_urls(session, urls)
+
+        missing_urls = urls - url_ids.keys()
+        if missing_urls:
+            created_at = datetime.utcnow()
+            insert_ignoring_conflicts(
+                session=session,
+                table=cls.__table__,
+                rows=[
+                    {"url": url, "created_at": created_at}
+                    for url in missing_urls
+                ],
+                index_elements=["url"]
+            )
+
+            url_ids.update(cls.get_ids_by_urls(session, missing_urls))
+
+        return url_ids
+
 
 class Story(db.Model):
     __tablename__ = "stories"
+    __table_args__ = (
+        # the keyset pagination orders the stories by these columns and uses
+        # the id to break the ties
+        db.Index("ix_stories_score_id", "score", "id"),
+        db.Index("ix_stories_time_id", "time", "id"),
+    )
 
     id = db.Column(db.Integer, nullable=False, primary_key=True)
     story_id = db.Column(db.Integer, nullable=False, unique=True)
@@ -232,8 +400,8 @@ class Story(db.Model):
         nullable=False
     )
     title = db.Column(db.String(512), nullable=False)
-    score = db.Column(db.Integer, nullable=False, index=True)
-    time = db.Column(db.Integer, nullable=False, index=True)
+    score = db.Column(db.Integer, nullable=False)
+    time = db.Column(db.Integer, nullable=False)
     descendants = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime(timezone=False), nullable=False)
     updated_at = db.Column(db.DateTime(timezone=False), nullable=False)
@@ -244,13 +412,11 @@ class Story(db.Model):
 
     @classmethod
     def create(cls, session, user, url, story_id, title, score, time,
-               descendants):
+               descendants, hackernews_user_id=None, url_id=None):
 
         created_at = datetime.utcnow()
 
         story = cls(
-            hackernews_user=user,
-            url=url,
             story_id=story_id,
             title=title,
             score=score,
@@ -260,6 +426,18 @@ class Story(db.Model):
             updated_at=created_at
         )
 
+        # the user and the url can also be set using their ids when the
+        # objects themselves haven't been loaded
+        if user is not None:
+            story.hackernews_user = user
+        else:
+            story.hackernews_user_id = hackernews_user_id
+
+        if url is not None:
+            story.url = url
+        else:
+            story.url_id = url_id
+
         session.add(story)
 
         return story
@@ -268,30 +446,167 @@ class Story(db.Model):
     def get_by_story_id(cls, session, story_id):
         return session.query(cls).filter_by(story_id=story_id).one_or_none()
 
+    @classmethod
+    def get_ids_by_story_ids(cls, session, story_ids):
+        rows = session.query(cls.story_id, cls.id)\
+                      .filter(cls.story_id.in_(story_ids))\
+                      .all()
+
+        return dict(rows)
+
+    @classmethod
+    def upsert_many(cls, session, stories):
+        """Create or update multiple stories
+
+        The existing stories only have their score and descendants updated.
+        On PostgreSQL this is done with a single INSERT ... ON CONFLICT DO
+        UPDATE statement.
+
+        :param Session session: the sqlalchemy session
+        :param list[dict] stories: the story data. Every dictionary must
+            contain the story_id, hackernews_user_id, url_id, title, score,
+            time and descendants keys
+        :rtype: dict
+        :return: the mapping of the hackernews story ids to the story ids
+        """
+        # a statement can't update the same row twice
+        stories = {story["story_id"]: story for story in stories}
+        if not stories:
+            return {}
+
+        now = datetime.utcnow()
+
+        if is_postgresql(session):
+            return cls._upsert_many_on_conflict(session, stories, now)
+
+        story_ids = cls.get_ids_by_story_ids(session, stories.keys())
+
+        session.bulk_update_mappings(cls, [
+            {
+                "id": story_ids[story_id],
+                "score": story["score"],
+                "descendants": story["descendants"],
+                "updated_at": now
+            }
+            for story_id, story in stories.items()
+            if story_id in story_ids
+        ])
+
+        missing_story_ids = stories.keys() - story_ids.keys()
+        if missing_story_ids:
+            insert_ignoring_conflicts(
+                session=session,
+                table=cls.__table__,
+                rows=[
+                    dict(stories[story_id], created_at=now, updated_at=now)
+                    for story_id in missing_story_ids
+                ],
+                index_elements=["story_id"]
+            )
+
+            story_ids.update(
+                cls.get_ids_by_story_ids(session, missing_story_ids))
+
+        return story_ids
+
+    @classmethod
+    def _upsert_many_on_conflict(cls, session, stories, now):
+        table = cls.__table__
+
+        statement = postgresql.insert(table).values([
+            dict(story, created_at=now, updated_at=now)
+            for story in stories.values()
+        ])
+
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.story_id],
+            set_={
+                "score": statement.excluded.score,
+                "descendants": statement.excluded.descendants,
+                "updated_at": statement.excluded.updated_at
+            }
+        ).returning(table.c.story_id, table.c.id)
+
+        return dict(session.execute(statement).fetchall())
+
     @classmethod
     def count(cls, session):
         return session.query(cls).count()
 
+    @classmethod
+    def query_with_relations(cls, session):
+        """Create a story query that loads the url and the user of every
+        story in the same statement
+
+        :param Session session: the sqlalchemy session
+        :rtype: Query
+        :return: the story query
+        """
+        return session.query(cls).options(
+            db.joinedload(cls.url),
+            db.joinedload(cls.hackernews_user)
+        )
+
     @classmethod
     def get_latest(cls, session, count=20):
-        return session.query(cls).order_by(db.desc(cls.time)).limit(count)
+        return cls.query_with_relations(session) \
+                  .order_by(db.desc(cls.time)) \
+                  .limit(count)
 
     @classmethod
-    def get_stories(cls, session, offset=0, limit=500, order_by=None,
-                    sort_desc=False):
-        order_by = order_by or cls.id
+    def _paginate(cls, query_object, offset, limit, order_by, sort_desc,
+                  after):
+        order_by = order_by if order_by is not None else cls.id
+
+        if after is not None:
+            after_value, after_id = after
+
+            if order_by is cls.id:
+                keys, after_keys = cls.id, after_id
+            else:
+                keys = db.tuple_(order_by, cls.id)
+                after_keys = db.tuple_(after_value, after_id)
+
+            if sort_desc:
+                query_object = query_object.filter(keys < after_keys)
+            else:
+                query_object = query_object.filter(keys > after_keys)
+
+        order_columns = [order_by]
+        if order_by is not cls.id:
+            order_columns.append(cls.id)
+
         if sort_desc:
-            order_by = db.desc(order_by)
+            order_columns = [db.desc(column) for column in order_columns]
 
-        return session.query(cls) \
-                      .order_by(order_by) \
-                      .offset(offset) \
-                      .limit(limit) \
-                      .all()
+        return query_object.order_by(*order_columns) \
+                           .offset(offset) \
+                           .limit(limit) \
+                           .all()
 
     @classmethod
-    def search(cls, session, criteria, offset=0, limit=500, order_by=None,
-               sort_desc=False):
+    def get_stories(cls, session, offset=0, limit=500, order_by=None,
+                    sort_desc=False, after=None):
+        """Get a page of stories
+
+        :param Session session: the sqlalchemy session
+        :param int offset: the number of stories to skip
+        :param int limit: the maximum number of stories to return
+        :param Column order_by: the column to order the stories by
+        :param bool sort_desc: sort the stories in descending order
+        :param tuple after: the value of the ordering column and the id of
+            the last story of the previous page. Only the stories that come
+            after it are returned
+        :rtype: list[Story]
+        :return: the stories
+        """
+        return cls._paginate(
+            cls.query_with_relations(session),
+            offset, limit, order_by, sort_desc, after
+        )
+
+    @classmethod
+    def _search_query(cls, session, criteria):
         supported_operations = [
             operations.EQ, operations.LT, operations.LTE, operations.GT,
             operations.GTE
@@ -305,9 +620,14 @@ class Story(db.Model):
             "time": Story.time
         }
 
+        # the joins used for the filtering also populate the relationships
         query_object = session.query(Story)
         query_object = query_object.join(HackernewsUser)
         query_object = query_object.join(Url)
+        query_object = query_object.options(
+            db.contains_eager(Story.hackernews_user),
+            db.contains_eager(Story.url)
+        )
 
         for variable, operation, value in criteria:
             if (operation not in supported_operations or
@@ -319,19 +639,45 @@ class Story(db.Model):
             query_object = query_object.filter(
                 operations.OPERATIONS[operation](field, value))
 
-        order_by = order_by or Story.id
+        return query_object
+
+    @classmethod
+    def search(cls, session, criteria, offset=0, limit=500, order_by=None,
+               sort_desc=False, after=None):
+        return cls._paginate(
+            cls._search_query(session, criteria),
+            offset, limit, order_by, sort_desc, after
+        )
+
+    @classmethod
+    def yield_search_results(cls, session, criteria, order_by=None,
+                             sort_desc=False, items_per_batch=1000):
+        """Iterate over all the stories that match the search criteria
+
+        The stories are fetched in batches using a server side cursor so the
+        memory usage doesn't depend on the number of results. The criteria
+        are validated when this method is called, before any story is
+        retrieved.
+
+        :param Session session: the sqlalchemy session
+        :param list[tuple] criteria: the search criteria
+        :param Column order_by: the column to order the stories by
+        :param bool sort_desc: sort the stories in descending order
+        :param int items_per_batch: the number of stories to fetch at once
+        :rtype: Query
+        :return: the stories query
+        """
+        order_by = order_by if order_by is not None else cls.id
         if sort_desc:
             order_by = db.desc(order_by)
 
-        query_object = query_object.order_by(order_by)
-        query_object = query_object.limit(limit)
-        query_object = query_object.offset(offset)
-
-        return query_object.all()
+        return cls._search_query(session, criteria) \
+                  .order_by(order_by) \
+                  .yield_per(items_per_batch)
 
     @classmethod
     def yield_in_period(cls, session, from_date, to_date, items_per_batch=300):
-        return session.query(cls).filter(
+        return cls.query_with_relations(session).filter(
             cls.time >= from_date.timestamp(),
             cls.time < to_date.timestamp()
         ).order_by(cls.time).yield_per(items_per_batch)
@@ -374,6 +720,75 @@ class StoryData(db.Model):
 
         return story_data
 
+    @classmethod
+    def create_many(cls, session, story_data):
+        """Save multiple story data objects using a single statement
+
+        :param Session session: the sqlalchemy session
+        :param list[tuple] story_data: tuples with the story id and the
+            hackernews item data
+        """
+        downloaded_at = datetime.utcnow()
+
+        rows = [
+            {
+                "hackernews_id": data["id"],
+                "story_id": story_id,
+                "downloaded_at": downloaded_at,
+                "data": data
+            }
+            for story_id, data in story_data
+        ]
+
+        if rows:
+            session.execute(cls.__table__.insert().values(rows))
+
+    @classmethod
+    def yield_observations(cls, session, since, per_story=2,
+                           batch_size=1000):
+        """Get the latest observations of the stories that were downloaded
+        after the given date
+
+        Only the fields of the hackernews item data that are needed in order
+        to schedule the stories are loaded.
+
+        :param Session session: the sqlalchemy session
+        :param datetime since: the earliest download date
+        :param int per_story: the maximum number of observations to load for
+            every story
+        :param int batch_size: the number of rows to load at once
+        :rtype: Iterable
+        :return: a generator that returns tuples with the hackernews id,
+            the download date, the story creation time, the score and the
+            number of comments ordered by the download date
+        """
+        observation_number = db.func.row_number().over(
+            partition_by=cls.hackernews_id,
+            order_by=cls.downloaded_at.desc()
+        )
+
+        observations = session.query(
+            cls.hackernews_id.label("hackernews_id"),
+            cls.downloaded_at.label("downloaded_at"),
+            cls.data["time"].as_integer().label("time"),
+            cls.data["score"].as_integer().label("score"),
+            cls.data["descendants"].as_integer().label("descendants"),
+            observation_number.label("observation_number")
+        ).filter(cls.downloaded_at >= since).subquery()
+
+        query = session.query(
+            observations.c.hackernews_id,
+            observations.c.downloaded_at,
+            observations.c.time,
+            observations.c.score,
+            observations.c.descendants
+        )
+
+        query = query.filter(observations.c.observation_number <= per_story)\
+                     .order_by(observations.c.downloaded_at)
+
+        return query.yield_per(batch_size)
+
 
 HackernewsStoryItem = namedtuple(
     "HackernewsStoryItem",
@@ -1,35 +1,84 @@
 from abc import ABCMeta, abstractmethod
 import logging
 from datetime import datetime
+from queue import Empty, Queue
+from threading import Event, Thread, Lock
+from time import monotonic
 
 from sqlalchemy.exc import SQLAlchemyError
 from marshmallow.exceptions import ValidationError
 
+from hnac.caches import IdentityCache
+from hnac.compression import create_compressor
 from hnac.schemas import HackernewsStorySchema
 from hnac.models import (
     HackernewsUser, Url, Story, HackernewsStoryItem, StoryData
 )
-from hnac.queues import create_publisher
+from hnac.queues import create_publisher, SpooledPublisher
 from hnac.exceptions import ItemProcessingError
-from hnac.messages import StoryDocumentMessage
+from hnac.messages import StoryBatchMessage, StoryDocumentMessage
+from hnac.serializers import create_serializer
+from hnac.spool import MessageSpool
 
 
 logger = logging.getLogger(__name__)
 
 
+# returned by the processors that finish processing an item later, for
+# example when the item is saved as part of a batch
+DEFERRED = object()
+
+
 class Processor(object):
     """Base processor object"""
 
     __metaclass__ = ABCMeta
 
+    _completion_callback = None
+
     @abstractmethod
     def process_item(self, source, item):
         """Process the given item
 
+        The processors that don't finish processing the item before
+        returning must return DEFERRED and report the result later with
+        items_completed.
+
         :param Source source: the source that generated the object
         :param dict item: the hackernews item
-        :rtype: boolean
-        :return: True if the item has been processed without errors
+        :rtype: object
+        :return: DEFERRED if the item will be completed later
+        """
+        pass
+
+    def set_completion_callback(self, callback):
+        """Set the function that receives the results of the deferred items
+
+        :param callable callback: the function that is called with the
+            completed items and a flag that is True if they failed
+        """
+        self._completion_callback = callback
+
+    def items_completed(self, items, failed):
+        """Report the result of items whose processing was deferred
+
+        :param list[HackernewsStoryItem] items: the completed items
+        :param bool failed: True if the processor failed to process them
+        """
+        if self._completion_callback is not None:
+            self._completion_callback(items, failed)
+
+    def flush(self):
+        """Finish processing the items whose processing was deferred"""
+        pass
+
+    def tick(self):
+        """Finish processing the deferred items that have waited too long
+
+        This is called from the thread that processes the items when an item
+        is skipped and, when the processors run in parallel, while the
+        processor is idle, so that a batch doesn't wait for the next item
+        that is given to the processor.
         """
         pass
 
@@ -54,6 +103,14 @@ class Processor(object):
         """
         pass
 
+    def metrics(self):
+        """Get the metrics of the processor
+
+        :rtype: dict
+        :return: the metric values
+        """
+        return {}
+
 
 class DummyProcessor(Processor):
     def process_item(self, source, item):
@@ -63,12 +120,51 @@ class DummyProcessor(Processor):
 class SQLAlchemyStorage(Processor):
     """Save the hackernews stories to a database using sqlalchemy"""
 
-    def __init__(self, session):
+    def __init__(self, session, batch_size=1, batch_timeout=None,
+                 identity_cache_size=10000):
         """Create a new SQLAlchemyStorage object
 
         :param Session session: the sqlalchemy Session object to use
+        :param int batch_size: the number of stories to save at once. The
+            stories are saved one at a time when this is 1
+        :param float batch_timeout: the maximum number of seconds a story can
+            wait in the batch before it is saved
+        :param int identity_cache_size: the maximum number of user and url
+            ids to cache
         """
         self._session = session
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+
+        self._batch = []
+        self._batch_started_at = None
+
+        self._user_ids = IdentityCache(identity_cache_size)
+        self._url_ids = IdentityCache(identity_cache_size)
+        self._created_objects = []
+
+    def configure(self, config):
+        if "SQLALCHEMY_STORAGE_BATCH_SIZE" in config:
+            self.batch_size = config["SQLALCHEMY_STORAGE_BATCH_SIZE"]
+
+        if "SQLALCHEMY_STORAGE_BATCH_TIMEOUT" in config:
+            self.batch_timeout = config["SQLALCHEMY_STORAGE_BATCH_TIMEOUT"]
+
+        if "SQLALCHEMY_STORAGE_IDENTITY_CACHE_SIZE" in config:
+            cache_size = config["SQLALCHEMY_STORAGE_IDENTITY_CACHE_SIZE"]
+            self._user_ids = IdentityCache(cache_size)
+            self._url_ids = IdentityCache(cache_size)
+
+    def metrics(self):
+        return {
+            "storage_user_cache_hits": self._user_ids.hits,
+            "storage_user_cache_misses": self._user_ids.misses,
+            "storage_url_cache_hits": self._url_ids.hits,
+            "storage_url_cache_misses": self._url_ids.misses
+        }
+
+    def job_finished(self, job):
+        self.flush()
 
     def _create_story(self, story_data):
         story_id = story_data.id
@@ -76,17 +172,29 @@ class SQLAlchemyStorage(Processor):
         logger.info("creating story object with story id %s", story_id)
 
         username = story_data.by
-        user = HackernewsUser.get_or_create_by_username(
-            session=self._session,
-            username=username
-        )
+        user = None
+        user_id = self._user_ids.get(username)
+        if user_id is None:
+            user = HackernewsUser.get_or_create_by_username(
+                session=self._session,
+                username=username
+            )
+            self._created_objects.append((self._user_ids, username, user))
 
-        url_object = Url.get_or_create_by_url(self._session, story_data.url)
+        url_object = None
+        url_id = self._url_ids.get(story_data.url)
+        if url_id is None:
+            url_object = Url.get_or_create_by_url(
+                self._session, story_data.url)
+            self._created_objects.append(
+                (self._url_ids, story_data.url, url_object))
 
         story = Story.create(
             session=self._session,
             url=url_object,
             user=user,
+            hackernews_user_id=user_id,
+            url_id=url_id,
             story_id=story_id,
             title=story_data.title,
             score=story_data.score,
@@ -115,11 +223,139 @@ class SQLAlchemyStorage(Processor):
             story=story
         )
 
+    def _get_or_create_ids(self, cache, get_or_create_ids, keys):
+        ids = {}
+        missing_keys = set()
+
+        for key in set(keys):
+            object_id = cache.get(key)
+            if object_id is None:
+                missing_keys.add(key)
+            else:
+                ids[key] = object_id
+
+        if missing_keys:
+            created_ids = get_or_create_ids(self._session, missing_keys)
+            for key, object_id in created_ids.items():
+                cache.add(key, object_id)
+
+            ids.update(created_ids)
+
+        return ids
+
+    def _commit(self):
+        # the ids of the new objects are only available after a flush
+        self._session.flush()
+        for cache, key, model_object in self._created_objects:
+            cache.add(key, model_object.id)
+        self._created_objects = []
+
+        self._session.commit()
+
+        self._user_ids.commit()
+        self._url_ids.commit()
+
+    def _rollback(self):
+        self._session.rollback()
+
+        self._created_objects = []
+        self._user_ids.rollback()
+        self._url_ids.rollback()
+
+    def _save_batch(self, items):
+        user_ids = self._get_or_create_ids(
+            self._user_ids,
+            HackernewsUser.get_or_create_ids_by_usernames,
+            [item.by for item in items]
+        )
+        url_ids = self._get_or_create_ids(
+            self._url_ids,
+            Url.get_or_create_ids_by_urls,
+            [item.url for item in items]
+        )
+
+        story_ids = Story.upsert_many(
+            session=self._session,
+            stories=[
+                {
+                    "story_id": item.id,
+                    "hackernews_user_id": user_ids[item.by],
+                    "url_id": url_ids[item.url],
+                    "title": item.title,
+                    "score": item.score,
+                    "time": item.time,
+                    "descendants": item.descendants
+                }
+                for item in items
+            ]
+        )
+
+        StoryData.create_many(
+            session=self._session,
+            story_data=[
+                (story_ids[item.id], item.raw_data)
+                for item in items
+            ]
+        )
+
+    def flush(self):
+        """Save the stories that are waiting in the batch
+
+        The result of every story of the batch is reported with
+        items_completed.
+        """
+        if not self._batch:
+            return
+
+        items = self._batch
+        self._batch = []
+        self._batch_started_at = None
+
+        logger.info("saving a batch of %d stories", len(items))
+
+        try:
+            self._save_batch(items)
+            self._commit()
+        except SQLAlchemyError:
+            self._rollback()
+            logger.exception(
+                "failed to save the stories with story ids %s",
+                [item.id for item in items]
+            )
+
+            self.items_completed(items, failed=True)
+            return
+
+        self.items_completed(items, failed=False)
+
+    def _batch_expired(self):
+        return (
+            self.batch_timeout is not None and
+            monotonic() - self._batch_started_at >= self.batch_timeout
+        )
+
+    def _add_to_batch(self, item):
+        if not self._batch:
+            self._batch_started_at = monotonic()
+
+        self._batch.append(item)
+
+        if len(self._batch) >= self.batch_size or self._batch_expired():
+            self.flush()
+
+    def tick(self):
+        if self._batch and self._batch_expired():
+            self.flush()
+
     def process_item(self, source, item):
         if not isinstance(item, HackernewsStoryItem):
             logger.info("item is not a story object")
             return
 
+        if self.batch_size > 1:
+            self._add_to_batch(item)
+            return DEFERRED
+
         story_id = item.id
         logger.info("processing story with id %s", story_id)
         story = Story.get_by_story_id(self._session, story_id)
@@ -132,10 +368,10 @@ class SQLAlchemyStorage(Processor):
         # it is not the most optimal thing to save the story items one at a
         # time. However for the moment it will do.
         try:
-            self._session.commit()
-            logger.info("processed story with id %s", story.story_id)
+            self._commit()
+            logger.info("processed story with id %s", story_id)
         except SQLAlchemyError:
-            self._session.rollback()
+            self._rollback()
             logger.exception("failed to save story with story id %s", story_id)
 
             raise ItemProcessingError("failed to save story to database")
@@ -143,18 +379,60 @@ class SQLAlchemyStorage(Processor):
 
 class RabbitMQProcessor(Processor):
     """Processor that publishes the hackernews stories to a RabbitMQ server"""
-    def __init__(self):
+    def __init__(self, batch_max_stories=1, batch_max_delay=None,
+                 batch_routing_key="stories.batch"):
+        """Create a new RabbitMQProcessor object
+
+        :param int batch_max_stories: the maximum number of stories to
+            publish in a single batch message. The stories are published in
+            separate messages if this is 1
+        :param float batch_max_delay: the maximum number of seconds a story
+            can wait in the batch before it is published
+        :param str batch_routing_key: the routing key of the batch messages
+        """
+        self.batch_max_stories = batch_max_stories
+        self.batch_max_delay = batch_max_delay
+        self.batch_routing_key = batch_routing_key
+
         self._publisher = None
+        self._schema = HackernewsStorySchema()
+        self._serializer = None
+        self._confirm_delivery = False
+
+        self._batch = []
+        self._batch_started_at = None
+
+        # the stories of the published messages that haven't been confirmed
+        # yet, keyed by the id of the message
+        self._unconfirmed_items = {}
 
     def configure(self, config):
         logger.info("Configuring RabbitMQStoryProcessor")
 
+        if "RABBITMQ_PROCESSOR_BATCH_MAX_STORIES" in config:
+            self.batch_max_stories = \
+                config["RABBITMQ_PROCESSOR_BATCH_MAX_STORIES"]
+
+        if "RABBITMQ_PROCESSOR_BATCH_MAX_DELAY" in config:
+            self.batch_max_delay = config["RABBITMQ_PROCESSOR_BATCH_MAX_DELAY"]
+
+        if "RABBITMQ_PROCESSOR_BATCH_ROUTING_KEY" in config:
+            self.batch_routing_key = \
+                config["RABBITMQ_PROCESSOR_BATCH_ROUTING_KEY"]
+
+        self._serializer = create_serializer(
+            config.get("RABBITMQ_PROCESSOR_SERIALIZER", "json"))
+
         if self._publisher is not None:
             try:
                 self._publisher.close()
             except Exception:
                 logger.exception("failed to disconnect from RabbitMQ")
 
+            self._fail_unconfirmed_items()
+
+        self._confirm_delivery = config.get(
+            "RABBITMQ_PROCESSOR_CONFIRM_DELIVERY", False)
         self._publisher = self._create_publisher(config)
 
     def job_started(self, job):
@@ -166,6 +444,8 @@ class RabbitMQProcessor(Processor):
             logger.exception("failed to connect to RabbitMQ")
 
     def job_finished(self, job):
+        self._publish_batch()
+
         logger.info("disconnecting from RabbitMQ")
 
         try:
@@ -173,27 +453,89 @@ class RabbitMQProcessor(Processor):
         except Exception:
             logger.exception("failed to disconnect from RabbitMQ")
 
-    def _create_publisher(self, config):
+        self._fail_unconfirmed_items()
+
+    def metrics(self):
+        if self._publisher is None:
+            return {}
+
+        metrics = {
+            "rabbitmq_nacked_messages": self._publisher.nacked_message_count,
+            "rabbitmq_unconfirmed_messages":
+                self._publisher.unconfirmed_message_count
+        }
+
+        if isinstance(self._publisher, SpooledPublisher):
+            metrics["rabbitmq_spooled_messages"] = \
+                self._publisher.spooled_message_count
+            metrics["rabbitmq_drained_messages"] = \
+                self._publisher.drained_message_count
+
+        return metrics
+
+    def _create_compressor(self, config):
+        compression = config.get("RABBITMQ_PROCESSOR_COMPRESSION")
+        if not compression:
+            return None
+
+        return create_compressor(
+            compression,
+            level=config.get("RABBITMQ_PROCESSOR_COMPRESSION_LEVEL"),
+            threshold=config.get(
+                "RABBITMQ_PROCESSOR_COMPRESSION_THRESHOLD", 1024)
+        )
+
+    def _create_rabbitmq_publisher(self, config, confirm_callback=None):
         return create_publisher(
             parameters_url=config["RABBITMQ_PROCESSOR"],
             exchange=config["RABBITMQ_PROCESSOR_EXCHANGE"],
             routing_key=config["RABBITMQ_PROCESSOR_ROUTING_KEY"],
             exchange_type=config["RABBITMQ_PROCESSOR_EXCHANGE_TYPE"],
             durable=config["RABBITMQ_PROCESSOR_EXCHANGE_DURABLE"],
-            auto_delete=config["RABBITMQ_PROCESSOR_EXCHANGE_AUTO_DELETE"]
+            auto_delete=config["RABBITMQ_PROCESSOR_EXCHANGE_AUTO_DELETE"],
+            confirm_delivery=config.get(
+                "RABBITMQ_PROCESSOR_CONFIRM_DELIVERY", False),
+            max_in_flight=config.get("RABBITMQ_PROCESSOR_MAX_IN_FLIGHT", 1000),
+            publish_batch_size=config.get(
+                "RABBITMQ_PROCESSOR_PUBLISH_BATCH_SIZE", 50),
+            confirm_timeout=config.get(
+                "RABBITMQ_PROCESSOR_CONFIRM_TIMEOUT", 30.0),
+            compressor=self._create_compressor(config),
+            confirm_callback=confirm_callback
         )
 
-    def _create_message(self, item):
-        if not isinstance(item, HackernewsStoryItem):
-            logger.info("item is not a story object")
-            return
+    def _create_publisher(self, config):
+        publisher = self._create_rabbitmq_publisher(
+            config, confirm_callback=self._message_confirmed)
+
+        spool_directory = config.get("RABBITMQ_PROCESSOR_SPOOL_DIRECTORY")
+        if not spool_directory:
+            return publisher
 
-        logger.info("publishing story with id %s", item.id)
+        spool = MessageSpool(
+            directory=spool_directory,
+            segment_size=config.get(
+                "RABBITMQ_PROCESSOR_SPOOL_SEGMENT_SIZE", 1000)
+        )
 
-        schema = HackernewsStorySchema()
+        # the spooled messages are published by a background thread that
+        # uses its own connection
+        return SpooledPublisher(
+            publisher=publisher,
+            drain_publisher=self._create_rabbitmq_publisher(config),
+            spool=spool,
+            drain_interval=config.get(
+                "RABBITMQ_PROCESSOR_SPOOL_DRAIN_INTERVAL", 5.0),
+            confirm_callback=self._message_confirmed
+        )
+
+    def _serialize_story(self, item):
+        if not isinstance(item, HackernewsStoryItem):
+            logger.info("item is not a story object")
+            return None
 
         try:
-            serialized_story = schema.dump(item)
+            return self._schema.dump(item)
         except ValidationError as e:
             logger.warning(
                 "failed to serialize story: errors(%s)",
@@ -202,7 +544,99 @@ class RabbitMQProcessor(Processor):
 
             raise ItemProcessingError("failed to serialize story data")
 
-        return StoryDocumentMessage(story=serialized_story)
+    def flush(self):
+        self._publish_batch()
+
+        if self._publisher is not None:
+            self._publisher.flush()
+
+    def _batch_expired(self):
+        return (
+            self.batch_max_delay is not None and
+            monotonic() - self._batch_started_at >= self.batch_max_delay
+        )
+
+    def tick(self):
+        if self._batch and self._batch_expired():
+            self._publish_batch()
+
+    def _message_confirmed(self, message, failed):
+        _, items = self._unconfirmed_items.pop(id(message), (None, None))
+        if items is None:
+            return
+
+        if failed:
+            logger.warning(
+                "the stories with story ids %s were not confirmed by the "
+                "broker",
+                [item.id for item in items]
+            )
+
+        self.items_completed(items, failed)
+
+    def _fail_unconfirmed_items(self):
+        unconfirmed_items = list(self._unconfirmed_items.values())
+        self._unconfirmed_items = {}
+
+        for _, items in unconfirmed_items:
+            self.items_completed(items, failed=True)
+
+    def _publish(self, message, items):
+        """Publish a message
+
+        When publisher confirms are used the stories of the message are
+        reported as processed once the broker confirms or rejects it.
+
+        :param MessageBase message: the message to publish
+        :param list[HackernewsStoryItem] items: the stories of the message
+        :rtype: object
+        :return: DEFERRED if the message is waiting to be confirmed
+        """
+        if not self._confirm_delivery:
+            self._publisher.publish_message(message)
+            return None
+
+        # the message can be confirmed before publish_message returns
+        self._unconfirmed_items[id(message)] = (message, items)
+
+        try:
+            self._publisher.publish_message(message)
+        except Exception:
+            self._unconfirmed_items.pop(id(message), None)
+            raise
+
+        return DEFERRED
+
+    def _publish_batch(self):
+        if not self._batch:
+            return
+
+        items = [item for item, _ in self._batch]
+        stories = [story for _, story in self._batch]
+        self._batch = []
+        self._batch_started_at = None
+
+        logger.info("publishing a batch of %d stories", len(stories))
+
+        message = StoryBatchMessage(
+            stories=stories,
+            serializer=self._serializer,
+            routing_key=self.batch_routing_key
+        )
+
+        try:
+            result = self._publish(message, items)
+        except Exception:
+            logger.exception(
+                "failed to publish the stories with story ids %s",
+                [item.id for item in items]
+            )
+
+            self.items_completed(items, failed=True)
+            return
+
+        if result is not DEFERRED:
+            self.items_completed(items, failed=False)
 
     def process_item(self, source, item):
         """Process the given item
@@ -210,15 +644,69 @@ class RabbitMQProcessor(Processor):
         :param Source source: the source that returned this item
         :param object item: the hackernews item to process
         """
-        message = self._create_message(item)
-        self._publisher.publish_message(message)
+        story = self._serialize_story(item)
+        if story is None:
+            return
+
+        if self.batch_max_stories <= 1:
+            logger.info("publishing story with id %s", item.id)
+
+            message = StoryDocumentMessage(
+                story=story, serializer=self._serializer)
+
+            return self._publish(message, [item])
+
+        if not self._batch:
+            self._batch_started_at = monotonic()
+
+        self._batch.append((item, story))
+
+        if len(self._batch) >= self.batch_max_stories or self._batch_expired():
+            self._publish_batch()
+
+        return DEFERRED
+
+
+class _PendingItem(object):
+    def __init__(self, item, processor_count):
+        self.item = item
+        self.failed = False
+
+        self._remaining = processor_count
+        self._lock = Lock()
+
+    def processor_finished(self, failed):
+        """Mark that a processor has finished with the item
+
+        :param bool failed: True if the processor failed to process the item
+        :rtype: bool
+        :return: True if all the processors have finished with the item
+        """
+        with self._lock:
+            self.failed = self.failed or failed
+            self._remaining -= 1
+
+            return self._remaining == 0
 
 
 class Processors(object):
     """Processor collection object"""
 
-    def __init__(self):
+    def __init__(self, fingerprint_cache=None):
+        """Create a new Processors object
+
+        :param FingerprintCache fingerprint_cache: the cache to use in order
+            to skip the stories that haven't changed since they were last
+            processed
+        """
         self._processors = []
+        self._fingerprint_cache = fingerprint_cache
+        self._skipped_item_count = 0
+
+        # the items that at least one processor hasn't finished with, by
+        # the id of the item object
+        self._pending_items = {}
+        self._pending_items_lock = Lock()
 
     @property
     def count(self):
@@ -250,6 +738,7 @@ class Processors(object):
 
         :param Processor processor: a processor object
         """
+        processor.set_completion_callback(self._items_completed)
         self._processors.append(processor)
 
     def add_multiple(self, processors):
@@ -257,7 +746,8 @@ class Processors(object):
 
         :param list[Processor] processors: a list of processor objects
         """
-        self._processors.extend(processors)
+        for processor in processors:
+            self.add(processor)
 
     def configure_all(self, config):
         """Configure the processors
@@ -272,6 +762,9 @@ class Processors(object):
 
         :param Job job: the job that was started
         """
+        if self._fingerprint_cache is not None:
+            self._fingerprint_cache.load()
+
         for processor in self._processors:
             processor.job_started(job)
 
@@ -283,17 +776,257 @@ class Processors(object):
         for processor in self._processors:
             processor.job_finished(job)
 
+        self._save_fingerprints()
+
+    def flush(self):
+        """Wait for the processors to finish with all the items they have
+        received"""
+        for processor in self._processors:
+            try:
+                processor.flush()
+            except Exception:
+                logger.exception(
+                    "processor %s failed to flush", type(processor))
+
+    def metrics(self):
+        """Get the metrics of the processors
+
+        :rtype: dict
+        :return: the metric values
+        """
+        metrics = {}
+
+        if self._fingerprint_cache is not None:
+            metrics["unchanged_skipped_items"] = self._skipped_item_count
+
+        for processor in self._processors:
+            metrics.update(processor.metrics())
+
+        return metrics
+
+    def _save_fingerprints(self):
+        if self._fingerprint_cache is None:
+            return
+
+        try:
+            self._fingerprint_cache.save()
+        except OSError:
+            logger.exception("failed to save the story fingerprints")
+
+    def _tick(self):
+        for processor in self._processors:
+            try:
+                processor.tick()
+            except Exception:
+                logger.exception(
+                    "processor %s failed to tick", type(processor))
+
+    def _is_unchanged(self, item):
+        return (
+            self._fingerprint_cache is not None and
+            isinstance(item, HackernewsStoryItem) and
+            self._fingerprint_cache.is_unchanged(item)
+        )
+
+    def _item_processed(self, item, failed):
+        # the fingerprint is only saved when all the processors succeeded so
+        # that a failed item will be processed again when it is retrieved
+        if (self._fingerprint_cache is None or
+                not isinstance(item, HackernewsStoryItem)):
+            return
+
+        if failed:
+            self._fingerprint_cache.remove(item)
+        else:
+            self._fingerprint_cache.update(item)
+
+    def _start_item(self, item):
+        pending_item = _PendingItem(item, len(self._processors))
+
+        # the item is registered before it is given to the processors since
+        # a processor can complete a deferred item while processing it
+        with self._pending_items_lock:
+            self._pending_items[id(item)] = pending_item
+
+        return pending_item
+
+    def _processor_finished(self, pending_item, failed):
+        if not pending_item.processor_finished(failed):
+            return
+
+        with self._pending_items_lock:
+            self._pending_items.pop(id(pending_item.item), None)
+
+        self._item_processed(pending_item.item, pending_item.failed)
+
+    def _items_completed(self, items, failed):
+        for item in items:
+            with self._pending_items_lock:
+                pending_item = self._pending_items.get(id(item))
+
+            if pending_item is not None:
+                self._processor_finished(pending_item, failed)
+
     def process_item(self, source, item):
         """Use the processors to process the given item
 
         :param Source source: the source that generated the item
         :param HackernewsStoryItem item: the item to process
         """
+        if self._is_unchanged(item):
+            logger.info("story with id %s hasn't changed", item.id)
+            self._skipped_item_count += 1
+            self._tick()
+            return
+
+        if not self._processors:
+            return
+
+        pending_item = self._start_item(item)
+
         for processor in self._processors:
+            self._process_item_with(processor, source, pending_item)
+
+    def _process_item_with(self, processor, source, pending_item):
+        try:
+            result = processor.process_item(source, pending_item.item)
+        except ItemProcessingError:
+            logger.info("processor %s failed to process item",
+                        type(processor))
+            failed = True
+        except Exception:
+            logger.exception("processor failed to process item")
+            failed = True
+        else:
+            # the processor reports the result with items_completed
+            if result is DEFERRED:
+                return
+
+            failed = False
+
+        self._processor_finished(pending_item, failed)
+
+
+class ParallelProcessors(Processors):
+    """Processor collection that executes every processor on its own thread
+
+    Every processor consumes the items from its own bounded queue so a slow
+    processor doesn't delay the others. The items are processed in the order
+    they were received and process_item blocks when a queue is full. All the
+    calls to a processor, including job_started and job_finished, are made
+    from the thread of that processor.
+    """
+
+    _STOP = object()
+
+    def __init__(self, fingerprint_cache=None, queue_size=100,
+                 tick_interval=1.0):
+        """Create a new ParallelProcessors object
+
+        :param FingerprintCache fingerprint_cache: the cache to use in order
+            to skip the stories that haven't changed since they were last
+            processed
+        :param int queue_size: the maximum number of items that can wait to
+            be processed by a processor
+        :param float tick_interval: the number of idle seconds after which
+            the processors are ticked
+        """
+        super(ParallelProcessors, self).__init__(fingerprint_cache)
+
+        self.queue_size = queue_size
+        self.tick_interval = tick_interval
+
+        self._workers = []
+
+    def _run_worker(self, processor, work_queue):
+        while True:
             try:
-                processor.process_item(source, item)
-            except ItemProcessingError:
-                logger.info("processor %s failed to process item",
-                            type(processor))
-            except Exception:
-                logger.exception("processor failed to process item")
+                command = work_queue.get(timeout=self.tick_interval)
+            except Empty:
+                command = ("tick", ())
+
+            if command is self._STOP:
+                break
+
+            operation, args = command
+            if operation == "process_item":
+                source, pending_item = args
+                self._process_item_with(processor, source, pending_item)
+            elif operation == "flush":
+                flushed, = args
+
+                try:
+                    processor.flush()
+                except Exception:
+                    logger.exception(
+                        "processor %s failed to flush", type(processor))
+                finally:
+                    flushed.set()
+            else:
+                try:
+                    getattr(processor, operation)(*args)
+                except Exception:
+                    logger.exception(
+                        "processor %s failed to execute %s",
+                        type(processor), operation
+                    )
+
+    def _send(self, operation, *args):
+        for work_queue, _ in self._workers:
+            work_queue.put((operation, args))
+
+    def job_started(self, job):
+        if self._fingerprint_cache is not None:
+            self._fingerprint_cache.load()
+
+        for processor in self._processors:
+            work_queue = Queue(maxsize=self.queue_size)
+            thread = Thread(
+                target=self._run_worker,
+                args=(processor, work_queue),
+                name="processor-{}".format(type(processor).__name__),
+                daemon=True
+            )
+            thread.start()
+
+            self._workers.append((work_queue, thread))
+
+        self._send("job_started", job)
+
+    def job_finished(self, job):
+        self._send("job_finished", job)
+
+        # wait for the processors to finish with the queued items
+        for work_queue, thread in self._workers:
+            work_queue.put(self._STOP)
+        for _, thread in self._workers:
+            thread.join()
+
+        self._workers = []
+
+        self._save_fingerprints()
+
+    def flush(self):
+        # the flush is queued after the items so it also waits for the
+        # processors to consume their queues
+        flushed_events = []
+        for work_queue, _ in self._workers:
+            flushed = Event()
+            work_queue.put(("flush", (flushed,)))
+            flushed_events.append(flushed)
+
+        for flushed in flushed_events:
+            flushed.wait()
+
+    def process_item(self, source, item):
+        # the workers tick their processors while their queues are empty
+        if self._is_unchanged(item):
+            logger.info("story with id %s hasn't changed", item.id)
+            self._skipped_item_count += 1
+            return
+
+        if not self._workers:
+            return
+
+        pending_item = self._start_item(item)
+        self._send("process_item", source, pending_item)
@@ -1,28 +1,41 @@
 import logging
+from threading import Event, Lock, Thread
 
 import pika
 
-from hnac.channels import MessageChannel
+from hnac.channels import ConfirmedMessageChannel, MessageChannel
 
 
 logger = logging.getLogger(__name__)
 
 
 def create_publisher(parameters_url, exchange, exchange_type,
-                     durable, auto_delete, routing_key):
+                     durable, auto_delete, routing_key,
+                     confirm_delivery=False, max_in_flight=1000,
+                     publish_batch_size=50, confirm_timeout=30.0,
+                     compressor=None, confirm_callback=None):
     return RabbitMQPublisher(
         parameters_url=parameters_url,
         exchange=exchange,
         routing_key=routing_key,
         exchange_type=exchange_type,
         durable=durable,
-        auto_delete=auto_delete
+        auto_delete=auto_delete,
+        confirm_delivery=confirm_delivery,
+        max_in_flight=max_in_flight,
+        publish_batch_size=publish_batch_size,
+        confirm_timeout=confirm_timeout,
+        compressor=compressor,
+        confirm_callback=confirm_callback
     )
 
 
 class RabbitMQPublisher(object):
     def __init__(self, parameters_url, exchange, exchange_type,
-                 durable, auto_delete, routing_key):
+                 durable, auto_delete, routing_key, confirm_delivery=False,
+                 max_in_flight=1000, publish_batch_size=50,
+                 confirm_timeout=30.0, compressor=None,
+                 confirm_callback=None):
         """Create a new RabbitMQPublisher object
 
         :param str parameters_url: the RabbitMQ parameters url
@@ -31,12 +44,34 @@ class RabbitMQPublisher(object):
         :param boolean durable: is the exchange durable
         :param boolean auto_delete: will the exchange be auto deleted
         :param str routing_key: the routing key to use
+        :param boolean confirm_delivery: use publisher confirms
+        :param int max_in_flight: the maximum number of unconfirmed messages
+            when publisher confirms are used
+        :param int publish_batch_size: the number of messages to publish at
+            once when publisher confirms are used
+        :param float confirm_timeout: the number of seconds to wait for the
+            unconfirmed messages when the publisher is closed
+        :param Compressor compressor: the compressor of the message bodies
+        :param callable confirm_callback: the function that is called once
+            for every published message when publisher confirms are used. It
+            is called with the message and a boolean that is True if the
+            broker rejected the message or didn't confirm it
         """
+        self.confirm_callback = confirm_callback
+
         self._exchange = exchange
         self._routing_key = routing_key
         self._exchange_type = exchange_type
         self._durable = durable
         self._auto_delete = auto_delete
+        self._confirm_delivery = confirm_delivery
+        self._max_in_flight = max_in_flight
+        self._publish_batch_size = publish_batch_size
+        self._confirm_timeout = confirm_timeout
+        self._compressor = compressor
+
+        self.nacked_message_count = 0
+        self.unconfirmed_message_count = 0
 
         self._connection_parameters = pika.URLParameters(parameters_url)
 
@@ -54,14 +89,387 @@ class RabbitMQPublisher(object):
             auto_delete=self._auto_delete
         )
 
-        self._channel = MessageChannel(
-            channel=channel,
-            exchange=self._exchange,
-            routing_key=self._routing_key
-        )
+        if self._confirm_delivery:
+            self._channel = ConfirmedMessageChannel(
+                channel=channel,
+                connection=self._connection,
+                exchange=self._exchange,
+                routing_key=self._routing_key,
+                max_in_flight=self._max_in_flight,
+                batch_size=self._publish_batch_size,
+                compressor=self._compressor,
+                confirm_callback=self._message_confirmed
+            )
+
+            self._channel.enable_confirms()
+        else:
+            self._channel = MessageChannel(
+                channel=channel,
+                exchange=self._exchange,
+                routing_key=self._routing_key,
+                compressor=self._compressor
+            )
+
+    def _message_confirmed(self, message, failed):
+        if self.confirm_callback is not None:
+            self.confirm_callback(message, failed)
+
+    def _messages_failed(self, messages):
+        for message in messages:
+            self._message_confirmed(message, True)
+
+    def wait_for_confirms(self):
+        """Publish the waiting messages and wait for the broker to confirm
+        them
+
+        :rtype: list[MessageBase]
+        :return: the messages that were rejected or not confirmed by the
+            broker
+        """
+        if not self._confirm_delivery or self._channel is None:
+            return []
+
+        failed_messages = []
+
+        if not self._channel.wait_for_confirms(self._confirm_timeout):
+            unconfirmed_messages = self._channel.pop_pending_messages()
+
+            logger.warning(
+                "%d messages were not confirmed by the broker",
+                len(unconfirmed_messages)
+            )
+
+            self.unconfirmed_message_count += len(unconfirmed_messages)
+            self._messages_failed(unconfirmed_messages)
+            failed_messages.extend(unconfirmed_messages)
+
+        nacked_messages = self._channel.pop_nacked_messages()
+        if nacked_messages:
+            logger.warning(
+                "%d messages were rejected by the broker",
+                len(nacked_messages)
+            )
+
+            self.nacked_message_count += len(nacked_messages)
+            failed_messages.extend(nacked_messages)
+
+        return failed_messages
+
+    def pop_pending_messages(self):
+        """Get the messages that haven't been published or confirmed yet
+
+        The publisher forgets about these messages.
+
+        :rtype: list[MessageBase]
+        :return: the pending messages
+        """
+        if not self._confirm_delivery or self._channel is None:
+            return []
+
+        nacked_messages = self.pop_nacked_messages()
+
+        pending_messages = self._channel.pop_pending_messages()
+        self._messages_failed(pending_messages)
+
+        return nacked_messages + pending_messages
+
+    def pop_nacked_messages(self):
+        """Get the messages that were rejected by the broker
+
+        :rtype: list[MessageBase]
+        :return: the rejected messages
+        """
+        if not self._confirm_delivery or self._channel is None:
+            return []
+
+        nacked_messages = self._channel.pop_nacked_messages()
+        self.nacked_message_count += len(nacked_messages)
+
+        return nacked_messages
 
     def close(self):
-        self._connection.close()
+        try:
+            self.wait_for_confirms()
+        finally:
+            # the messages that can no longer be confirmed are reported as
+            # failed
+            self.pop_pending_messages()
+
+            self._channel = None
+            self._connection.close()
+
+    def flush(self):
+        """Publish the messages that are waiting to be published"""
+        if self._channel is not None:
+            self._channel.flush()
 
     def publish_message(self, message):
         self._channel.publish_message(message)
+
+
+class SpooledPublisher(object):
+    """Publisher that writes the messages to an on disk spool when the
+    broker is unavailable
+
+    A background thread replays the spooled messages in order once the broker
+    becomes available again. New messages are appended to the spool for as
+    long as it is not empty, so the messages that are spooled while the
+    broker is unavailable keep their order. The messages that the broker
+    rejects are retried through the spool and they can be published after
+    newer messages.
+
+    The background thread uses its own publisher because the RabbitMQ
+    connections must not be shared between threads. The messages are
+    published directly again after the background thread has emptied the
+    spool.
+    """
+
+    def __init__(self, publisher, drain_publisher, spool, drain_interval=5.0,
+                 drain_batch_size=100, confirm_callback=None):
+        """Create a new SpooledPublisher object
+
+        :param RabbitMQPublisher publisher: the publisher to use
+        :param RabbitMQPublisher drain_publisher: the publisher that the
+            background thread uses to publish the spooled messages
+        :param MessageSpool spool: the spool for the unpublished messages
+        :param float drain_interval: the number of seconds between the
+            attempts to publish the spooled messages
+        :param int drain_batch_size: the number of spooled messages to publish
+            at once
+        :param callable confirm_callback: the function that is called with
+            every message that was confirmed by the broker or written to the
+            spool. The second argument is always False because the spooled
+            messages are published again later
+        """
+        self.confirm_callback = confirm_callback
+
+        self.drain_interval = drain_interval
+        self.drain_batch_size = drain_batch_size
+
+        self.spooled_message_count = 0
+        self.drained_message_count = 0
+
+        self._publisher = publisher
+        self._publisher.confirm_callback = self._publisher_confirmed
+        self._drain_publisher = drain_publisher
+        self._spool = spool
+        self._connected = False
+        self._drain_publisher_connected = False
+
+        # the spooling flag is switched off by the background thread when the
+        # spool is empty, so it is protected by the lock
+        self._lock = Lock()
+        self._spooling = False
+
+        self._stop_event = Event()
+        self._drainer = None
+
+    @property
+    def nacked_message_count(self):
+        return (
+            self._publisher.nacked_message_count +
+            self._drain_publisher.nacked_message_count
+        )
+
+    @property
+    def unconfirmed_message_count(self):
+        return (
+            self._publisher.unconfirmed_message_count +
+            self._drain_publisher.unconfirmed_message_count
+        )
+
+    @staticmethod
+    def _open_publisher(publisher):
+        try:
+            publisher.open()
+        except Exception:
+            logger.exception("failed to connect to RabbitMQ")
+            SpooledPublisher._close_publisher(publisher)
+            return False
+
+        return True
+
+    @staticmethod
+    def _close_publisher(publisher):
+        try:
+            publisher.close()
+        except Exception:
+            logger.debug("failed to close the RabbitMQ connection")
+
+    def _connect(self):
+        self._connected = self._open_publisher(self._publisher)
+
+        return self._connected
+
+    def _disconnect(self):
+        self._connected = False
+        self._close_publisher(self._publisher)
+
+    def _publisher_confirmed(self, message, failed):
+        # the messages that failed are written to the spool
+        if not failed:
+            self._message_delivered(message)
+
+    def _message_delivered(self, message):
+        if self.confirm_callback is not None:
+            self.confirm_callback(message, False)
+
+    def _spool_messages(self, messages, start_spooling=False):
+        with self._lock:
+            self._spooling = self._spooling or start_spooling
+
+            for message in messages:
+                self._spool.append(message)
+
+        for message in messages:
+            self._message_delivered(message)
+
+        self.spooled_message_count += len(messages)
+
+    def _should_drain(self):
+        return not self._spool.is_empty()
+
+    def _finish_draining(self):
+        # no message can be spooled between the check and the switch to
+        # direct publishing
+        with self._lock:
+            if not self._spool.is_empty():
+                return False
+
+            self._spooling = False
+
+            return True
+
+    def _drain(self):
+        """Publish the spooled messages using the drain publisher
+
+        This is only called by the background thread.
+
+        :rtype: bool
+        :return: True if the spool was emptied
+        """
+        while not self._finish_draining():
+            messages, position = self._spool.read(self.drain_batch_size)
+
+            if messages:
+                if (not self._drain_publisher_connected and
+                        not self._open_publisher(self._drain_publisher)):
+                    return False
+
+                self._drain_publisher_connected = True
+
+                try:
+                    for message in messages:
+                        self._drain_publisher.publish_message(message)
+
+                    self._drain_publisher.flush()
+                    failed_messages = \
+                        self._drain_publisher.wait_for_confirms()
+                except Exception:
+                    logger.exception("failed to publish the spooled messages")
+                    failed_messages = messages
+
+                if failed_messages:
+                    # the messages are still in the spool and will be
+                    # published again
+                    self._drain_publisher.pop_pending_messages()
+                    self._disconnect_drain_publisher()
+                    return False
+
+                self.drained_message_count += len(messages)
+                logger.info("published %d spooled messages", len(messages))
+
+            self._spool.commit(position)
+
+        # the connection isn't kept open while the spool is empty
+        self._disconnect_drain_publisher()
+
+        return True
+
+    def _disconnect_drain_publisher(self):
+        if self._drain_publisher_connected:
+            self._drain_publisher_connected = False
+            self._close_publisher(self._drain_publisher)
+
+    def _run_drainer(self):
+        while not self._stop_event.wait(self.drain_interval):
+            if self._should_drain():
+                self._drain()
+
+        # the spooled messages are published one last time before the
+        # publisher is closed
+        if self._should_drain():
+            self._drain()
+
+        self._disconnect_drain_publisher()
+
+    def open(self):
+        if self._spool.is_empty():
+            self._connect()
+
+        with self._lock:
+            self._spooling = not self._connected
+
+        self._stop_event.clear()
+        self._drainer = Thread(target=self._run_drainer, daemon=True)
+        self._drainer.start()
+
+    def close(self):
+        self._stop_event.set()
+        if self._drainer is not None:
+            self._drainer.join()
+            self._drainer = None
+
+        if self._connected:
+            try:
+                failed_messages = self._publisher.wait_for_confirms()
+            except Exception:
+                logger.exception("failed to wait for the message confirms")
+                failed_messages = self._publisher.pop_pending_messages()
+
+            self._spool_messages(failed_messages)
+
+        self._disconnect()
+
+    def flush(self):
+        if not self._connected:
+            return
+
+        try:
+            self._publisher.flush()
+        except Exception:
+            logger.exception("failed to publish the waiting messages")
+            self._spool_messages(
+                self._publisher.pop_pending_messages(), start_spooling=True)
+            self._disconnect()
+            return
+
+        self._spool_messages(self._publisher.pop_nacked_messages())
+
+    def publish_message(self, message):
+        with self._lock:
+            spooling = self._spooling
+
+        # the publisher is only connected again after the background thread
+        # has published the spooled messages, so the broker is available
+        if spooling or (not self._connected and not self._connect()):
+            self._spool_messages([message], start_spooling=True)
+            return
+
+        try:
+            self._publisher.publish_message(message)
+        except Exception:
+            logger.exception("failed to publish message, using the spool")
+
+            pending_messages = list(self._publisher.pop_pending_messages())
+            if not any(pending_message is message
+                       for pending_message in pending_messages):
+                pending_messages.append(message)
+
+            self._spool_messages(pending_messages, start_spooling=True)
+            self._disconnect()
+            return
+
+        # the messages that were rejected by the broker are retried
+        # through the spool
+        self._spool_messages(self._publisher.pop_nacked_messages())
@@ -0,0 +1,234 @@
+from heapq import heappop, heappush
+import logging
+from threading import Event
+from time import monotonic
+
+from hnac.limiters import add_jitter
+
+
+logger = logging.getLogger(__name__)
+
+
+class IntervalScheduler(object):
+    """Scheduler that executes a task repeatedly on a fixed interval"""
+
+    def __init__(self, interval, jitter=0.0):
+        """Create a new IntervalScheduler object
+
+        :param float interval: the number of seconds between the start of
+            consecutive task runs
+        :param float jitter: the maximum fraction of the interval to randomly
+            add or remove
+        """
+        self.interval = interval
+        self.jitter = jitter
+
+        self._stop_event = Event()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def stop(self):
+        """Stop the scheduler
+
+        The scheduler exits after the task that is currently running has
+        finished.
+        """
+        self._stop_event.set()
+
+    def run(self, task):
+        """Execute the task until the scheduler is stopped
+
+        :param callable task: the task to execute
+        """
+        while not self._stop_event.is_set():
+            started_at = monotonic()
+
+            task()
+
+            elapsed = monotonic() - started_at
+            wait_time = max(
+                add_jitter(self.interval, self.jitter) - elapsed, 0.0)
+            logger.info("next run in %f seconds", wait_time)
+
+            self._stop_event.wait(wait_time)
+
+        logger.info("scheduler stopped")
+
+
+class _TrackedStory(object):
+    __slots__ = (
+        "story_id", "created_at", "score", "descendants", "observed_at",
+        "change_rate", "next_fetch_at"
+    )
+
+    def __init__(self, story_id, created_at):
+        self.story_id = story_id
+        self.created_at = created_at
+        self.score = None
+        self.descendants = None
+        self.observed_at = None
+        self.change_rate = 0.0
+        self.next_fetch_at = None
+
+
+class RecrawlScheduler(object):
+    """Priority queue with the next fetch time of the tracked stories
+
+    The fetch interval of a story decreases with the rate at which its score
+    and number of comments change and it increases with its age. The stories
+    that are older than the maximum age are no longer tracked.
+    """
+
+    def __init__(self, min_interval=300.0, max_interval=21600.0,
+                 max_age=172800.0, age_scale=3600.0, smoothing=0.5):
+        """Create a new RecrawlScheduler object
+
+        :param float min_interval: the minimum number of seconds between two
+            fetches of a story
+        :param float max_interval: the maximum number of seconds between two
+            fetches of a story
+        :param float max_age: the age in seconds after which a story is no
+            longer tracked
+        :param float age_scale: the story age in seconds that doubles the
+            fetch interval
+        :param float smoothing: the weight of the latest change rate in the
+            story's smoothed change rate
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_age = max_age
+        self.age_scale = age_scale
+        self.smoothing = smoothing
+
+        self._stories = {}
+        self._queue = []
+
+    def __len__(self):
+        return len(self._stories)
+
+    def __contains__(self, story_id):
+        return story_id in self._stories
+
+    def _schedule(self, story, fetch_at):
+        story.next_fetch_at = fetch_at
+        heappush(self._queue, (fetch_at, story.story_id))
+
+    def _fetch_interval(self, story, now):
+        age = max(now - story.created_at, 0.0)
+
+        # the change rate is measured in score points and comments per hour
+        interval = (
+            self.min_interval * (1.0 + age / self.age_scale) /
+            (1.0 + story.change_rate)
+        )
+
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def track(self, story_id, created_at, now):
+        """Start tracking a story
+
+        New stories are scheduled to be fetched immediately.
+
+        :param int story_id: the story id
+        :param float created_at: the story creation timestamp
+        :param float now: the current timestamp
+        """
+        if story_id in self._stories or now - created_at > self.max_age:
+            return
+
+        story = _TrackedStory(story_id, created_at)
+        self._stories[story_id] = story
+        self._schedule(story, now)
+
+    def forget(self, story_id):
+        """Stop tracking a story
+
+        :param int story_id: the story id
+        """
+        self._stories.pop(story_id, None)
+
+    def observe(self, story_id, created_at, score, descendants, observed_at):
+        """Update the fetch time of a story using its latest data
+
+        :param int story_id: the story id
+        :param float created_at: the story creation timestamp
+        :param int score: the story score
+        :param int descendants: the number of comments of the story
+        :param float observed_at: the timestamp at which the data were
+            retrieved
+        """
+        if observed_at - created_at > self.max_age:
+            self.forget(story_id)
+            return
+
+        story = self._stories.get(story_id)
+        if story is None:
+            story = _TrackedStory(story_id, created_at)
+            self._stories[story_id] = story
+
+        # the stories that are tracked before they are fetched use the time
+        # they were first seen as their creation time
+        story.created_at = created_at
+
+        score = score or 0
+        descendants = descendants or 0
+
+        if story.observed_at is not None and observed_at > story.observed_at:
+            hours = (observed_at - story.observed_at) / 3600.0
+            change = (
+                abs(score - story.score) +
+                abs(descendants - story.descendants)
+            )
+
+            story.change_rate = (
+                self.smoothing * change / hours +
+                (1.0 - self.smoothing) * story.change_rate
+            )
+
+        story.score = score
+        story.descendants = descendants
+        story.observed_at = observed_at
+
+        self._schedule(
+            story, observed_at + self._fetch_interval(story, observed_at))
+
+    def due(self, now, limit=None):
+        """Get the stories that must be fetched
+
+        The stories are returned in the order of their fetch time. The
+        returned stories remain tracked and they are rescheduled when they
+        are observed again.
+
+        :param float now: the current timestamp
+        :param int limit: the maximum number of stories to return
+        :rtype: list[int]
+        :return: the ids of the stories to fetch
+        """
+        story_ids = []
+
+        while self._queue and (limit is None or len(story_ids) < limit):
+            fetch_at, story_id = self._queue[0]
+            if fetch_at > now:
+                break
+
+            heappop(self._queue)
+
+            story = self._stories.get(story_id)
+
+            # skip the entries of the forgotten stories and the ones that
+            # have been rescheduled
+            if story is None or story.next_fetch_at != fetch_at:
+                continue
+
+            if now - story.created_at > self.max_age:
+                self.forget(story_id)
+                continue
+
+            story_ids.append(story_id)
+
+            # the story is fetched again later if it is not observed
+            self._schedule(story, now + self.max_interval)
+
+        return story_ids
@@ -0,0 +1,130 @@
+from abc import ABCMeta, abstractmethod
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from hnac.exceptions import HnacError
+
+
+class SerializerError(HnacError):
+    pass
+
+
+class Serializer(metaclass=ABCMeta):
+    """Message serializer base"""
+
+    content_type = None
+
+    @abstractmethod
+    def dumps(self, data):
+        """Serialize the message data
+
+        :param dict data: the message data
+        :rtype: str|bytes
+        :return: the serialized data
+        """
+        pass
+
+    @abstractmethod
+    def loads(self, data):
+        """Deserialize the message data
+
+        :param str|bytes data: the serialized data
+        :rtype: dict
+        :return: the message data
+        """
+        pass
+
+
+class JsonSerializer(Serializer):
+    """Serializer that uses the standard library json module"""
+
+    content_type = "application/json"
+
+    def dumps(self, data):
+        return json.dumps(data)
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+
+        return json.loads(data)
+
+
+class OrjsonSerializer(Serializer):
+    """JSON serializer that uses orjson"""
+
+    content_type = "application/json"
+
+    def __init__(self):
+        if orjson is None:
+            raise SerializerError("orjson is required for this serializer")
+
+    def dumps(self, data):
+        return orjson.dumps(data)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    """Binary serializer that uses msgpack"""
+
+    content_type = "application/msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise SerializerError("msgpack is required for this serializer")
+
+    def dumps(self, data):
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+_SERIALIZERS = {
+    "json": JsonSerializer,
+    "orjson": OrjsonSerializer,
+    "msgpack": MsgpackSerializer
+}
+
+
+def create_serializer(name):
+    """Create a message serializer
+
+    :param str name: the serializer name
+    :rtype: Serializer
+    :return: the serializer
+    """
+    try:
+        serializer_class = _SERIALIZERS[name]
+    except KeyError:
+        raise SerializerError("unknown serializer {}".format(name))
+
+    return serializer_class()
+
+
+def get_content_type_serializer(content_type):
+    """Get a serializer that can deserialize the given content type
+
+    The fastest available serializer is returned.
+
+    :param str content_type: the message content type
+    :rtype: Serializer
+    :return: the serializer
+    """
+    if content_type is None or content_type == JsonSerializer.content_type:
+        return OrjsonSerializer() if orjson else JsonSerializer()
+    elif content_type == MsgpackSerializer.content_type:
+        return MsgpackSerializer()
+
+    raise SerializerError("unsupported content type {}".format(content_type))
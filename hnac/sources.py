@@ -1,18 +1,43 @@
 from abc import ABCMeta, abstractmethod
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import logging
-from time import time, sleep
+from threading import Lock
+from datetime import datetime, timedelta, timezone
+from time import sleep, time
 from urllib.parse import urljoin
 
 from marshmallow import ValidationError
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
 from hnac.schemas import is_story_item, HackernewsStorySchema
 from hnac.exceptions import HnacError
+from hnac.helpers import load_json_file, save_json_file
+from hnac.limiters import AdaptiveRateLimiter, add_jitter
+from hnac.models import StoryData
+from hnac.schedulers import RecrawlScheduler
 
 
 logger = logging.getLogger(__name__)
 
 
+# the errors that signal that the hackernews api is overloaded
+OVERLOAD_ERRORS = (
+    requests.Timeout,
+    requests.ConnectionError,
+    requests.HTTPError,
+    requests.exceptions.RetryError
+)
+
+
 class SourceError(HnacError):
     pass
 
@@ -42,6 +67,14 @@ class Source(object):
         """
         pass
 
+    def metrics(self):
+        """Get the metrics of the source
+
+        :rtype: dict
+        :return: the metric values
+        """
+        return {}
+
     def job_started(self, job):
         """Signal the source implementation that the job has started
 
@@ -56,6 +89,28 @@ class Source(object):
         """
         pass
 
+    def checkpoint(self):
+        """Get the crawl position of the source
+
+        The checkpoint covers all the items that have been returned so far.
+
+        :rtype: dict|None
+        :return: a json serializable checkpoint or None if the source doesn't
+            support checkpoints
+        """
+        return None
+
+    def restore(self, checkpoint):
+        """Resume the next crawl from the given checkpoint
+
+        :param dict checkpoint: a checkpoint that was created by this source
+        """
+        pass
+
+    def close(self):
+        """Release the resources that are used by the source"""
+        pass
+
 
 class HackernewsStories(Source):
     """Hackernews source"""
@@ -68,10 +123,26 @@ class HackernewsStories(Source):
         self.backoff_time = 5.0
         self.abort_after = 3
         self.request_timeout = 5
-
-        self._last_request_time = 0.0
+        self.workers = 1
+        self.preserve_order = True
+        self.pool_size = 10
+        self.max_retries = 0
+        self.burst = 1
+        self.max_requests_per_second = None
+        self.rate_increase = 0.1
+        self.rate_decrease_factor = 0.5
+        self.shard_index = 0
+        self.shard_count = 1
+
+        self._rate_limiter = self._create_rate_limiter()
+        self._session = None
+        self._session_lock = Lock()
         self._hackernews_api_url = hackernews_api_url
+
         self._story_ids = None
+        self._position = 0
+        self._completed_story_ids = set()
+        self._restored_checkpoint = None
 
     def configure(self, config):
         if "CRAWLER_WAIT_TIME" in config:
@@ -83,56 +154,736 @@ class HackernewsStories(Source):
         if "CRAWLER_ABORT_AFTER" in config:
             self.abort_after = config["CRAWLER_ABORT_AFTER"]
 
+        if "CRAWLER_WORKERS" in config:
+            self.workers = config["CRAWLER_WORKERS"]
+
+        if "CRAWLER_PRESERVE_ORDER" in config:
+            self.preserve_order = config["CRAWLER_PRESERVE_ORDER"]
+
+        if "CRAWLER_REQUEST_TIMEOUT" in config:
+            self.request_timeout = config["CRAWLER_REQUEST_TIMEOUT"]
+
+        if "CRAWLER_POOL_SIZE" in config:
+            self.pool_size = config["CRAWLER_POOL_SIZE"]
+
+        if "CRAWLER_MAX_RETRIES" in config:
+            self.max_retries = config["CRAWLER_MAX_RETRIES"]
+
+        if "CRAWLER_BURST" in config:
+            self.burst = config["CRAWLER_BURST"]
+
+        if "CRAWLER_MAX_REQUESTS_PER_SECOND" in config:
+            self.max_requests_per_second = \
+                config["CRAWLER_MAX_REQUESTS_PER_SECOND"]
+
+        if "CRAWLER_RATE_INCREASE" in config:
+            self.rate_increase = config["CRAWLER_RATE_INCREASE"]
+
+        if "CRAWLER_RATE_DECREASE_FACTOR" in config:
+            self.rate_decrease_factor = config["CRAWLER_RATE_DECREASE_FACTOR"]
+
+        if "CRAWLER_SHARD_INDEX" in config:
+            self.shard_index = config["CRAWLER_SHARD_INDEX"]
+
+        if "CRAWLER_SHARD_COUNT" in config:
+            self.shard_count = config["CRAWLER_SHARD_COUNT"]
+
+        if not 0 <= self.shard_index < self.shard_count:
+            raise SourceError(
+                f"invalid shard index {self.shard_index} for "
+                f"{self.shard_count} shards"
+            )
+
+        self._rate_limiter = self._create_rate_limiter()
+
+        # the connection pool settings might have changed
+        self.close()
+
+    def _create_rate_limiter(self):
+        # the wait time is used in order to calculate the initial rate. A
+        # source without a wait time starts at the maximum rate and it is
+        # not throttled at all if that isn't set either
+        if self.wait_time > 0.0:
+            rate = 1.0 / self.wait_time
+        elif self.max_requests_per_second:
+            rate = self.max_requests_per_second
+        else:
+            return None
+
+        max_rate = max(rate, self.max_requests_per_second or rate)
+
+        # the request rate is the budget of all the shards so every shard
+        # gets an equal part of it
+        return AdaptiveRateLimiter(
+            rate=rate / self.shard_count,
+            burst=self.burst,
+            max_rate=max_rate / self.shard_count,
+            increase=self.rate_increase / self.shard_count,
+            decrease_factor=self.rate_decrease_factor
+        )
+
+    def metrics(self):
+        if self._rate_limiter is None:
+            return {}
+
+        return {"crawler_request_rate": self._rate_limiter.rate}
+
+    def _create_session(self):
+        session = requests.Session()
+
+        retries = Retry(
+            total=self.max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504)
+        )
+
+        # every worker should be able to keep its own connection alive
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(self.pool_size, self.workers),
+            max_retries=retries
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        return session
+
+    def _get_session(self):
+        with self._session_lock:
+            if self._session is None:
+                self._session = self._create_session()
+
+            return self._session
+
+    def close(self):
+        """Close the connections that are kept open by the source"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
     def _throttle(self):
-        time_diff = time() - self._last_request_time
+        # the rate limiter is shared by all the workers
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
 
-        sleep_for = self.wait_time - time_diff
+    def _request_succeeded(self):
+        if self._rate_limiter is not None:
+            self._rate_limiter.on_success()
 
-        if sleep_for > 0.0:
-            logger.info("sleeping due to throttling for %f seconds", sleep_for)
-            sleep(sleep_for)
+    def _request_failed(self):
+        if self._rate_limiter is not None:
+            self._rate_limiter.on_failure()
 
-    def _execute_new_stories_request(self):
-        new_stories_url = urljoin(
-            self._hackernews_api_url, "/v0/newstories.json")
-        response = requests.get(new_stories_url, timeout=self.request_timeout)
+    def _execute_json_request(self, path):
+        url = urljoin(self._hackernews_api_url, path)
+        response = self._get_session().get(url, timeout=self.request_timeout)
+
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
 
         return response.json()
 
-    def _get_new_stories(self):
+    def _execute_with_retries(self, request, description):
         failure_count = 0
 
         while True:
             try:
-                return self._execute_new_stories_request()
+                result = request()
+                self._request_succeeded()
+
+                return result
             except requests.RequestException as e:
-                logger.exception("Failed to fetch new story ids")
+                logger.exception("Failed to fetch %s", description)
+
+                if isinstance(e, OVERLOAD_ERRORS):
+                    self._request_failed()
 
                 failure_count += 1
                 if failure_count > self.abort_after:
                     logger.error(
-                        "maximum number of attempts to retrieve new stories "
-                        "has been reached")
+                        "maximum number of attempts to retrieve %s "
+                        "has been reached", description)
                     raise RetryCountExceeded() from e
 
-                sleep(self.backoff_time)
+                sleep(add_jitter(self.backoff_time, 0.1))
+
+    def _execute_new_stories_request(self):
+        return self._execute_json_request("/v0/newstories.json")
+
+    def _get_new_stories(self):
+        return self._execute_with_retries(
+            self._execute_new_stories_request, "new story ids")
+
+    def _get_max_item(self):
+        return self._execute_with_retries(
+            lambda: self._execute_json_request("/v0/maxitem.json"),
+            "max item id"
+        )
 
     def _get_story_data(self, story_id):
         logger.info("Fetching hackernews item %d", story_id)
 
+        return self._execute_with_retries(
+            lambda: self._execute_json_request(f"/v0/item/{story_id}.json"),
+            f"story {story_id}"
+        )
+
+    def _fetch_item(self, story_id):
+        self._throttle()
+
+        return self._get_story_data(story_id)
+
+    def _fetch_items_in_order(self, executor, story_ids):
+        pending = deque()
+
+        try:
+            for story_id in story_ids:
+                pending.append(
+                    (story_id, executor.submit(self._fetch_item, story_id)))
+
+                # keep a bounded number of requests queued so that an early
+                # exit doesn't leave hundreds of requests behind
+                if len(pending) >= self.workers * 2:
+                    story_id, future = pending.popleft()
+                    yield story_id, future.result()
+
+            while pending:
+                story_id, future = pending.popleft()
+                yield story_id, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def _fetch_items_as_completed(self, executor, story_ids):
+        story_ids = iter(story_ids)
+        pending = {}
+
+        def submit_next():
+            for story_id in story_ids:
+                future = executor.submit(self._fetch_item, story_id)
+                pending[future] = story_id
+                return
+
+        try:
+            for _ in range(self.workers * 2):
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    story_id = pending.pop(future)
+                    submit_next()
+                    yield story_id, future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _fetch_items(self, story_ids):
+        """Fetch the data of the given hackernews items
+
+        :param list[int] story_ids: the ids of the items to fetch
+        :rtype: Iterable
+        :return: a generator that returns tuples with the item id and the
+            item data
+        """
+        if self.workers <= 1:
+            for story_id in story_ids:
+                yield story_id, self._fetch_item(story_id)
+
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if self.preserve_order:
+                yield from self._fetch_items_in_order(executor, story_ids)
+            else:
+                yield from self._fetch_items_as_completed(executor, story_ids)
+
+    def _get_story_ids(self):
+        return self._get_new_stories()
+
+    def _create_story_item(self, story_id, story_data):
+        if not is_story_item(story_data):
+            logger.warning("Hackernews item with id %d is not a story",
+                           story_id)
+            return None
+
+        schema = HackernewsStorySchema()
+        try:
+            return schema.load(story_data)
+        except ValidationError as e:
+            logger.warning(
+                "failed to deserialize story item: error(%s)", e)
+            return None
+
+    def checkpoint(self):
+        if self._story_ids is None:
+            return None
+
+        return {
+            "story_ids": self._story_ids,
+            "position": self._position,
+            "completed": sorted(self._completed_story_ids)
+        }
+
+    def restore(self, checkpoint):
+        self._restored_checkpoint = checkpoint
+
+    def _in_shard(self, story_id):
+        return story_id % self.shard_count == self.shard_index
+
+    def _start_crawl(self):
+        checkpoint = self._restored_checkpoint
+        self._restored_checkpoint = None
+
+        if checkpoint is None:
+            self._story_ids = [
+                story_id
+                for story_id in self._get_story_ids()
+                if self._in_shard(story_id)
+            ]
+            self._position = 0
+            self._completed_story_ids = set()
+        else:
+            self._story_ids = checkpoint["story_ids"]
+            self._position = checkpoint["position"]
+            self._completed_story_ids = set(checkpoint["completed"])
+
+            logger.info("resuming crawl at position %d of %d",
+                        self._position, len(self._story_ids))
+
+        return [
+            story_id
+            for story_id in self._story_ids[self._position:]
+            if story_id not in self._completed_story_ids
+        ]
+
+    def _story_completed(self, story_id):
+        self._completed_story_ids.add(story_id)
+
+        # the position is the start of the ids that haven't been retrieved
+        # yet. The ids after it that have been retrieved out of order are
+        # kept in the completed set
+        while (self._position < len(self._story_ids) and
+               self._story_ids[self._position] in self._completed_story_ids):
+            self._completed_story_ids.discard(self._story_ids[self._position])
+            self._position += 1
+
+    def items(self):
+        story_ids = self._start_crawl()
+
+        for story_id, story_data in self._fetch_items(story_ids):
+            story = self._create_story_item(story_id, story_data)
+            self._story_completed(story_id)
+
+            if story is not None:
+                yield story
+
+
+class IncrementalHackernewsStories(HackernewsStories):
+    """Hackernews source that only retrieves the changed items
+
+    The source remembers the largest item id that it has seen. Every run
+    fetches the items that have been created since then along with the items
+    that are reported by the updates endpoint. The new stories endpoint is used
+    when there is no previous run or when too many items have been created
+    since the last one.
+    """
+
+    def __init__(self,
+                 hackernews_api_url="https://hacker-news.firebaseio.com"):
+        super(IncrementalHackernewsStories, self).__init__(hackernews_api_url)
+
+        self.state_file = None
+        self.max_new_items = 1000
+
+        self.high_water_mark = None
+        self._next_high_water_mark = None
+
+    def configure(self, config):
+        super(IncrementalHackernewsStories, self).configure(config)
+
+        if "CRAWLER_STATE_FILE" in config:
+            self.state_file = config["CRAWLER_STATE_FILE"]
+
+        if "CRAWLER_INCREMENTAL_MAX_ITEMS" in config:
+            self.max_new_items = config["CRAWLER_INCREMENTAL_MAX_ITEMS"]
+
+    def _load_high_water_mark(self):
+        if self.high_water_mark is None and self.state_file:
+            state = load_json_file(self.state_file, default={})
+            self.high_water_mark = state.get("high_water_mark")
+
+    def _save_high_water_mark(self):
+        if self.state_file:
+            save_json_file(
+                self.state_file, {"high_water_mark": self.high_water_mark})
+
+    def _get_updated_items(self):
+        updates = self._execute_with_retries(
+            lambda: self._execute_json_request("/v0/updates.json"),
+            "updated item ids"
+        )
+
+        return updates.get("items", []) if isinstance(updates, dict) else []
+
+    def _get_story_ids(self):
+        self._load_high_water_mark()
+
+        max_item = self._get_max_item()
+        self._next_high_water_mark = max_item
+
+        if (self.high_water_mark is None or
+                max_item - self.high_water_mark > self.max_new_items):
+            logger.info("retrieving the new stories since the high water "
+                        "mark is not available or too old")
+            return self._get_new_stories()
+
+        story_ids = list(range(max_item, self.high_water_mark, -1))
+
+        new_story_ids = set(story_ids)
+        story_ids.extend(
+            item_id
+            for item_id in self._get_updated_items()
+            if item_id not in new_story_ids
+        )
+
+        return story_ids
+
+    def _create_story_item(self, story_id, story_data):
+        # the new items are mostly comments so they are skipped without
+        # logging a warning for each one of them
+        if not story_data or story_data.get("type") != "story":
+            return None
+
+        return super(IncrementalHackernewsStories, self)._create_story_item(
+            story_id, story_data)
+
+    def checkpoint(self):
+        checkpoint = super(IncrementalHackernewsStories, self).checkpoint()
+
+        if checkpoint is not None:
+            checkpoint["next_high_water_mark"] = self._next_high_water_mark
+
+        return checkpoint
+
+    def restore(self, checkpoint):
+        super(IncrementalHackernewsStories, self).restore(checkpoint)
+
+        self._next_high_water_mark = checkpoint.get("next_high_water_mark")
+
+    def items(self):
+        yield from super(IncrementalHackernewsStories, self).items()
+
+        # the high water mark is only updated when all the items have been
+        # retrieved
+        self.high_water_mark = self._next_high_water_mark
+        self._save_high_water_mark()
+        logger.info("high water mark set to %s", self.high_water_mark)
+
+
+class PrioritizedHackernewsStories(HackernewsStories):
+    """Hackernews source that re-crawls the stories by priority
+
+    The source tracks the recent stories and schedules their next fetch using
+    the rate at which their score and number of comments change. The stories
+    that change fast are fetched more often than the old or inactive ones.
+    Every run retrieves at most the configured number of due stories. The
+    scheduler is initialized using the story data that have been saved in
+    the database.
+    """
+
+    def __init__(self, session=None,
+                 hackernews_api_url="https://hacker-news.firebaseio.com"):
+        """Create a new PrioritizedHackernewsStories object
+
+        :param Session session: the sqlalchemy session used to load the story
+            history
+        :param str hackernews_api_url: the hackernews api url
+        """
+        super(PrioritizedHackernewsStories, self).__init__(hackernews_api_url)
+
+        self.session = session
+        self.max_stories = 500
+
+        self.scheduler = RecrawlScheduler()
+        self._history_loaded = False
+
+    def configure(self, config):
+        super(PrioritizedHackernewsStories, self).configure(config)
+
+        if "CRAWLER_PRIORITY_MAX_STORIES" in config:
+            self.max_stories = config["CRAWLER_PRIORITY_MAX_STORIES"]
+
+        if "CRAWLER_PRIORITY_MIN_INTERVAL" in config:
+            self.scheduler.min_interval = \
+                config["CRAWLER_PRIORITY_MIN_INTERVAL"]
+
+        if "CRAWLER_PRIORITY_MAX_INTERVAL" in config:
+            self.scheduler.max_interval = \
+                config["CRAWLER_PRIORITY_MAX_INTERVAL"]
+
+        if "CRAWLER_PRIORITY_MAX_AGE" in config:
+            self.scheduler.max_age = config["CRAWLER_PRIORITY_MAX_AGE"]
+
+    def metrics(self):
+        metrics = super(PrioritizedHackernewsStories, self).metrics()
+
+        metrics["prioritized_tracked_stories"] = len(self.scheduler)
+
+        return metrics
+
+    def _observe(self, story_id, story_data, observed_at):
+        self.scheduler.observe(
+            story_id=story_id,
+            created_at=story_data.get("time", observed_at),
+            score=story_data.get("score"),
+            descendants=story_data.get("descendants"),
+            observed_at=observed_at
+        )
+
+    def _load_history(self):
+        if self._history_loaded or self.session is None:
+            return
+
+        since = datetime.utcnow() - timedelta(seconds=self.scheduler.max_age)
+
+        # the change rate of a story is estimated using its latest two
+        # observations
+        observations = StoryData.yield_observations(
+            self.session, since, per_story=2)
+
+        for (hackernews_id, downloaded_at, created_at, score,
+             descendants) in observations:
+            if not self._in_shard(hackernews_id):
+                continue
+
+            observed_at = downloaded_at.replace(
+                tzinfo=timezone.utc).timestamp()
+
+            if created_at is None:
+                created_at = observed_at
+
+            self.scheduler.observe(
+                story_id=hackernews_id,
+                created_at=created_at,
+                score=score,
+                descendants=descendants,
+                observed_at=observed_at
+            )
+
+        # the session is shared with the processors so the transaction that
+        # was used to load the history is not left open
+        self.session.rollback()
+
+        self._history_loaded = True
+        logger.info("loaded the history of %d stories", len(self.scheduler))
+
+    def _get_story_ids(self):
+        self._load_history()
+
+        now = time()
+        for story_id in self._get_new_stories():
+            if self._in_shard(story_id) and story_id not in self.scheduler:
+                # the creation time of a story that is listed in the new
+                # stories is not known before it is fetched, so it is updated
+                # when the story is observed
+                self.scheduler.track(story_id, now, now)
+
+        story_ids = self.scheduler.due(now, self.max_stories)
+        logger.info("%d stories are due to be fetched", len(story_ids))
+
+        return story_ids
+
+    def _create_story_item(self, story_id, story_data):
+        story = super(PrioritizedHackernewsStories, self)._create_story_item(
+            story_id, story_data)
+
+        if story is None:
+            self.scheduler.forget(story_id)
+        else:
+            self._observe(story_id, story_data, time())
+
+        return story
+
+
+class BackfillHackernewsStories(HackernewsStories):
+    """Hackernews source that retrieves the stories in a range of item ids
+
+    The item ids are walked downward starting from the largest one. The items
+    are retrieved concurrently without preserving their order. The checkpoint
+    of the source is the id below which no item has been retrieved yet along
+    with the smaller ids that have already been retrieved.
+    """
+
+    def __init__(self, from_id=None, to_id=1,
+                 hackernews_api_url="https://hacker-news.firebaseio.com"):
+        """Create a new BackfillHackernewsStories object
+
+        :param int from_id: the largest item id to retrieve. The current max
+            item id is used if this is None
+        :param int to_id: the smallest item id to retrieve
+        :param str hackernews_api_url: the hackernews api url
+        """
+        if from_id is not None and from_id < to_id:
+            raise SourceError(
+                f"invalid backfill item id range {from_id} - {to_id}")
+
+        super(BackfillHackernewsStories, self).__init__(hackernews_api_url)
+
+        self.from_id = from_id
+        self.to_id = to_id
+        self.workers = 32
+        self.preserve_order = False
+        self.progress_interval = 1000
+
+        self._next_id = from_id
+        self._retrieved_item_count = 0
+
+    def configure(self, config):
+        super(BackfillHackernewsStories, self).configure(config)
+
+        if "CRAWLER_BACKFILL_WORKERS" in config:
+            self.workers = config["CRAWLER_BACKFILL_WORKERS"]
+
+        if config.get("CRAWLER_BACKFILL_MAX_REQUESTS_PER_SECOND"):
+            self.max_requests_per_second = \
+                config["CRAWLER_BACKFILL_MAX_REQUESTS_PER_SECOND"]
+            self.wait_time = 1.0 / self.max_requests_per_second
+
+            self._rate_limiter = self._create_rate_limiter()
+
+        # the order of the items doesn't matter when filling a gap
+        self.preserve_order = False
+
+        # the connection pool is sized using the number of workers
+        self.close()
+
+    def metrics(self):
+        metrics = super(BackfillHackernewsStories, self).metrics()
+
+        metrics["backfill_retrieved_items"] = self._retrieved_item_count
+        metrics["backfill_next_id"] = self._next_id
+
+        return metrics
+
+    def checkpoint(self):
+        if self._next_id is None:
+            return None
+
+        return {
+            "from_id": self.from_id,
+            "next_id": self._next_id,
+            "completed": sorted(self._completed_story_ids)
+        }
+
+    def _start_crawl(self):
+        checkpoint = self._restored_checkpoint
+        self._restored_checkpoint = None
+
+        if checkpoint is not None:
+            self.from_id = checkpoint["from_id"]
+            self._next_id = checkpoint["next_id"]
+            self._completed_story_ids = set(checkpoint["completed"])
+
+            logger.info("resuming backfill at item %d", self._next_id)
+        else:
+            if self.from_id is None:
+                self.from_id = self._get_max_item()
+
+            self._next_id = self.from_id
+            self._completed_story_ids = set()
+
+        self._skip_completed_story_ids()
+
+        completed_story_ids = set(self._completed_story_ids)
+
+        return (
+            story_id
+            for story_id in range(self._next_id, self.to_id - 1, -1)
+            if self._in_shard(story_id) and
+            story_id not in completed_story_ids
+        )
+
+    def _skip_completed_story_ids(self):
+        while self._next_id >= self.to_id and (
+                self._next_id in self._completed_story_ids or
+                not self._in_shard(self._next_id)):
+            self._completed_story_ids.discard(self._next_id)
+            self._next_id -= 1
+
+    def _story_completed(self, story_id):
+        self._completed_story_ids.add(story_id)
+        self._skip_completed_story_ids()
+
+        self._retrieved_item_count += 1
+        if self._retrieved_item_count % self.progress_interval == 0:
+            logger.info(
+                "backfill retrieved %d items, next item id is %d",
+                self._retrieved_item_count,
+                self._next_id
+            )
+
+    def _create_story_item(self, story_id, story_data):
+        # most of the items are comments so they are skipped without
+        # logging a warning for each one of them
+        if not story_data or story_data.get("type") != "story":
+            return None
+
+        return super(BackfillHackernewsStories, self)._create_story_item(
+            story_id, story_data)
+
+
+class AsyncHackernewsStories(HackernewsStories):
+    """Hackernews source that retrieves the items using asyncio
+
+    The items method of this source returns an async generator. The number of
+    requests that can be in flight at the same time is controlled by the
+    workers attribute.
+    """
+
+    def __init__(self,
+                 hackernews_api_url="https://hacker-news.firebaseio.com"):
+        if aiohttp is None:
+            raise SourceError("aiohttp is required for the async source")
+
+        super(AsyncHackernewsStories, self).__init__(hackernews_api_url)
+
+    async def _throttle_async(self):
+        if self._rate_limiter is None:
+            return
+
+        sleep_for = self._rate_limiter.reserve()
+
+        if sleep_for > 0.0:
+            logger.info("sleeping due to throttling for %f seconds", sleep_for)
+            await asyncio.sleep(sleep_for)
+
+    async def _execute_item_request(self, session, item_url):
+        async with session.get(item_url) as response:
+            if response.status == 429 or response.status >= 500:
+                response.raise_for_status()
+
+            return await response.json(content_type=None)
+
+    async def _get_story_data_async(self, session, story_id):
+        logger.info("Fetching hackernews item %d", story_id)
+
         failure_count = 0
 
         while True:
-            self._last_request_time = time()
             item_url = urljoin(
                 self._hackernews_api_url, f"/v0/item/{story_id}.json")
 
             try:
-                response = requests.get(item_url, timeout=self.request_timeout)
+                story_data = await self._execute_item_request(
+                    session, item_url)
+                self._request_succeeded()
 
-                return response.json()
-            except requests.RequestException as e:
+                return story_data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 logger.exception("Failed to fetch story %d", story_id)
+                self._request_failed()
 
                 failure_count += 1
                 if failure_count > self.abort_after:
@@ -141,26 +892,115 @@ class HackernewsStories(Source):
                         "has been reached: story_id(%s)", story_id)
                     raise RetryCountExceeded() from e
 
-                sleep(self.backoff_time)
-
-    def items(self):
-        story_ids = self._get_new_stories()
-
-        for story_id in story_ids:
-            self._throttle()
-            story_data = self._get_story_data(story_id)
-
-            if not is_story_item(story_data):
-                logger.warning("Hackernews item with id %d is not a story",
-                               story_id)
-                continue
-
-            schema = HackernewsStorySchema()
-            try:
-                story = schema.load(story_data)
-            except ValidationError as e:
-                logger.warning(
-                    "failed to deserialize story item: error(%s)", e)
-                continue
-
-            yield story
+                await asyncio.sleep(add_jitter(self.backoff_time, 0.1))
+
+    async def _fetch_item_async(self, session, semaphore, story_id):
+        async with semaphore:
+            await self._throttle_async()
+
+            return await self._get_story_data_async(session, story_id)
+
+    async def _fetch_items_async(self, session, story_ids):
+        semaphore = asyncio.Semaphore(self.workers)
+        story_ids = iter(story_ids)
+        pending = deque()
+
+        def submit_next():
+            for story_id in story_ids:
+                task = asyncio.ensure_future(
+                    self._fetch_item_async(session, semaphore, story_id))
+                pending.append((story_id, task))
+                return
+
+        try:
+            for _ in range(self.workers * 2):
+                submit_next()
+
+            while pending:
+                if self.preserve_order:
+                    story_id, task = pending.popleft()
+                    story_data = await task
+                else:
+                    done, _ = await asyncio.wait(
+                        [task for _, task in pending],
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                    story_id, task = next(
+                        entry for entry in pending if entry[1] in done)
+                    pending.remove((story_id, task))
+                    story_data = task.result()
+
+                submit_next()
+                yield story_id, story_data
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def items(self):
+        loop = asyncio.get_event_loop()
+
+        # the item id retrieval is a single request so it is executed using
+        # the synchronous implementation
+        story_ids = await loop.run_in_executor(None, self._start_crawl)
+
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        connector = aiohttp.TCPConnector(limit=self.workers)
+
+        async with aiohttp.ClientSession(
+                timeout=timeout, connector=connector) as session:
+            async for story_id, story_data in self._fetch_items_async(
+                    session, story_ids):
+                story = self._create_story_item(story_id, story_data)
+                self._story_completed(story_id)
+
+                if story is not None:
+                    yield story
+
+
+def create_source(config, session=None):
+    """Create the hackernews source that is selected in the configuration
+
+    :param dict config: the source configuration
+    :param Session session: the sqlalchemy session for the sources that use
+        the saved stories
+    :rtype: Source
+    :return: the configured source object
+    """
+    sources = {
+        ("newstories", False): HackernewsStories,
+        ("newstories", True): AsyncHackernewsStories,
+        ("incremental", False): IncrementalHackernewsStories,
+        ("prioritized", False): PrioritizedHackernewsStories
+    }
+
+    mode = config.get("CRAWLER_MODE", "newstories")
+    use_async = config.get("CRAWLER_ASYNC", False)
+
+    source_class = sources.get((mode, use_async))
+    if source_class is None:
+        raise SourceError(
+            f"unsupported crawler mode {mode} (async={use_async})")
+
+    if source_class is PrioritizedHackernewsStories:
+        source = source_class(session=session)
+    else:
+        source = source_class()
+
+    source.configure(config)
+
+    return source
+
+
+def create_backfill_source(config, from_id=None, to_id=1):
+    """Create the source that retrieves the stories in a range of item ids
+
+    :param dict config: the source configuration
+    :param int from_id: the largest item id to retrieve
+    :param int to_id: the smallest item id to retrieve
+    :rtype: BackfillHackernewsStories
+    :return: the configured source object
+    """
+    source = BackfillHackernewsStories(from_id=from_id, to_id=to_id)
+    source.configure(config)
+
+    return source
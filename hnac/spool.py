@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import struct
+from threading import Lock
+
+from hnac.helpers import load_json_file, save_json_file
+from hnac.messages import RawMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+_RECORD_HEADER = struct.Struct(">II")
+_SEGMENT_EXTENSION = ".spool"
+_POSITION_FILENAME = "position.json"
+
+
+class MessageSpool(object):
+    """Append only on disk message queue
+
+    The messages are appended to segment files. A new segment is started
+    every time the spool is opened and when the current segment has reached
+    its maximum size. The segments are deleted once all their messages have
+    been committed. The read position is persisted so that the messages are
+    replayed in order after a restart.
+    """
+
+    def __init__(self, directory, segment_size=1000):
+        """Create a new MessageSpool object
+
+        :param str directory: the directory of the segment files
+        :param int segment_size: the maximum number of messages in a segment
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+
+        self._lock = Lock()
+        self._segments = []
+        self._write_file = None
+        self._write_count = 0
+        self._read_position = (None, 0)
+
+        self._open()
+
+    def _segment_filename(self, segment):
+        return os.path.join(
+            self.directory,
+            "{:020d}{}".format(segment, _SEGMENT_EXTENSION)
+        )
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._segments = sorted(
+            int(filename[:-len(_SEGMENT_EXTENSION)])
+            for filename in os.listdir(self.directory)
+            if filename.endswith(_SEGMENT_EXTENSION)
+        )
+
+        position = load_json_file(
+            os.path.join(self.directory, _POSITION_FILENAME))
+
+        if position is not None and position["segment"] in self._segments:
+            self._read_position = (position["segment"], position["offset"])
+        elif self._segments:
+            self._read_position = (self._segments[0], 0)
+
+        if self._segments:
+            logger.info("found %d spool segments", len(self._segments))
+
+        # the last segment of the previous run might end with a partially
+        # written message, so it is never appended to
+        self._start_segment()
+
+    def _start_segment(self):
+        if self._write_file is not None:
+            self._write_file.close()
+
+        segment = self._segments[-1] + 1 if self._segments else 0
+
+        self._write_file = open(self._segment_filename(segment), "ab")
+        self._write_count = 0
+        self._segments.append(segment)
+
+        if self._read_position[0] is None:
+            self._read_position = (segment, 0)
+
+    def close(self):
+        """Close the spool"""
+        with self._lock:
+            if self._write_file is not None:
+                self._write_file.close()
+                self._write_file = None
+
+    def is_empty(self):
+        """Check if there are no messages in the spool
+
+        :rtype: bool
+        :return: True if the spool is empty
+        """
+        with self._lock:
+            segment, offset = self._read_position
+
+            return (
+                segment == self._segments[-1]
+                and offset >= self._write_file.tell()
+            )
+
+    def append(self, message):
+        """Append a message to the spool
+
+        :param MessageBase message: the message to append
+        """
+        body = message.dumps()
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        header = json.dumps({
+            "routing_key": message.routing_key,
+            "content_type": message.content_type
+        })
+        header = header.encode("utf-8")
+
+        with self._lock:
+            if self._write_count >= self.segment_size:
+                self._start_segment()
+
+            self._write_file.write(
+                _RECORD_HEADER.pack(len(header), len(body)) + header + body)
+            self._write_file.flush()
+            os.fsync(self._write_file.fileno())
+
+            self._write_count += 1
+
+    def _read_segment(self, segment, offset, max_messages):
+        messages = []
+
+        with open(self._segment_filename(segment), "rb") as f:
+            f.seek(offset)
+
+            while len(messages) < max_messages:
+                record_header = f.read(_RECORD_HEADER.size)
+                if len(record_header) < _RECORD_HEADER.size:
+                    break
+
+                header_size, body_size = _RECORD_HEADER.unpack(record_header)
+                header = f.read(header_size)
+                body = f.read(body_size)
+
+                if len(header) < header_size or len(body) < body_size:
+                    logger.warning(
+                        "found truncated message in spool segment %d",
+                        segment
+                    )
+                    break
+
+                header = json.loads(header.decode("utf-8"))
+                messages.append(RawMessage(
+                    body,
+                    routing_key=header["routing_key"],
+                    content_type=header.get("content_type")
+                ))
+
+                offset = f.tell()
+
+        return messages, offset
+
+    def read(self, max_messages):
+        """Read the oldest messages of the spool
+
+        The messages remain in the spool until they are committed.
+
+        :param int max_messages: the maximum number of messages to read
+        :rtype: tuple
+        :return: the list with the messages and the position to commit
+        """
+        with self._lock:
+            self._write_file.flush()
+
+            segment, offset = self._read_position
+
+            while True:
+                messages, offset = self._read_segment(
+                    segment, offset, max_messages)
+
+                if messages or segment == self._segments[-1]:
+                    return messages, (segment, offset)
+
+                # the segment has been consumed
+                segment = self._segments[self._segments.index(segment) + 1]
+                offset = 0
+
+    def commit(self, position):
+        """Remove the messages before the given position from the spool
+
+        :param tuple position: the position that was returned by read
+        """
+        segment, offset = position
+
+        with self._lock:
+            while self._segments[0] < segment:
+                os.remove(self._segment_filename(self._segments.pop(0)))
+
+            self._read_position = position
+
+            save_json_file(
+                os.path.join(self.directory, _POSITION_FILENAME),
+                {"segment": segment, "offset": offset}
+            )
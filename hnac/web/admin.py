@@ -25,6 +25,14 @@ class ReportModelView(AuthorizedModelView):
     can_delete = True
 
 
+class TokenModelView(AuthorizedModelView):
+    can_create = False
+    can_edit = True
+    can_delete = True
+    column_exclude_list = ["value"]
+    form_columns = ["active"]
+
+
 class AuthenticatedIndexView(AdminIndexView):
     @expose('/')
     def index(self):
@@ -11,4 +11,5 @@ api = Api(blueprint)
 api.add_resource(stories.Stories, "/stories")
 api.add_resource(stories.StoryDetails, "/story/<int:story_id>")
 api.add_resource(stories.StorySearch, "/stories/search")
+api.add_resource(stories.StoryExport, "/stories/export")
 api.add_resource(urls.UrlStories, "/url/stories")
@@ -7,11 +7,20 @@ story_list_query_parser.add_argument(
     "order_by", default="id", choices=("id", "time", "score"))
 story_list_query_parser.add_argument(
     "desc", type=inputs.boolean, default=False)
+story_list_query_parser.add_argument("cursor", type=str)
 
 
 story_search_query_parser = story_list_query_parser.copy()
 story_search_query_parser.add_argument("q", type=str, required=True)
 
 
+story_export_query_parser = reqparse.RequestParser()
+story_export_query_parser.add_argument("q", type=str, required=True)
+story_export_query_parser.add_argument(
+    "order_by", default="id", choices=("id", "time", "score"))
+story_export_query_parser.add_argument(
+    "desc", type=inputs.boolean, default=False)
+
+
 url_stories_query_parser = reqparse.RequestParser()
 url_stories_query_parser.add_argument("url", type=str, required=True)
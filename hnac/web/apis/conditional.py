@@ -0,0 +1,110 @@
+from hashlib import sha1
+
+from flask import Response, request
+from flask_restful import marshal
+from werkzeug.http import http_date, quote_etag
+
+from hnac.web.apis import models
+
+
+def story_validators(stories):
+    """Calculate the validators of a response that contains stories
+
+    :param list[Story] stories: the stories of the response
+    :rtype: tuple
+    :return: the weak etag and the last modification date of the stories.
+        The date is None if there aren't any stories
+    """
+    versions = ",".join(
+        "{}:{}".format(story.id, story.updated_at.isoformat())
+        for story in stories
+    )
+
+    etag = sha1(versions.encode("utf-8")).hexdigest()
+
+    last_modified = max(
+        (story.updated_at for story in stories),
+        default=None
+    )
+
+    return etag, last_modified
+
+
+def validator_headers(etag, last_modified):
+    """Create the ETag and Last-Modified headers
+
+    :param str etag: the weak etag of the response
+    :param datetime last_modified: the last modification date in UTC
+    :rtype: dict
+    :return: the response headers
+    """
+    headers = {"ETag": quote_etag(etag, weak=True)}
+
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+
+    return headers
+
+
+def is_not_modified(etag, last_modified):
+    """Check if the client already has the current version of the response
+
+    :param str etag: the weak etag of the response
+    :param datetime last_modified: the last modification date in UTC
+    :rtype: bool
+    :return: True if the response hasn't been modified
+    """
+    # the If-Modified-Since header is ignored when If-None-Match is given
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+
+    if request.if_modified_since is None or last_modified is None:
+        return False
+
+    # the http dates don't contain fractions of seconds
+    return last_modified.replace(microsecond=0) <= request.if_modified_since
+
+
+def not_modified_response(etag, last_modified):
+    """Create a 304 Not Modified response
+
+    :param str etag: the weak etag of the response
+    :param datetime last_modified: the last modification date in UTC
+    :rtype: Response
+    :return: the response
+    """
+    return Response(
+        status=304,
+        headers=validator_headers(etag, last_modified)
+    )
+
+
+def story_response(stories, many=True, headers=None):
+    """Create the response of a story resource
+
+    The stories are only marshalled when the client doesn't already have
+    their current version.
+
+    :param list[Story] stories: the stories of the response
+    :param bool many: return a list of stories instead of the first story
+    :param dict headers: additional response headers
+    :rtype: tuple|Response
+    :return: the response
+    """
+    etag, last_modified = story_validators(stories)
+
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    stories_data = [
+        story.as_dict()
+        for story in stories
+    ]
+
+    if not many:
+        stories_data = stories_data[0]
+
+    response_headers = validator_headers(etag, last_modified)
+    response_headers.update(headers or {})
+
+    return marshal(stories_data, models.story), 200, response_headers
@@ -1,25 +1,105 @@
+import json
 import logging
 
-from flask_restful import Resource, marshal_with, abort
+from flask import (
+    Response, current_app, request, stream_with_context, url_for
+)
+from flask_restful import Resource, abort
 from flask_uauth.decorators import authentication_required
 
 from hnac.web.apis.arguments import (
-    story_list_query_parser, story_search_query_parser
+    story_list_query_parser, story_search_query_parser,
+    story_export_query_parser
 )
-from hnac.web.apis import models
+from hnac.web.apis.conditional import story_response
 from hnac.web.database import db
 from hnac.models import Story
+from hnac.web.queries.cursors import decode_cursor, encode_cursor
 from hnac.web.queries.parsers import parse_query_argument, parse_data_types
 from hnac.exceptions import (
-    UnsupportedSearchOperation, InvalidQueryParsingOperation
+    UnsupportedSearchOperation, InvalidQueryParsingOperation, InvalidCursor
 )
 
 
 logger = logging.getLogger(__name__)
 
 
+def _parse_cursor(args):
+    """Get the position of the last story of the previous page
+
+    :param Namespace args: the request arguments
+    :rtype: tuple|None
+    :return: the value of the ordering column and the id of the last story or
+        None if the request doesn't contain a cursor
+    """
+    if args.cursor is None:
+        return None
+
+    try:
+        return decode_cursor(args.cursor, args.order_by, args.desc)
+    except InvalidCursor:
+        return abort(
+            400,
+            error="invalid cursor",
+            cursor=args.cursor
+        )
+
+
+def _next_page_headers(stories, args, order_column):
+    """Create the headers that point to the next page of stories
+
+    :param list[Story] stories: the stories of the current page
+    :param Namespace args: the request arguments
+    :param Column order_column: the column the stories are ordered by
+    :rtype: dict
+    :return: the response headers
+    """
+    # a page that isn't full is the last one
+    if not stories or len(stories) < args.limit:
+        return {}
+
+    last_story = stories[-1]
+    next_cursor = encode_cursor(
+        order_by=args.order_by,
+        sort_desc=args.desc,
+        value=getattr(last_story, order_column.key),
+        id=last_story.id
+    )
+
+    # the cursor replaces the offset of the current request
+    query_arguments = request.args.to_dict()
+    query_arguments.pop("offset", None)
+    query_arguments["cursor"] = next_cursor
+
+    next_url = url_for(request.endpoint, _external=True, **query_arguments)
+
+    return {
+        "Link": '<{}>; rel="next"'.format(next_url),
+        "X-Next-Cursor": next_cursor
+    }
+
+
+def _parse_search_criteria(query_string):
+    try:
+        query_arguments = parse_query_argument(query_string)
+    except InvalidQueryParsingOperation as e:
+        return abort(
+            400,
+            error="failed to parse query item",
+            operation=e.operation
+        )
+
+    return parse_data_types(
+        query_arguments=query_arguments,
+        datatype_mapping={
+            "time": int,
+            "score": int,
+            "story_id": int
+        }
+    )
+
+
 class Stories(Resource):
-    @marshal_with(models.story)
     @authentication_required
     def get(self):
         args = story_list_query_parser.parse_args()
@@ -33,22 +113,23 @@ class Stories(Resource):
             "score": Story.score
         }
 
+        order_column = order_by_mappings[args.order_by]
+
         stories = Story.get_stories(
             session=db.session,
             offset=args.offset,
             limit=args.limit,
-            order_by=order_by_mappings[args.order_by],
-            sort_desc=args.desc
+            order_by=order_column,
+            sort_desc=args.desc,
+            after=_parse_cursor(args)
         )
 
-        return [
-            story.as_dict()
-            for story in stories
-        ]
+        headers = _next_page_headers(stories, args, order_column)
+
+        return story_response(stories, headers=headers)
 
 
 class StoryDetails(Resource):
-    @marshal_with(models.story)
     @authentication_required
     def get(self, story_id):
         logger.info("retrieving story with id %s", story_id)
@@ -64,32 +145,54 @@ class StoryDetails(Resource):
                 story_id=story_id
             )
 
-        return story.as_dict()
+        return story_response([story], many=False)
 
 
 class StorySearch(Resource):
-    @marshal_with(models.story)
     @authentication_required
     def get(self):
         args = story_search_query_parser.parse_args()
 
+        query_arguments = _parse_search_criteria(args.q)
+
+        order_mapping = {
+            "id": Story.id,
+            "time": Story.time,
+            "score": Story.score
+        }
+
+        order_column = order_mapping[args.order_by]
+        after = _parse_cursor(args)
+
         try:
-            query_arguments = parse_query_argument(args.q)
-        except InvalidQueryParsingOperation as e:
+            stories = Story.search(
+                session=db.session,
+                criteria=query_arguments,
+                offset=args.offset,
+                limit=args.limit,
+                order_by=order_column,
+                sort_desc=args.desc,
+                after=after
+            )
+        except UnsupportedSearchOperation as e:
             return abort(
                 400,
-                error="failed to parse query item",
-                operation=e.operation
+                error="unsupported search operation",
+                operation=e.operation,
+                variable=e.variable
             )
 
-        query_arguments = parse_data_types(
-            query_arguments=query_arguments,
-            datatype_mapping={
-                "time": int,
-                "score": int,
-                "story_id": int
-            }
-        )
+        headers = _next_page_headers(stories, args, order_column)
+
+        return story_response(stories, headers=headers)
+
+
+class StoryExport(Resource):
+    @authentication_required
+    def get(self):
+        args = story_export_query_parser.parse_args()
+
+        query_arguments = _parse_search_criteria(args.q)
 
         order_mapping = {
             "id": Story.id,
@@ -97,14 +200,16 @@ class StorySearch(Resource):
             "score": Story.score
         }
 
+        # the query is created before the response starts so that invalid
+        # searches can still be rejected with an error status
         try:
-            stories = Story.search(
+            stories = Story.yield_search_results(
                 session=db.session,
                 criteria=query_arguments,
-                offset=args.offset,
-                limit=args.limit,
                 order_by=order_mapping[args.order_by],
-                sort_desc=args.desc
+                sort_desc=args.desc,
+                items_per_batch=current_app.config.get(
+                    "API_EXPORT_BATCH_SIZE", 1000)
             )
         except UnsupportedSearchOperation as e:
             return abort(
@@ -114,7 +219,13 @@ class StorySearch(Resource):
                 variable=e.variable
             )
 
-        return [
-            story.as_dict()
-            for story in stories
-        ]
+        logger.info("exporting stories q=%s", args.q)
+
+        def generate_lines():
+            for story in stories:
+                yield "{}\n".format(json.dumps(story.as_dict()))
+
+        return Response(
+            stream_with_context(generate_lines()),
+            mimetype="application/x-ndjson"
+        )
@@ -5,10 +5,10 @@ from hnac.web.database import db
 from hnac.web.apis import api_v1
 from hnac.web import views
 from hnac.web.authentication import (
-    login_manager, uauth, authentication_callback
+    login_manager, uauth, authentication_callback, token_cache
 )
-from hnac.models import User, Report
-from hnac.web.admin import (ReportModelView, UserModelView,
+from hnac.models import User, Report, Token
+from hnac.web.admin import (ReportModelView, UserModelView, TokenModelView,
                             AuthenticatedIndexView)
 from hnac.logging import configure_logging
 
@@ -25,12 +25,14 @@ def create_app():
     login_manager.login_view = "frontend.login"
 
     uauth.init_app(app, authentication_callback)
+    token_cache.init_app(app)
 
     admin = Admin(app, name="admin", template_mode='bootstrap3',
                   index_view=AuthenticatedIndexView())
 
     admin.add_view(UserModelView(User, db.session, endpoint="users"))
     admin.add_view(ReportModelView(Report, db.session, endpoint="reports"))
+    admin.add_view(TokenModelView(Token, db.session, endpoint="tokens"))
 
     app.register_blueprint(api_v1.blueprint, url_prefix="/api/v1")
     app.register_blueprint(views.blueprint)
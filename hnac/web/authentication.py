@@ -1,12 +1,134 @@
+from threading import Lock
+from time import monotonic
+
 from flask_login import LoginManager
+from flask_uauth.mixins import TokenMixin
 from flask_uauth.uauth import UAuth
+from sqlalchemy import event, inspect
 
-from hnac.models import User, Token
+from hnac.caches import TTLCache
+from hnac.models import User, Token, TokenRevision
 from hnac.web.database import db
 
 
+class CachedToken(TokenMixin):
+    """Copy of the state of a token that doesn't depend on a session"""
+
+    def __init__(self, id, name, value, active):
+        self.id = id
+        self.name = name
+        self.value = value
+        self.active = active
+
+    @classmethod
+    def from_token(cls, token):
+        return cls(
+            id=token.id,
+            name=token.name,
+            value=token.value,
+            active=token.active
+        )
+
+
+class TokenCache(object):
+    """Cache of the tokens used to authenticate the API requests
+
+    The unknown token values are cached as well. The cached tokens are
+    invalidated when a transaction that created, modified or deleted a token
+    is committed by this process. The changes that are made by other
+    processes are detected using the token revision, which is checked at most
+    once per revision check interval.
+    """
+
+    _missing = object()
+
+    def __init__(self, clock=monotonic):
+        """Create a new TokenCache object
+
+        :param callable clock: the function that returns the current time
+        """
+        self.revision_check_interval = 0.0
+
+        self._tokens = None
+        self._clock = clock
+        self._revision = None
+        self._revision_checked_at = None
+        self._revision_lock = Lock()
+
+    def init_app(self, app):
+        """Initialize the token cache
+
+        :param Flask app: the Flask object on which to use
+        """
+        self._tokens = TTLCache(
+            max_size=app.config.get("API_TOKEN_CACHE_SIZE", 10000),
+            ttl=app.config.get("API_TOKEN_CACHE_TTL", 30.0),
+            clock=self._clock
+        )
+
+        self.revision_check_interval = app.config.get(
+            "API_TOKEN_CACHE_REVISION_CHECK_INTERVAL", 2.0)
+
+        self._revision = None
+        self._revision_checked_at = None
+
+    @property
+    def enabled(self):
+        return self._tokens is not None and self._tokens.ttl > 0
+
+    def _check_revision(self, session):
+        with self._revision_lock:
+            now = self._clock()
+
+            if (self._revision_checked_at is not None
+                    and now - self._revision_checked_at
+                    < self.revision_check_interval):
+                return
+
+            revision = TokenRevision.get(session)
+            if revision != self._revision:
+                self._tokens.clear()
+                self._revision = revision
+
+            self._revision_checked_at = now
+
+    def get_by_value(self, session, value):
+        """Get a token
+
+        :param Session session: the sqlalchemy session
+        :param str value: the token value
+        :rtype: CachedToken|Token|None
+        :return: the token or None if it doesn't exist
+        """
+        if not self.enabled:
+            return Token.get_by_value(session, value)
+
+        self._check_revision(session)
+
+        token = self._tokens.get(value, self._missing)
+        if token is not self._missing:
+            return token
+
+        token = Token.get_by_value(session, value)
+        if token is not None:
+            token = CachedToken.from_token(token)
+
+        self._tokens.set(value, token)
+
+        return token
+
+    def invalidate(self, value):
+        """Remove a token from the cache
+
+        :param str value: the token value
+        """
+        if self._tokens is not None:
+            self._tokens.remove(value)
+
+
 uauth = UAuth()
 login_manager = LoginManager()
+token_cache = TokenCache()
 
 
 @login_manager.user_loader
@@ -15,4 +137,33 @@ def load_user(user_id):
 
 
 def authentication_callback(authorization_value):
-    return Token.get_by_value(db.session, authorization_value)
+    return token_cache.get_by_value(db.session, authorization_value)
+
+
+@event.listens_for(Token, "after_insert")
+@event.listens_for(Token, "after_update")
+@event.listens_for(Token, "after_delete")
+def record_modified_token(mapper, connection, target):
+    # the other processes detect the change when the transaction is committed
+    TokenRevision.increment(connection)
+
+    session = inspect(target).session
+    if session is None:
+        return
+
+    values = session.info.setdefault("modified_token_values", set())
+    values.add(target.value)
+
+    # the previous value of a token whose value was changed
+    values.update(inspect(target).attrs.value.history.deleted)
+
+
+@event.listens_for(db.session, "after_commit")
+def invalidate_cached_tokens(session):
+    for value in session.info.pop("modified_token_values", ()):
+        token_cache.invalidate(value)
+
+
+@event.listens_for(db.session, "after_rollback")
+def discard_modified_tokens(session):
+    session.info.pop("modified_token_values", None)
@@ -0,0 +1,56 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+import json
+
+from hnac.exceptions import InvalidCursor
+
+
+def encode_cursor(order_by, sort_desc, value, id):
+    """Create an opaque pagination cursor
+
+    :param str order_by: the name of the ordering of the results
+    :param bool sort_desc: True if the results are in descending order
+    :param value: the value of the ordering column of the last result
+    :param int id: the id of the last result
+    :rtype: str
+    :return: the cursor
+    """
+    data = json.dumps(
+        [order_by, sort_desc, value, id],
+        separators=(",", ":")
+    )
+
+    # the padding is dropped so that the cursor doesn't need to be escaped
+    # in the urls
+    cursor = urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+    return cursor.rstrip("=")
+
+
+def decode_cursor(cursor, order_by, sort_desc):
+    """Decode a pagination cursor
+
+    :param str cursor: the cursor
+    :param str order_by: the name of the ordering of the requested results
+    :param bool sort_desc: True if the requested results are in descending
+        order
+    :rtype: tuple
+    :return: the value of the ordering column and the id of the last result
+        of the previous page
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        data = json.loads(urlsafe_b64decode(cursor + padding))
+        cursor_order_by, cursor_sort_desc, value, id = data
+    except (BinasciiError, UnicodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+    if cursor_order_by != order_by or cursor_sort_desc != sort_desc:
+        raise InvalidCursor(cursor)
+
+    # all the columns the stories can be ordered by are integers
+    for key in (value, id):
+        if not isinstance(key, int) or isinstance(key, bool):
+            raise InvalidCursor(cursor)
+
+    return value, id
@@ -19,21 +19,20 @@ def dump_stories(f, args):
         "limit": args.limit,
         "q": "time__gte={}+time__lte={}".format(args.start_time, args.end_time)
     }
-    offset = 0
 
     while True:
-        params["offset"] = offset
         response = requests.get(
             urljoin(args.api, STORIES_SEARCH_ENDPOINT),
             params=params,
             headers=headers
         )
         stories = response.json()
-        if not stories:
-            break
         for story in stories:
             f.write("{}\n".format(json.dumps(story)))
-        offset += args.limit
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params["cursor"] = next_cursor
 
 
 def get_arguments():
@@ -1,6 +1,10 @@
+from contextlib import contextmanager
+from datetime import datetime
 from unittest import main
+from unittest.mock import patch
 import json
 
+from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
 
 from hnac.models import Story, Url, HackernewsUser
@@ -115,6 +119,98 @@ class StoryEndpointTest(WebTestCaseWithUserAccount):
             }
         )
 
+    def test_get_story_with_validators(self):
+        response = self.client.get(
+            "/api/v1/story/1234",
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["ETag"].startswith('W/"'))
+        self.assertIn("Last-Modified", response.headers)
+
+    def test_get_unmodified_story_with_etag(self):
+        response = self.client.get(
+            "/api/v1/story/1234",
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+        etag = response.headers["ETag"]
+
+        with patch.object(Story, "as_dict") as as_dict_mock:
+            response = self.client.get(
+                "/api/v1/story/1234",
+                headers={
+                    "Authorization": self.test_token,
+                    "If-None-Match": etag
+                }
+            )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+        as_dict_mock.assert_not_called()
+
+    def test_get_unmodified_story_with_last_modified_date(self):
+        response = self.client.get(
+            "/api/v1/story/1234",
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+        last_modified = response.headers["Last-Modified"]
+
+        response = self.client.get(
+            "/api/v1/story/1234",
+            headers={
+                "Authorization": self.test_token,
+                "If-Modified-Since": last_modified
+            }
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            "/api/v1/story/1234",
+            headers={
+                "Authorization": self.test_token,
+                "If-Modified-Since": "Mon, 01 Jan 2018 00:00:00 GMT"
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_modified_story(self):
+        response = self.client.get(
+            "/api/v1/story/1234",
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+        etag = response.headers["ETag"]
+
+        with self.app.app_context():
+            story = Story.get_by_story_id(db.session, 1234)
+            story.score = 25
+            story.updated_at = datetime.utcnow()
+            db.session.commit()
+
+        response = self.client.get(
+            "/api/v1/story/1234",
+            headers={
+                "Authorization": self.test_token,
+                "If-None-Match": etag
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        data = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(data["score"], 25)
+
 
 class StoriesEndpointTest(WebTestCaseWithUserAccount):
     def setUp(self):
@@ -506,6 +602,106 @@ class StoriesEndpointTest(WebTestCaseWithUserAccount):
             }
         )
 
+    def test_get_stories_with_cursor(self):
+        query_string = {
+            "limit": 2,
+            "order_by": "time",
+            "desc": "true"
+        }
+
+        response = self.client.get(
+            "/api/v1/stories",
+            query_string=query_string,
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data.decode("utf-8"))
+        self.assertEqual([story["id"] for story in data], [2222, 3333])
+
+        next_cursor = response.headers["X-Next-Cursor"]
+        self.assertIn("cursor={}".format(next_cursor),
+                      response.headers["Link"])
+        self.assertTrue(response.headers["Link"].endswith('; rel="next"'))
+
+        response = self.client.get(
+            "/api/v1/stories",
+            query_string=dict(query_string, cursor=next_cursor),
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data.decode("utf-8"))
+        self.assertEqual([story["id"] for story in data], [1111])
+        self.assertNotIn("X-Next-Cursor", response.headers)
+        self.assertNotIn("Link", response.headers)
+
+    def test_get_unmodified_stories(self):
+        response = self.client.get(
+            "/api/v1/stories",
+            query_string={
+                "limit": 2
+            },
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+        etag = response.headers["ETag"]
+
+        response = self.client.get(
+            "/api/v1/stories",
+            query_string={
+                "limit": 2
+            },
+            headers={
+                "Authorization": self.test_token,
+                "If-None-Match": etag
+            }
+        )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+        # a different page of the same stories has a different etag
+        response = self.client.get(
+            "/api/v1/stories",
+            query_string={
+                "limit": 3
+            },
+            headers={
+                "Authorization": self.test_token,
+                "If-None-Match": etag
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_fail_to_get_stories_with_invalid_cursor(self):
+        response = self.client.get(
+            "/api/v1/stories",
+            query_string={
+                "cursor": "invalid"
+            },
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.data.decode("utf-8"))
+        self.assertDictEqual(
+            data,
+            {
+                "error": "invalid cursor",
+                "cursor": "invalid"
+            }
+        )
+
 
 class StorySearchEndpointTest(WebTestCaseWithUserAccount):
     def setUp(self):
@@ -742,6 +938,36 @@ class StorySearchEndpointTest(WebTestCaseWithUserAccount):
             ]
         )
 
+    def test_search_with_cursor(self):
+        query_string = {
+            "q": "username=user_1",
+            "limit": 2,
+            "order_by": "score",
+            "desc": "true"
+        }
+
+        story_ids = []
+
+        while True:
+            response = self.client.get(
+                "/api/v1/stories/search",
+                query_string=query_string,
+                headers={
+                    "Authorization": self.test_token
+                }
+            )
+
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data.decode("utf-8"))
+            story_ids.extend(story["id"] for story in data)
+
+            if "X-Next-Cursor" not in response.headers:
+                break
+
+            query_string["cursor"] = response.headers["X-Next-Cursor"]
+
+        self.assertEqual(story_ids, [1, 2, 4, 5])
+
     def test_invalid_search_argument(self):
         response = self.client.get(
             "/api/v1/stories/search",
@@ -768,6 +994,117 @@ class StorySearchEndpointTest(WebTestCaseWithUserAccount):
         )
 
 
+class StoryExportEndpointTest(WebTestCaseWithUserAccount):
+    def setUp(self):
+        super(StoryExportEndpointTest, self).setUp()
+
+        with self.app.app_context():
+            load_stories_1(db.session)
+
+            try:
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                self.fail("failed to create mock data")
+
+    def test_export_requires_authentication(self):
+        response = self.client.get(
+            "/api/v1/stories/export",
+            query_string={
+                "q": "username=user_1"
+            }
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_export(self):
+        response = self.client.get(
+            "/api/v1/stories/export",
+            query_string={
+                "q": "username=user_1+score__gte=5",
+                "order_by": "score",
+                "desc": "true"
+            },
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+
+        lines = response.data.decode("utf-8").splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {
+                    'by': 'user_1',
+                    'descendants': 0,
+                    'id': 1,
+                    'score': 15,
+                    'time': 1529613984,
+                    'title': 'story 1',
+                    'url': 'http://www.example.com/page_1'
+                },
+                {
+                    'by': 'user_1',
+                    'descendants': 1,
+                    'id': 2,
+                    'score': 10,
+                    'time': 1529613980,
+                    'title': 'story 2',
+                    'url': 'http://www.example.com/page_2'
+                },
+                {
+                    'by': 'user_1',
+                    'descendants': 3,
+                    'id': 4,
+                    'score': 7,
+                    'time': 1529613970,
+                    'title': 'story 4',
+                    'url': 'http://www.example.com/page_4'
+                }
+            ]
+        )
+
+    def test_export_without_results(self):
+        response = self.client.get(
+            "/api/v1/stories/export",
+            query_string={
+                "q": "username=unknown_user"
+            },
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"")
+
+    def test_fail_to_export_with_unsupported_search_operation(self):
+        response = self.client.get(
+            "/api/v1/stories/export",
+            query_string={
+                "q": "title=story"
+            },
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.data.decode("utf-8"))
+        self.assertDictEqual(
+            data,
+            {
+                "error": "unsupported search operation",
+                "operation": "eq",
+                "variable": "title"
+            }
+        )
+
+
 class UrlStoriesEndpointTests(WebTestCaseWithUserAccount):
     def setUp(self):
         super(UrlStoriesEndpointTests, self).setUp()
@@ -856,5 +1193,104 @@ class UrlStoriesEndpointTests(WebTestCaseWithUserAccount):
         )
 
 
+class QueryCountTests(WebTestCaseWithUserAccount):
+    def setUp(self):
+        super(QueryCountTests, self).setUp()
+
+        with self.app.app_context():
+            load_stories_1(db.session)
+
+            # several stories of different users that share a url
+            url = Url.get_by_url(db.session, "http://www.example.com/page_1")
+            for story_id in range(6, 10):
+                hackernews_user = HackernewsUser.create(
+                    db.session, "user_{}".format(story_id))
+                Story.create(
+                    session=db.session,
+                    user=hackernews_user,
+                    url=url,
+                    story_id=story_id,
+                    title="story {}".format(story_id),
+                    score=story_id,
+                    time=1529614000 + story_id,
+                    descendants=0
+                )
+
+            try:
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                self.fail("failed to create mock data")
+
+    @contextmanager
+    def count_queries(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(
+                engine, "before_cursor_execute", before_cursor_execute)
+
+    def get(self, path, **query_string):
+        response = self.client.get(
+            path,
+            query_string=query_string,
+            headers={
+                "Authorization": self.test_token
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+        return json.loads(response.data.decode("utf-8"))
+
+    def assertConstantQueryCount(self, path, **query_string):
+        # the token lookup of the first request is cached
+        self.get(path, limit=1, **query_string)
+
+        with self.count_queries() as single_story_statements:
+            data = self.get(path, limit=1, **query_string)
+        self.assertEqual(len(data), 1)
+
+        with self.count_queries() as all_stories_statements:
+            data = self.get(path, limit=500, **query_string)
+        self.assertGreater(len(data), 1)
+
+        self.assertEqual(
+            len(single_story_statements), len(all_stories_statements))
+
+    def test_stories_query_count(self):
+        self.assertConstantQueryCount("/api/v1/stories")
+
+    def test_story_search_query_count(self):
+        self.assertConstantQueryCount(
+            "/api/v1/stories/search", q="score__gte=0")
+
+    def test_url_stories_query_count(self):
+        # the token lookup of the first request is cached
+        self.get("/api/v1/url/stories", url="http://www.example.com/page_1")
+
+        with self.count_queries() as statements:
+            data = self.get(
+                "/api/v1/url/stories", url="http://www.example.com/page_1")
+
+        self.assertEqual(len(data), 5)
+        self.assertEqual(
+            sorted(story["by"] for story in data),
+            ["user_1", "user_6", "user_7", "user_8", "user_9"]
+        )
+
+        # the url and the stories with their users
+        self.assertLessEqual(len(statements), 2)
+
+
 if __name__ == "__main__":
     main()
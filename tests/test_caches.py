@@ -0,0 +1,154 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from hnac.caches import LRUCache, TTLCache, FingerprintCache, IdentityCache
+from hnac.models import HackernewsStoryItem
+
+from mock_data import story_1_data
+
+
+class LRUCacheTests(TestCase):
+    def test_get_and_set(self):
+        cache = LRUCache(max_size=2)
+
+        cache.set("a", 1)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_evict_least_recently_used_item(self):
+        cache = LRUCache(max_size=2)
+
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_remove(self):
+        cache = LRUCache(max_size=2)
+
+        cache.set("a", 1)
+        cache.remove("a")
+        cache.remove("b")
+
+        self.assertIsNone(cache.get("a"))
+
+
+class TTLCacheTests(TestCase):
+    def setUp(self):
+        self.now = 100.0
+
+    def clock(self):
+        return self.now
+
+    def test_get_and_set(self):
+        cache = TTLCache(max_size=2, ttl=10.0, clock=self.clock)
+
+        cache.set("a", 1)
+        cache.set("b", None)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b", "default"))
+        self.assertEqual(cache.get("c", "default"), "default")
+
+    def test_expire_items(self):
+        cache = TTLCache(max_size=2, ttl=10.0, clock=self.clock)
+
+        cache.set("a", 1)
+        self.now = 105.0
+        cache.set("b", 2)
+        self.now = 110.0
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_evict_least_recently_used_item(self):
+        cache = TTLCache(max_size=2, ttl=10.0, clock=self.clock)
+
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_remove(self):
+        cache = TTLCache(max_size=2, ttl=10.0, clock=self.clock)
+
+        cache.set("a", 1)
+        cache.remove("a")
+
+        self.assertIsNone(cache.get("a"))
+
+
+class FingerprintCacheTests(TestCase):
+    def test_detect_unchanged_item(self):
+        cache = FingerprintCache()
+        item = HackernewsStoryItem(raw_data=story_1_data, **story_1_data)
+
+        self.assertFalse(cache.is_unchanged(item))
+
+        cache.update(item)
+        self.assertTrue(cache.is_unchanged(item))
+
+        self.assertFalse(cache.is_unchanged(item._replace(score=100)))
+
+    def test_persist_fingerprints(self):
+        item = HackernewsStoryItem(raw_data=story_1_data, **story_1_data)
+
+        with TemporaryDirectory() as directory:
+            filename = join(directory, "fingerprints.json")
+
+            cache = FingerprintCache(filename=filename)
+            cache.update(item)
+            cache.save()
+
+            cache = FingerprintCache(filename=filename)
+            cache.load()
+
+            self.assertTrue(cache.is_unchanged(item))
+
+
+class IdentityCacheTests(TestCase):
+    def test_ids_are_cached_after_commit(self):
+        cache = IdentityCache(max_size=10)
+
+        cache.add("user_1", 1)
+        self.assertEqual(cache.get("user_1"), 1)
+
+        cache.commit()
+        self.assertEqual(cache.get("user_1"), 1)
+        self.assertEqual(cache.hits, 1)
+
+    def test_pending_ids_are_discarded_on_rollback(self):
+        cache = IdentityCache(max_size=10)
+
+        cache.add("user_1", 1)
+        cache.rollback()
+
+        self.assertIsNone(cache.get("user_1"))
+
+    def test_used_ids_are_removed_on_rollback(self):
+        cache = IdentityCache(max_size=10)
+        cache.add("user_1", 1)
+        cache.add("user_2", 2)
+        cache.commit()
+
+        cache.get("user_1")
+        cache.rollback()
+
+        self.assertIsNone(cache.get("user_1"))
+        self.assertEqual(cache.get("user_2"), 2)
+
+
+if __name__ == "__main__":
+    main()
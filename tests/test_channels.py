@@ -0,0 +1,154 @@
+from unittest import TestCase, main
+from unittest.mock import MagicMock, call
+
+from pika.frame import Method
+from pika.spec import Basic
+
+from hnac.channels import ConfirmedMessageChannel, MessageChannel
+from hnac.compression import create_compressor, decompress
+from hnac.messages import RawMessage
+
+
+class MessageChannelTests(TestCase):
+    def setUp(self):
+        self.channel = MagicMock()
+
+        self.message_channel = MessageChannel(
+            channel=self.channel,
+            exchange="stories",
+            routing_key="stories.new",
+            compressor=create_compressor("zlib", threshold=100)
+        )
+
+    def test_compress_large_messages(self):
+        body = "story " * 100
+
+        self.message_channel.publish_message(
+            RawMessage(body, content_type="application/json"))
+
+        kwargs = self.channel.basic_publish.call_args[1]
+        self.assertEqual(kwargs["properties"].content_encoding, "deflate")
+        self.assertEqual(
+            kwargs["properties"].content_type, "application/json")
+        self.assertEqual(
+            decompress(kwargs["body"], "deflate"), body.encode("utf-8"))
+
+    def test_do_not_compress_small_messages(self):
+        self.message_channel.publish_message(RawMessage("story"))
+
+        self.channel.basic_publish.assert_called_once_with(
+            exchange="stories",
+            routing_key="stories.new",
+            body=b"story",
+            properties=None
+        )
+
+
+class ConfirmedMessageChannelTests(TestCase):
+    def setUp(self):
+        self.channel = MagicMock()
+        self.connection = MagicMock()
+
+        self.message_channel = ConfirmedMessageChannel(
+            channel=self.channel,
+            connection=self.connection,
+            exchange="stories",
+            routing_key="stories.new",
+            max_in_flight=2,
+            batch_size=2
+        )
+
+    def confirm(self, method):
+        self.message_channel._on_delivery_confirmation(Method(1, method))
+
+    def test_enable_confirms(self):
+        def confirm_select(ack_nack_callback, callback):
+            callback(MagicMock())
+
+        self.channel._impl.confirm_delivery.side_effect = confirm_select
+
+        self.message_channel.enable_confirms()
+
+        self.channel._impl.confirm_delivery.assert_called_once()
+
+    def test_publish_messages_in_batches(self):
+        self.message_channel.publish_message(RawMessage("message 1"))
+
+        self.channel._impl.basic_publish.assert_not_called()
+
+        self.message_channel.publish_message(RawMessage("message 2"))
+
+        self.assertEqual(self.channel._impl.basic_publish.call_count, 2)
+        self.channel._impl.basic_publish.assert_called_with(
+            exchange="stories",
+            routing_key="stories.new",
+            body="message 2",
+            properties=None
+        )
+        self.assertEqual(self.message_channel.unconfirmed_message_count, 2)
+
+    def test_wait_when_in_flight_window_is_full(self):
+        def process_data_events(time_limit):
+            if time_limit > 0:
+                self.confirm(Basic.Ack(delivery_tag=2, multiple=True))
+
+        self.connection.process_data_events.side_effect = process_data_events
+
+        for i in range(3):
+            self.message_channel.publish_message(RawMessage("message"))
+        self.message_channel.flush()
+
+        self.assertEqual(self.message_channel.unconfirmed_message_count, 1)
+
+    def test_keep_nacked_messages(self):
+        message_1 = RawMessage("message 1")
+        message_2 = RawMessage("message 2")
+
+        self.message_channel.publish_message(message_1)
+        self.message_channel.publish_message(message_2)
+
+        self.confirm(Basic.Nack(delivery_tag=1))
+        self.confirm(Basic.Ack(delivery_tag=2))
+
+        self.assertEqual(self.message_channel.unconfirmed_message_count, 0)
+        self.assertEqual(
+            self.message_channel.pop_nacked_messages(), [message_1])
+        self.assertEqual(self.message_channel.pop_nacked_messages(), [])
+
+    def test_report_confirmed_messages(self):
+        confirm_callback = MagicMock()
+        self.message_channel.confirm_callback = confirm_callback
+
+        message_1 = RawMessage("message 1")
+        message_2 = RawMessage("message 2")
+
+        self.message_channel.publish_message(message_1)
+        self.message_channel.publish_message(message_2)
+
+        self.confirm(Basic.Ack(delivery_tag=1))
+        self.confirm(Basic.Nack(delivery_tag=2))
+
+        self.assertEqual(
+            confirm_callback.call_args_list,
+            [call(message_1, False), call(message_2, True)]
+        )
+
+    def test_wait_for_confirms_timeout(self):
+        self.message_channel.publish_message(RawMessage("message"))
+
+        self.assertFalse(self.message_channel.wait_for_confirms(timeout=0.0))
+        self.assertEqual(self.message_channel.unconfirmed_message_count, 1)
+
+    def test_wait_for_confirms(self):
+        def process_data_events(time_limit):
+            self.confirm(Basic.Ack(delivery_tag=1))
+
+        self.connection.process_data_events.side_effect = process_data_events
+
+        self.message_channel.publish_message(RawMessage("message"))
+
+        self.assertTrue(self.message_channel.wait_for_confirms(timeout=1.0))
+
+
+if __name__ == "__main__":
+    main()
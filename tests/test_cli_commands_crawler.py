@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
+import os
+import signal
 from unittest import main
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from hnac.cli.commands.crawler import Crawl
 from hnac.models import Report as ReportModel
@@ -41,6 +43,7 @@ class CrawlTests(WebTestCase):
             self.assertIsNotNone(report)
 
             self.assertEqual(report.job_id, "this_is_an_uuid")
+            self.assertEqual(mock.call_args[0][4], "crawl-0-1")
             self.assertEqual(report.num_processed_items, 13)
             self.assertTrue(report.failed)
 
@@ -50,6 +53,79 @@ class CrawlTests(WebTestCase):
             completed_at = started_at + timedelta(seconds=30)
             self.assertEqual(report.completed_at, completed_at)
 
+    @patch("hnac.cli.commands.crawler.create_source")
+    @patch("hnac.cli.commands.crawler.create_processors")
+    @patch("hnac.cli.commands.crawler.create_hackernews_api_crawler_job")
+    def test_run_daemon(self, job_mock, processors_mock, source_mock):
+        crawl = Crawl()
+        jobs = []
+
+        def create_job(config, session, processors, source, job_id):
+            job = MagicMock()
+            job.id = "job_{}".format(len(jobs))
+            job.run.return_value = JobExecutionResult(
+                job=job,
+                start_time=datetime(2016, 4, 6, 12, 00, 00),
+                end_time=datetime(2016, 4, 6, 12, 00, 30),
+                failed=False,
+                processed_item_count=len(jobs)
+            )
+
+            if len(jobs) == 1:
+                # simulate a SIGTERM signal during the second job
+                os.kill(os.getpid(), signal.SIGTERM)
+
+            jobs.append(job)
+
+            return job
+
+        job_mock.side_effect = create_job
+
+        with self.app.app_context():
+            crawl.run(daemon=True, interval=0.0)
+
+            reports = db.session.query(ReportModel).all()
+
+        self.assertEqual(len(reports), 2)
+        self.assertEqual(
+            {report.job_id for report in reports}, {"job_0", "job_1"})
+
+        for call in job_mock.call_args_list:
+            self.assertIs(call[0][2], processors_mock.return_value)
+            self.assertIs(call[0][3], source_mock.return_value)
+            self.assertEqual(call[0][4], "daemon-0-1")
+
+        source_mock.return_value.close.assert_called_once_with()
+
+    @patch("hnac.cli.commands.crawler.create_backfill_source")
+    @patch("hnac.cli.commands.crawler.create_hackernews_api_crawler_job")
+    def test_run_backfill_synchronously(self, job_mock, source_mock):
+        job = MagicMock()
+        job.id = "backfill-5-1"
+        job.run.return_value = JobExecutionResult(
+            job=job,
+            start_time=datetime(2016, 4, 6, 12, 00, 00),
+            end_time=datetime(2016, 4, 6, 12, 00, 30),
+            failed=False,
+            processed_item_count=5
+        )
+        job_mock.return_value = job
+
+        crawl = Crawl()
+
+        with self.app.app_context():
+            self.app.config["CRAWLER_ASYNC"] = True
+            crawl.run(action="backfill", from_id=5, to_id=1)
+
+            report = db.session.query(ReportModel).one()
+
+        self.assertEqual(report.job_id, "backfill-5-1")
+        self.assertFalse(report.failed)
+        job.run.assert_called_once_with()
+        job.run_async.assert_not_called()
+        self.assertEqual(job_mock.call_args[0][4], "backfill-5-1")
+        source_mock.return_value.close.assert_called_once_with()
+
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,10 @@
+from argparse import ArgumentTypeError
 from unittest import TestCase, main
 from datetime import datetime
 
 from dateutil.tz import tzutc, tzoffset
 
-from hnac.cli.datatypes import date_string
+from hnac.cli.datatypes import date_string, job_id_string
 
 
 class DateStringTests(TestCase):
@@ -46,5 +47,13 @@ class DateStringTests(TestCase):
         )
 
 
+class JobIdStringTests(TestCase):
+    def test_accept_job_id(self):
+        self.assertEqual(job_id_string("backfill-max-1"), "backfill-max-1")
+
+    def test_reject_job_id_longer_than_report_column(self):
+        self.assertRaises(ArgumentTypeError, job_id_string, "a" * 33)
+
+
 if __name__ == "_main__":
     main()
@@ -0,0 +1,34 @@
+from unittest import TestCase, main
+
+from hnac.compression import (
+    create_compressor, decompress, CompressionError, ZlibCompressor
+)
+
+
+class CompressionTests(TestCase):
+    def test_zlib_compression(self):
+        compressor = create_compressor("zlib", level=9, threshold=10)
+        data = b"hackernews story " * 100
+
+        self.assertIsInstance(compressor, ZlibCompressor)
+        self.assertTrue(compressor.should_compress(data))
+        self.assertFalse(compressor.should_compress(b"story"))
+
+        compressed_data = compressor.compress(data)
+
+        self.assertLess(len(compressed_data), len(data))
+        self.assertEqual(decompress(compressed_data, "deflate"), data)
+
+    def test_decompress_uncompressed_data(self):
+        self.assertEqual(decompress(b"story", None), b"story")
+
+    def test_unknown_compression(self):
+        with self.assertRaises(CompressionError):
+            create_compressor("lzma")
+
+        with self.assertRaises(CompressionError):
+            decompress(b"story", "br")
+
+
+if __name__ == "__main__":
+    main()
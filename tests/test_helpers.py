@@ -1,10 +1,14 @@
 from unittest import TestCase, main
 from unittest.mock import patch
 from datetime import datetime, timedelta
+from os.path import join
+from tempfile import TemporaryDirectory
 
 from dateutil.tz import tzutc
 
-from hnac.helpers import current_date_with_timedelta
+from hnac.helpers import (
+    current_date_with_timedelta, load_json_file, save_json_file
+)
 
 
 class CurrentDateWithTimedeltaTests(TestCase):
@@ -21,5 +25,21 @@ class CurrentDateWithTimedeltaTests(TestCase):
         )
 
 
+class JsonFileTests(TestCase):
+    def test_save_and_load_json_file(self):
+        with TemporaryDirectory() as directory:
+            filename = join(directory, "data.json")
+
+            save_json_file(filename, {"a": 1})
+
+            self.assertEqual(load_json_file(filename), {"a": 1})
+
+    def test_load_missing_json_file(self):
+        with TemporaryDirectory() as directory:
+            filename = join(directory, "data.json")
+
+            self.assertEqual(load_json_file(filename, default={}), {})
+
+
 if __name__ == "__main__":
     main()
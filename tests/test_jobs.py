@@ -1,9 +1,11 @@
+import asyncio
 from unittest import TestCase, main
 from unittest.mock import MagicMock, call, patch
 
-from hnac.jobs import Job
+from hnac.jobs import Job, HackernewsCrawlJob
 from hnac.exceptions import ItemProcessingError, JobExecutionError
 from hnac.processors import Processors
+from hnac.sources import SourceError
 
 
 class JobTests(TestCase):
@@ -122,5 +124,229 @@ class JobTests(TestCase):
         source_instance.items.assert_called_with()
 
 
+class HackernewsCrawlJobTests(TestCase):
+    def test_derive_job_id_from_shard(self):
+        config = {"CRAWLER_SHARD_INDEX": 2, "CRAWLER_SHARD_COUNT": 4}
+
+        job = HackernewsCrawlJob(config, MagicMock(), MagicMock())
+
+        self.assertEqual(job.id, "crawl-2-4")
+
+
+class PipelinedJobTests(TestCase):
+    def test_run_job(self):
+        source_instance = MagicMock()
+        source_instance.items.return_value = list(range(20))
+        source_instance.metrics.return_value = {}
+
+        processor_instance = MagicMock()
+        processor_instance.metrics.return_value = {}
+
+        processors = Processors()
+        processors.add(processor_instance)
+
+        job = Job(source_instance, processors, buffer_size=2)
+
+        result = job.run()
+
+        self.assertFalse(result.failed)
+        self.assertEqual(result.processed_item_count, 20)
+        processor_instance.process_item.assert_has_calls(
+            [call(source_instance, item) for item in range(20)])
+        self.assertIn("pipeline_fetch_blocked_time", result.metrics)
+        self.assertIn("pipeline_process_blocked_time", result.metrics)
+        processor_instance.job_finished.assert_called_with(job)
+
+    def test_job_failed_because_the_source_raised_an_exception(self):
+        def items():
+            yield 1
+            raise SourceError()
+
+        source_instance = MagicMock()
+        source_instance.items.side_effect = items
+
+        processor_instance = MagicMock()
+
+        processors = Processors()
+        processors.add(processor_instance)
+
+        job = Job(source_instance, processors, buffer_size=2)
+        result = job.run()
+
+        self.assertTrue(result.failed)
+        processor_instance.process_item.assert_called_once_with(
+            source_instance, 1)
+
+    def test_stop_retrieving_items_when_processing_fails(self):
+        def items():
+            for item in range(1000):
+                yield item
+
+        source_instance = MagicMock()
+        source_instance.items.side_effect = items
+
+        processors = MagicMock()
+        processors.process_item.side_effect = ValueError
+
+        job = Job(source_instance, processors, buffer_size=2)
+        result = job.run()
+
+        self.assertTrue(result.failed)
+        processors.process_item.assert_called_once_with(source_instance, 0)
+
+
+class AsyncJobTests(TestCase):
+    def test_run_job(self):
+        async def items():
+            for item in [1, 2, 3]:
+                yield item
+
+        source_instance = MagicMock()
+        source_instance.items.side_effect = items
+
+        processor_instance = MagicMock()
+
+        processors = Processors()
+        processors.add(processor_instance)
+
+        job = Job(source_instance, processors)
+
+        result = asyncio.run(job.run_async())
+
+        self.assertFalse(result.failed)
+        self.assertEqual(result.processed_item_count, 3)
+        source_instance.job_started.assert_called_with(job)
+        processor_instance.job_started.assert_called_with(job)
+
+        processor_instance.process_item.assert_has_calls(
+            [
+                call(source_instance, 1),
+                call(source_instance, 2),
+                call(source_instance, 3)
+            ]
+        )
+
+        source_instance.job_finished.assert_called_with(job)
+        processor_instance.job_finished.assert_called_with(job)
+
+    def test_job_failed_because_the_source_raised_an_exception(self):
+        async def items():
+            raise SourceError()
+            yield
+
+        source_instance = MagicMock()
+        source_instance.items.side_effect = items
+
+        processor_instance = MagicMock()
+
+        processors = Processors()
+        processors.add(processor_instance)
+
+        job = Job(source_instance, processors)
+        result = asyncio.run(job.run_async())
+
+        self.assertTrue(result.failed)
+        processor_instance.process_item.assert_not_called()
+        processor_instance.job_finished.assert_called_with(job)
+
+
+class CheckpointTests(TestCase):
+    def create_source(self, fail_at=None):
+        source_instance = MagicMock()
+        source_instance.metrics.return_value = {}
+
+        def items():
+            for item in range(1, 6):
+                if item == fail_at:
+                    raise SourceError()
+
+                source_instance.checkpoint.return_value = {"position": item}
+                yield item
+
+        source_instance.items.side_effect = items
+
+        return source_instance
+
+    def test_save_checkpoints_and_delete_them_on_success(self):
+        source_instance = self.create_source()
+        checkpoint_store = MagicMock()
+        checkpoint_store.load.return_value = None
+
+        job = Job(source_instance, MagicMock(), job_id="job_1",
+                  checkpoint_store=checkpoint_store, checkpoint_interval=2)
+        result = job.run()
+
+        self.assertFalse(result.failed)
+        self.assertEqual(job.id, "job_1")
+        checkpoint_store.save.assert_has_calls([
+            call("job_1", {"position": 2}),
+            call("job_1", {"position": 4})
+        ])
+        checkpoint_store.delete.assert_called_once_with("job_1")
+        source_instance.restore.assert_not_called()
+
+    def test_keep_checkpoint_when_the_job_fails(self):
+        source_instance = self.create_source(fail_at=4)
+        checkpoint_store = MagicMock()
+        checkpoint_store.load.return_value = None
+
+        job = Job(source_instance, MagicMock(), job_id="job_1",
+                  checkpoint_store=checkpoint_store, checkpoint_interval=2)
+        result = job.run()
+
+        self.assertTrue(result.failed)
+        checkpoint_store.save.assert_called_once_with(
+            "job_1", {"position": 2})
+        checkpoint_store.delete.assert_not_called()
+
+    def test_checkpoints_of_pipelined_job_are_taken_at_retrieval(self):
+        source_instance = self.create_source()
+        checkpoint_store = MagicMock()
+        checkpoint_store.load.return_value = None
+
+        job = Job(source_instance, MagicMock(), buffer_size=10,
+                  job_id="job_1", checkpoint_store=checkpoint_store,
+                  checkpoint_interval=2)
+        job.run()
+
+        checkpoint_store.save.assert_has_calls([
+            call("job_1", {"position": 2}),
+            call("job_1", {"position": 4})
+        ])
+
+    def test_resume_from_checkpoint(self):
+        source_instance = self.create_source()
+        checkpoint_store = MagicMock()
+        checkpoint_store.load.return_value = {"position": 3}
+
+        job = Job(source_instance, MagicMock(), job_id="job_1",
+                  checkpoint_store=checkpoint_store)
+        job.run()
+
+        checkpoint_store.load.assert_called_once_with("job_1")
+        source_instance.restore.assert_called_once_with({"position": 3})
+
+    def test_flush_processors_before_saving_checkpoint(self):
+        source_instance = self.create_source()
+        manager = MagicMock()
+        manager.checkpoint_store.load.return_value = None
+
+        job = Job(source_instance, manager.processors, job_id="job_1",
+                  checkpoint_store=manager.checkpoint_store,
+                  checkpoint_interval=2)
+        job.run()
+
+        calls = [
+            method_call for method_call in manager.mock_calls
+            if method_call[0] in ("processors.flush", "checkpoint_store.save")
+        ]
+        self.assertEqual(calls, [
+            call.processors.flush(),
+            call.checkpoint_store.save("job_1", {"position": 2}),
+            call.processors.flush(),
+            call.checkpoint_store.save("job_1", {"position": 4})
+        ])
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,54 @@
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from hnac.limiters import AdaptiveRateLimiter
+
+
+class AdaptiveRateLimiterTests(TestCase):
+    @patch("hnac.limiters.monotonic")
+    def test_reserve_tokens(self, monotonic_mock):
+        monotonic_mock.return_value = 100.0
+        limiter = AdaptiveRateLimiter(rate=2.0, burst=2)
+
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertEqual(limiter.reserve(), 0.5)
+        self.assertEqual(limiter.reserve(), 1.0)
+
+        monotonic_mock.return_value = 101.0
+        self.assertEqual(limiter.reserve(), 0.5)
+
+    def test_increase_rate_on_success(self):
+        limiter = AdaptiveRateLimiter(rate=1.0, max_rate=1.25, increase=0.2)
+
+        limiter.on_success()
+        self.assertAlmostEqual(limiter.rate, 1.2)
+
+        limiter.on_success()
+        self.assertAlmostEqual(limiter.rate, 1.25)
+
+    @patch("hnac.limiters.uniform")
+    def test_decrease_rate_on_failure(self, uniform_mock):
+        uniform_mock.return_value = 1.0
+        limiter = AdaptiveRateLimiter(
+            rate=4.0, min_rate=1.5, decrease_factor=0.5)
+
+        limiter.on_failure()
+        self.assertAlmostEqual(limiter.rate, 2.0)
+
+        limiter.on_failure()
+        self.assertAlmostEqual(limiter.rate, 1.5)
+
+    @patch("hnac.limiters.monotonic")
+    def test_no_burst_after_failure(self, monotonic_mock):
+        monotonic_mock.return_value = 100.0
+        limiter = AdaptiveRateLimiter(
+            rate=1.0, burst=5, decrease_factor=0.5, jitter=0.0)
+
+        limiter.on_failure()
+
+        self.assertEqual(limiter.reserve(), 2.0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import json
+from unittest import TestCase, main
+
+import arrow
+
+from hnac.messages import StoryDocumentMessage
+
+
+class StoryDocumentMessageTests(TestCase):
+    def test_dumps(self):
+        message = StoryDocumentMessage(
+            story={"id": 1},
+            created_at=arrow.get("2020-01-02T10:20:30+00:00")
+        )
+
+        self.assertEqual(message.content_type, "application/json")
+        self.assertEqual(
+            json.loads(message.dumps()),
+            {
+                "type": "story",
+                "data": {"id": 1},
+                "created_at": "2020-01-02 10:20:30 +00:00",
+                "created_at_timestamp": 1577960430,
+                "meta": {
+                    "source": "hackernews-api",
+                    "retrieved_by": "hnac"
+                }
+            }
+        )
+
+    def test_message_is_serialized_once(self):
+        message = StoryDocumentMessage(story={"id": 1})
+
+        self.assertIs(message.dumps(), message.dumps())
+
+
+if __name__ == "__main__":
+    main()
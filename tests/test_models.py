@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta
 from unittest import main
+from unittest.mock import MagicMock
 
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import SQLAlchemyError
 from dateutil.tz import tzutc
 
-from hnac.models import User, Report, Story
+from hnac.models import User, Report, Story, StoryData
+from hnac.exceptions import UnsupportedSearchOperation
 from hnac.jobs import Job, JobExecutionResult
 from hnac.web.database import db
 from hnac.web.queries.operations import EQ, LTE, GTE
@@ -254,6 +257,73 @@ class StorySearchTests(ModelTestCase):
             self.assertEqual(stories[1].id, 4)
             self.assertEqual(stories[0].id, 2)
 
+    def test_search_after_story(self):
+        criteria = [
+            ("username", EQ, "user_1"),
+            ("score", LTE, 20),
+            ("score", GTE, 5)
+        ]
+
+        with self.app.app_context():
+            stories = Story.search(
+                session=db.session,
+                criteria=criteria,
+                limit=2,
+                order_by=Story.score,
+                sort_desc=True,
+                after=(15, 1)
+            )
+
+            self.assertEqual([story.id for story in stories], [2, 4])
+
+    def test_get_stories_after_story(self):
+        with self.app.app_context():
+            stories = Story.get_stories(
+                session=db.session,
+                order_by=Story.time,
+                after=(1529613980, 2)
+            )
+
+            self.assertEqual([story.id for story in stories], [1, 3, 5])
+
+    def test_get_stories_after_story_with_equal_order_value(self):
+        with self.app.app_context():
+            story = Story.get_by_story_id(db.session, 4)
+            story.score = 10
+            db.session.commit()
+
+            stories = Story.get_stories(
+                session=db.session,
+                order_by=Story.score,
+                after=(10, 2)
+            )
+
+            self.assertEqual([story.id for story in stories], [4, 1, 3])
+
+    def test_yield_search_results(self):
+        criteria = [
+            ("username", EQ, "user_1"),
+            ("score", GTE, 5)
+        ]
+
+        with self.app.app_context():
+            stories = Story.yield_search_results(
+                session=db.session,
+                criteria=criteria,
+                order_by=Story.time,
+                items_per_batch=2
+            )
+
+            self.assertEqual([story.id for story in stories], [4, 2, 1])
+
+    def test_fail_to_yield_search_results_with_unsupported_operation(self):
+        with self.app.app_context():
+            with self.assertRaises(UnsupportedSearchOperation):
+                Story.yield_search_results(
+                    session=db.session,
+                    criteria=[("title", EQ, "story 1")]
+                )
+
 
 class StoryRetrievalTests(ModelTestCase):
     def setUp(self):
@@ -285,5 +355,89 @@ class StoryRetrievalTests(ModelTestCase):
             )
 
 
+class StoryUpsertTests(ModelTestCase):
+    def _story_data(self, story_id, score):
+        return {
+            "story_id": story_id,
+            "hackernews_user_id": 1,
+            "url_id": 1,
+            "title": "story {}".format(story_id),
+            "score": score,
+            "time": 1529613980,
+            "descendants": 0
+        }
+
+    def test_upsert_many(self):
+        stories = [self._story_data(1, 10), self._story_data(2, 20)]
+
+        with self.app.app_context():
+            story_ids = Story.upsert_many(db.session, stories)
+            self.assertEqual(set(story_ids), {1, 2})
+
+            stories[0]["score"] = 15
+            updated_story_ids = Story.upsert_many(db.session, stories)
+            self.assertEqual(updated_story_ids, story_ids)
+
+            story = Story.get_by_story_id(db.session, 1)
+            self.assertEqual(story.score, 15)
+            self.assertEqual(Story.count(db.session), 2)
+
+    def test_upsert_many_with_single_statement_on_postgresql(self):
+        session = MagicMock()
+        session.get_bind.return_value.dialect.name = "postgresql"
+        session.execute.return_value.fetchall.return_value = [(1, 5), (2, 6)]
+
+        stories = [self._story_data(1, 10), self._story_data(2, 20)]
+
+        story_ids = Story.upsert_many(session, stories)
+
+        self.assertEqual(story_ids, {1: 5, 2: 6})
+        session.execute.assert_called_once()
+
+        statement = session.execute.call_args[0][0]
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+
+        self.assertIn("ON CONFLICT (story_id) DO UPDATE", sql)
+        self.assertIn("RETURNING stories.story_id, stories.id", sql)
+
+
+class StoryDataTests(ModelTestCase):
+    def test_yield_observations(self):
+        since = datetime(2018, 6, 21, 20, 0, 0)
+
+        observations = [
+            (1, since - timedelta(minutes=10), 5),
+            (1, since + timedelta(minutes=10), 10),
+            (1, since + timedelta(minutes=20), 15),
+            (1, since + timedelta(minutes=30), 20),
+            (2, since + timedelta(minutes=15), 1)
+        ]
+
+        with self.app.app_context():
+            for hackernews_id, downloaded_at, score in observations:
+                db.session.add(StoryData(
+                    hackernews_id=hackernews_id,
+                    story_id=hackernews_id,
+                    downloaded_at=downloaded_at,
+                    data={
+                        "id": hackernews_id,
+                        "title": "story {}".format(hackernews_id),
+                        "time": 1529611200,
+                        "score": score,
+                        "descendants": score * 2
+                    }
+                ))
+
+            db.session.commit()
+
+            rows = list(StoryData.yield_observations(db.session, since))
+
+        self.assertEqual(rows, [
+            (2, since + timedelta(minutes=15), 1529611200, 1, 2),
+            (1, since + timedelta(minutes=20), 1529611200, 15, 30),
+            (1, since + timedelta(minutes=30), 1529611200, 20, 40)
+        ])
+
+
 if __name__ == '__main__':
     main()
@@ -1,7 +1,24 @@
 from unittest import TestCase, main
-from unittest.mock import MagicMock
+from threading import Event, Timer
+from time import sleep
+from unittest.mock import MagicMock, patch, call
 
-from hnac.processors import Processors
+from sqlalchemy.exc import SQLAlchemyError
+
+from hnac.caches import FingerprintCache
+from hnac.exceptions import ItemProcessingError
+from hnac.models import (
+    HackernewsStoryItem, Story, StoryData, HackernewsUser, Url
+)
+from hnac.messages import StoryBatchMessage, StoryDocumentMessage
+from hnac.processors import (
+    Processors, ParallelProcessors, SQLAlchemyStorage, RabbitMQProcessor,
+    Processor, DEFERRED
+)
+from hnac.web.database import db
+
+from common import ModelTestCase
+from mock_data import story_1_data, load_stories_1
 
 
 class NewStoryMatcher(object):
@@ -137,6 +154,482 @@ class ProcessorsTests(TestCase):
         processors.process_item(source, item)
         processor.process_item.assert_called_once_with(source, item)
 
+    def test_skip_unchanged_item(self):
+        processors = Processors(fingerprint_cache=FingerprintCache())
+        processor = MagicMock()
+        processors.add(processor)
+        source = MagicMock()
+        item = HackernewsStoryItem(raw_data=story_1_data, **story_1_data)
+
+        processors.process_item(source, item)
+        processors.process_item(source, item)
+        processors.process_item(source, item._replace(score=10))
+
+        self.assertEqual(processor.process_item.call_count, 2)
+        self.assertEqual(
+            processors.metrics()["unchanged_skipped_items"], 1)
+
+    def test_tick_processors_when_item_is_skipped(self):
+        processors = Processors(fingerprint_cache=FingerprintCache())
+        processor = MagicMock()
+        processors.add(processor)
+        item = HackernewsStoryItem(raw_data=story_1_data, **story_1_data)
+
+        processors.process_item(None, item)
+        processor.tick.assert_not_called()
+
+        processors.process_item(None, item)
+        processor.tick.assert_called_once_with()
+
+    def test_process_unchanged_item_again_after_failure(self):
+        processors = Processors(fingerprint_cache=FingerprintCache())
+        processor = MagicMock()
+        processor.process_item.side_effect = [ItemProcessingError, None]
+        processors.add(processor)
+        source = MagicMock()
+        item = HackernewsStoryItem(raw_data=story_1_data, **story_1_data)
+
+        processors.process_item(source, item)
+        processors.process_item(source, item)
+
+        self.assertEqual(processor.process_item.call_count, 2)
+
+    def test_update_fingerprint_when_deferred_item_is_completed(self):
+        processors = Processors(fingerprint_cache=FingerprintCache())
+        processor = BatchingProcessor()
+        processors.add(processor)
+        item = HackernewsStoryItem(raw_data=story_1_data, **story_1_data)
+
+        processors.process_item(None, item)
+        processors.process_item(None, item)
+        self.assertEqual(processor.processed_item_count, 2)
+
+        processor.complete(failed=False)
+        processors.process_item(None, item)
+        self.assertEqual(processor.processed_item_count, 2)
+
+    def test_forget_fingerprint_of_failed_deferred_item(self):
+        processors = Processors(fingerprint_cache=FingerprintCache())
+        processor = BatchingProcessor()
+        processors.add(processor)
+        item = HackernewsStoryItem(raw_data=story_1_data, **story_1_data)
+
+        processors.process_item(None, item)
+        processor.complete(failed=False)
+
+        changed_item = item._replace(score=10)
+        processors.process_item(None, changed_item)
+        processor.complete(failed=True)
+
+        processors.process_item(None, item)
+        self.assertEqual(processor.processed_item_count, 3)
+
+
+class BatchingProcessor(Processor):
+    def __init__(self):
+        self.processed_item_count = 0
+        self._batch = []
+
+    def process_item(self, source, item):
+        self.processed_item_count += 1
+        self._batch.append(item)
+
+        return DEFERRED
+
+    def complete(self, failed):
+        items = self._batch
+        self._batch = []
+
+        self.items_completed(items, failed)
+
+
+class ParallelProcessorsTests(TestCase):
+    def test_process_items(self):
+        processors = ParallelProcessors(queue_size=1)
+        processor_1 = MagicMock()
+        processor_2 = MagicMock()
+        processors.add_multiple([processor_1, processor_2])
+        source = MagicMock()
+        job = MagicMock()
+
+        processors.job_started(job)
+        for item in range(10):
+            processors.process_item(source, item)
+        processors.job_finished(job)
+
+        for processor in [processor_1, processor_2]:
+            processor.job_started.assert_called_once_with(job)
+            processor.process_item.assert_has_calls(
+                [call(source, item) for item in range(10)])
+            processor.job_finished.assert_called_once_with(job)
+
+    def test_slow_processor_does_not_block_the_others(self):
+        processors = ParallelProcessors(queue_size=10)
+        blocked = Event()
+        slow_processor = MagicMock()
+        slow_processor.process_item.side_effect = \
+            lambda source, item: blocked.wait()
+        processor = MagicMock()
+        processors.add_multiple([slow_processor, processor])
+
+        processors.job_started(MagicMock())
+        processors.process_item(None, 1)
+        processors.process_item(None, 2)
+
+        for _ in range(100):
+            if processor.process_item.call_count == 2:
+                break
+            sleep(0.01)
+        self.assertEqual(processor.process_item.call_count, 2)
+
+        blocked.set()
+        processors.job_finished(MagicMock())
+        self.assertEqual(slow_processor.process_item.call_count, 2)
+
+    def test_update_fingerprints_when_all_processors_succeed(self):
+        processors = ParallelProcessors(fingerprint_cache=FingerprintCache())
+        failing_processor = MagicMock()
+        failing_processor.process_item.side_effect = [
+            ItemProcessingError, None, None]
+        processor = MagicMock()
+        processors.add_multiple([failing_processor, processor])
+        item = HackernewsStoryItem(raw_data=story_1_data, **story_1_data)
+
+        for _ in range(3):
+            processors.job_started(MagicMock())
+            processors.process_item(None, item)
+            processors.job_finished(MagicMock())
+
+        self.assertEqual(processor.process_item.call_count, 2)
+        self.assertEqual(processors.metrics()["unchanged_skipped_items"], 1)
+
+    def test_flush_waits_for_the_queued_items(self):
+        processors = ParallelProcessors(queue_size=10)
+        blocked = Event()
+        processor = MagicMock()
+        processor.process_item.side_effect = \
+            lambda source, item: blocked.wait()
+        processors.add(processor)
+
+        processors.job_started(MagicMock())
+        processors.process_item(None, 1)
+        processors.process_item(None, 2)
+
+        Timer(0.05, blocked.set).start()
+        processors.flush()
+
+        self.assertEqual(processor.process_item.call_count, 2)
+        processor.flush.assert_called_once_with()
+
+        processors.job_finished(MagicMock())
+
+    def test_tick_idle_processors(self):
+        processors = ParallelProcessors(tick_interval=0.01)
+        ticked = Event()
+        processor = MagicMock()
+        processor.tick.side_effect = ticked.set
+        processors.add(processor)
+
+        processors.job_started(MagicMock())
+
+        self.assertTrue(ticked.wait(1.0))
+
+        processors.job_finished(MagicMock())
+
+
+def create_story_item(story_id, by, url, score):
+    story_data = {
+        "by": by,
+        "descendants": 1,
+        "id": story_id,
+        "score": score,
+        "time": 1529613984,
+        "title": "story {}".format(story_id),
+        "type": "story",
+        "url": url
+    }
+
+    return HackernewsStoryItem(raw_data=story_data, **story_data)
+
+
+class SQLAlchemyStorageTests(ModelTestCase):
+    def setUp(self):
+        super(SQLAlchemyStorageTests, self).setUp()
+
+        with self.app.app_context():
+            load_stories_1(db.session)
+            db.session.commit()
+
+    def test_save_stories_one_at_a_time(self):
+        with self.app.app_context():
+            storage = SQLAlchemyStorage(db.session)
+
+            storage.process_item(None, create_story_item(
+                1, "user_1", "http://www.example.com/page_1", 100))
+            storage.process_item(None, create_story_item(
+                10, "user_3", "http://www.example.com/page_10", 5))
+
+            self.assertEqual(Story.get_by_story_id(db.session, 1).score, 100)
+            story = Story.get_by_story_id(db.session, 10)
+            self.assertEqual(story.hackernews_user.username, "user_3")
+            self.assertEqual(db.session.query(StoryData).count(), 2)
+
+    def test_save_stories_in_batches(self):
+        with self.app.app_context():
+            storage = SQLAlchemyStorage(db.session)
+            storage.configure({"SQLALCHEMY_STORAGE_BATCH_SIZE": 2})
+
+            storage.process_item(None, create_story_item(
+                1, "user_1", "http://www.example.com/page_1", 100))
+            self.assertEqual(Story.get_by_story_id(db.session, 1).score, 15)
+
+            storage.process_item(None, create_story_item(
+                10, "user_3", "http://www.example.com/page_10", 5))
+            storage.process_item(None, create_story_item(
+                11, "user_3", "http://www.example.com/page_1", 6))
+            self.assertIsNone(Story.get_by_story_id(db.session, 11))
+
+            storage.job_finished(None)
+
+            db.session.expire_all()
+            self.assertEqual(Story.get_by_story_id(db.session, 1).score, 100)
+
+            story = Story.get_by_story_id(db.session, 10)
+            self.assertEqual(story.hackernews_user.username, "user_3")
+            self.assertEqual(story.url.url, "http://www.example.com/page_10")
+            self.assertEqual(story.title, "story 10")
+
+            story = Story.get_by_story_id(db.session, 11)
+            self.assertEqual(story.url.url, "http://www.example.com/page_1")
+
+            self.assertEqual(db.session.query(HackernewsUser).count(), 3)
+            self.assertEqual(db.session.query(Url).count(), 6)
+            self.assertEqual(db.session.query(StoryData).count(), 3)
+            self.assertEqual(
+                db.session.query(StoryData)
+                          .filter_by(hackernews_id=10)
+                          .one().story.story_id,
+                10
+            )
+
+    def test_process_stories_of_failed_batch_again(self):
+        with self.app.app_context():
+            storage = SQLAlchemyStorage(db.session)
+            storage.configure({"SQLALCHEMY_STORAGE_BATCH_SIZE": 2})
+            processors = Processors(fingerprint_cache=FingerprintCache())
+            processors.add(storage)
+            item = create_story_item(
+                10, "user_3", "http://www.example.com/page_10", 5)
+
+            with patch.object(db.session, "commit") as commit_mock:
+                commit_mock.side_effect = SQLAlchemyError
+                processors.process_item(None, item)
+                processors.job_finished(None)
+
+            self.assertIsNone(Story.get_by_story_id(db.session, 10))
+
+            processors.process_item(None, item)
+            processors.job_finished(None)
+
+            self.assertEqual(
+                processors.metrics()["unchanged_skipped_items"], 0)
+            self.assertIsNotNone(Story.get_by_story_id(db.session, 10))
+
+    @patch("hnac.processors.monotonic")
+    def test_save_expired_batch_on_tick(self, monotonic_mock):
+        with self.app.app_context():
+            storage = SQLAlchemyStorage(
+                db.session, batch_size=10, batch_timeout=1.0)
+
+            monotonic_mock.return_value = 10.0
+            storage.process_item(None, create_story_item(
+                10, "user_3", "http://www.example.com/page_10", 5))
+            storage.tick()
+
+            self.assertIsNone(Story.get_by_story_id(db.session, 10))
+
+            monotonic_mock.return_value = 11.0
+            storage.tick()
+
+            self.assertIsNotNone(Story.get_by_story_id(db.session, 10))
+
+    def test_cache_user_and_url_ids(self):
+        with self.app.app_context():
+            storage = SQLAlchemyStorage(db.session)
+
+            storage.process_item(None, create_story_item(
+                10, "user_3", "http://www.example.com/page_10", 5))
+            storage.process_item(None, create_story_item(
+                11, "user_3", "http://www.example.com/page_10", 6))
+
+            metrics = storage.metrics()
+            self.assertEqual(metrics["storage_user_cache_hits"], 1)
+            self.assertEqual(metrics["storage_url_cache_hits"], 1)
+
+            story = Story.get_by_story_id(db.session, 11)
+            self.assertEqual(story.hackernews_user.username, "user_3")
+            self.assertEqual(story.url.url, "http://www.example.com/page_10")
+
+    def test_cached_ids_are_invalidated_on_rollback(self):
+        with self.app.app_context():
+            storage = SQLAlchemyStorage(db.session)
+
+            storage.process_item(None, create_story_item(
+                10, "user_3", "http://www.example.com/page_10", 5))
+
+            with patch.object(db.session, "commit") as commit_mock:
+                commit_mock.side_effect = SQLAlchemyError
+                with self.assertRaises(ItemProcessingError):
+                    storage.process_item(None, create_story_item(
+                        11, "user_3", "http://www.example.com/page_10", 6))
+
+            self.assertIsNone(storage._user_ids.get("user_3"))
+            self.assertIsNone(storage._url_ids.get(
+                "http://www.example.com/page_10"))
+
+
+class RabbitMQProcessorTests(TestCase):
+    def test_publish_stories(self):
+        processor = RabbitMQProcessor()
+        processor._publisher = MagicMock()
+
+        processor.process_item(MagicMock(), create_story_item(
+            1, "user_1", "http://www.example.com/page_1", 10))
+
+        message = processor._publisher.publish_message.call_args[0][0]
+        self.assertIsInstance(message, StoryDocumentMessage)
+        self.assertEqual(message.story["id"], 1)
+
+    def test_publish_story_batches(self):
+        processor = RabbitMQProcessor(
+            batch_max_stories=2, batch_routing_key="stories.batch")
+        processor._publisher = MagicMock()
+
+        for story_id in range(1, 4):
+            processor.process_item(MagicMock(), create_story_item(
+                story_id, "user_1", "http://www.example.com/page_1", 10))
+
+        self.assertEqual(processor._publisher.publish_message.call_count, 1)
+
+        message = processor._publisher.publish_message.call_args[0][0]
+        self.assertIsInstance(message, StoryBatchMessage)
+        self.assertEqual(message.routing_key, "stories.batch")
+        self.assertEqual(
+            [story["id"] for story in message.stories], [1, 2])
+
+        processor.job_finished(MagicMock())
+
+        message = processor._publisher.publish_message.call_args[0][0]
+        self.assertEqual([story["id"] for story in message.stories], [3])
+
+    @patch("hnac.processors.monotonic")
+    def test_publish_expired_story_batch(self, monotonic_mock):
+        processor = RabbitMQProcessor(
+            batch_max_stories=10, batch_max_delay=1.0)
+        processor._publisher = MagicMock()
+
+        monotonic_mock.return_value = 10.0
+        processor.process_item(MagicMock(), create_story_item(
+            1, "user_1", "http://www.example.com/page_1", 10))
+
+        processor._publisher.publish_message.assert_not_called()
+
+        monotonic_mock.return_value = 11.0
+        processor.process_item(MagicMock(), create_story_item(
+            2, "user_1", "http://www.example.com/page_1", 10))
+
+        message = processor._publisher.publish_message.call_args[0][0]
+        self.assertEqual(len(message.stories), 2)
+
+    @patch("hnac.processors.monotonic")
+    def test_publish_expired_story_batch_on_tick(self, monotonic_mock):
+        processor = RabbitMQProcessor(
+            batch_max_stories=10, batch_max_delay=1.0)
+        processor._publisher = MagicMock()
+
+        monotonic_mock.return_value = 10.0
+        processor.process_item(MagicMock(), create_story_item(
+            1, "user_1", "http://www.example.com/page_1", 10))
+        processor.tick()
+
+        processor._publisher.publish_message.assert_not_called()
+
+        monotonic_mock.return_value = 11.0
+        processor.tick()
+
+        message = processor._publisher.publish_message.call_args[0][0]
+        self.assertEqual([story["id"] for story in message.stories], [1])
+
+    def test_report_every_story_of_failed_batch(self):
+        processor = RabbitMQProcessor(batch_max_stories=2)
+        processor._publisher = MagicMock()
+        processor._publisher.publish_message.side_effect = Exception
+        completion_callback = MagicMock()
+        processor.set_completion_callback(completion_callback)
+        items = [
+            create_story_item(
+                story_id, "user_1", "http://www.example.com/page_1", 10)
+            for story_id in range(1, 3)
+        ]
+
+        for item in items:
+            self.assertIs(processor.process_item(MagicMock(), item), DEFERRED)
+
+        completion_callback.assert_called_once_with(items, True)
+
+    def _create_confirming_processor(self, **kwargs):
+        processor = RabbitMQProcessor(**kwargs)
+        processor._publisher = MagicMock()
+        processor._confirm_delivery = True
+
+        completion_callback = MagicMock()
+        processor.set_completion_callback(completion_callback)
+
+        return processor, completion_callback
+
+    def _published_message(self, processor):
+        return processor._publisher.publish_message.call_args[0][0]
+
+    def test_report_confirmed_story(self):
+        processor, completion_callback = self._create_confirming_processor()
+        item = create_story_item(
+            1, "user_1", "http://www.example.com/page_1", 10)
+
+        self.assertIs(processor.process_item(MagicMock(), item), DEFERRED)
+        completion_callback.assert_not_called()
+
+        processor._message_confirmed(self._published_message(processor), False)
+
+        completion_callback.assert_called_once_with([item], False)
+
+    def test_report_every_story_of_nacked_batch(self):
+        processor, completion_callback = self._create_confirming_processor(
+            batch_max_stories=2)
+        items = [
+            create_story_item(
+                story_id, "user_1", "http://www.example.com/page_1", 10)
+            for story_id in range(1, 3)
+        ]
+
+        for item in items:
+            self.assertIs(processor.process_item(MagicMock(), item), DEFERRED)
+
+        completion_callback.assert_not_called()
+
+        processor._message_confirmed(self._published_message(processor), True)
+
+        completion_callback.assert_called_once_with(items, True)
+
+    def test_fail_unconfirmed_stories_when_job_finishes(self):
+        processor, completion_callback = self._create_confirming_processor()
+        item = create_story_item(
+            1, "user_1", "http://www.example.com/page_1", 10)
+
+        processor.process_item(MagicMock(), item)
+        processor.job_finished(MagicMock())
+
+        completion_callback.assert_called_once_with([item], True)
+
 
 if __name__ == "__main__":
     main()
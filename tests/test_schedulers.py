@@ -0,0 +1,101 @@
+from unittest import TestCase, main
+
+from hnac.schedulers import IntervalScheduler, RecrawlScheduler
+
+
+class IntervalSchedulerTests(TestCase):
+    def test_run_task_until_stopped(self):
+        scheduler = IntervalScheduler(interval=0.0)
+        runs = []
+
+        def task():
+            runs.append(len(runs))
+
+            if len(runs) == 3:
+                scheduler.stop()
+
+        scheduler.run(task)
+
+        self.assertEqual(runs, [0, 1, 2])
+        self.assertTrue(scheduler.stopped)
+
+    def test_stop_during_wait(self):
+        scheduler = IntervalScheduler(interval=60.0, jitter=0.1)
+        runs = []
+
+        def task():
+            runs.append(len(runs))
+            scheduler.stop()
+
+        scheduler.run(task)
+
+        self.assertEqual(runs, [0])
+
+
+class RecrawlSchedulerTests(TestCase):
+    def test_new_stories_are_due_immediately(self):
+        scheduler = RecrawlScheduler()
+
+        scheduler.track(1, created_at=1000.0, now=1000.0)
+        scheduler.track(2, created_at=1000.0, now=1000.0)
+
+        self.assertEqual(scheduler.due(1000.0, limit=1), [1])
+        self.assertEqual(scheduler.due(1000.0), [2])
+        self.assertEqual(scheduler.due(1000.0), [])
+
+    def test_fast_changing_stories_are_fetched_more_often(self):
+        scheduler = RecrawlScheduler(
+            min_interval=60.0, max_interval=3600.0, age_scale=600.0)
+
+        scheduler.observe(1, 0.0, score=1, descendants=0, observed_at=0.0)
+        scheduler.observe(2, 0.0, score=1, descendants=0, observed_at=0.0)
+
+        scheduler.observe(
+            1, 0.0, score=100, descendants=50, observed_at=1800.0)
+        scheduler.observe(2, 0.0, score=1, descendants=0, observed_at=1800.0)
+
+        self.assertEqual(scheduler.due(1800.0 + 60.0), [1])
+        self.assertEqual(scheduler.due(1800.0 + 3600.0), [2])
+
+    def test_observed_creation_time_replaces_first_seen_time(self):
+        scheduler = RecrawlScheduler()
+        now = 40 * 3600.0
+
+        scheduler.track(1, created_at=now, now=now)
+        self.assertEqual(scheduler.due(now), [1])
+
+        # the story was created 40 hours before it was first seen
+        scheduler.observe(1, 0.0, score=1, descendants=0, observed_at=now)
+
+        self.assertEqual(scheduler.due(now + 300.0), [])
+        self.assertEqual(scheduler.due(now + 12300.0), [1])
+
+    def test_old_stories_are_not_tracked(self):
+        scheduler = RecrawlScheduler(max_age=3600.0)
+
+        scheduler.track(1, created_at=0.0, now=7200.0)
+        scheduler.observe(2, 0.0, score=1, descendants=0, observed_at=7200.0)
+
+        self.assertEqual(len(scheduler), 0)
+
+    def test_unobserved_stories_are_rescheduled(self):
+        scheduler = RecrawlScheduler(max_interval=600.0)
+
+        scheduler.track(1, created_at=0.0, now=0.0)
+
+        self.assertEqual(scheduler.due(0.0), [1])
+        self.assertEqual(scheduler.due(599.0), [])
+        self.assertEqual(scheduler.due(600.0), [1])
+
+    def test_forget_story(self):
+        scheduler = RecrawlScheduler()
+
+        scheduler.track(1, created_at=0.0, now=0.0)
+        scheduler.forget(1)
+
+        self.assertEqual(scheduler.due(0.0), [])
+        self.assertNotIn(1, scheduler)
+
+
+if __name__ == "__main__":
+    main()
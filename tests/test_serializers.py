@@ -0,0 +1,50 @@
+from unittest import TestCase, main
+
+from hnac.serializers import (
+    create_serializer, get_content_type_serializer, JsonSerializer,
+    SerializerError, orjson, msgpack
+)
+
+
+class SerializerTests(TestCase):
+    def test_create_serializer(self):
+        serializer = create_serializer("json")
+
+        self.assertIsInstance(serializer, JsonSerializer)
+        self.assertEqual(
+            serializer.loads(serializer.dumps({"id": 1})), {"id": 1})
+
+    def test_create_unknown_serializer(self):
+        with self.assertRaises(SerializerError):
+            create_serializer("xml")
+
+    def test_orjson_serializer(self):
+        if orjson is None:
+            self.skipTest("orjson is not installed")
+
+        serializer = create_serializer("orjson")
+
+        self.assertEqual(serializer.content_type, "application/json")
+        self.assertEqual(
+            JsonSerializer().loads(serializer.dumps({"id": 1})), {"id": 1})
+
+    def test_msgpack_serializer(self):
+        if msgpack is None:
+            self.skipTest("msgpack is not installed")
+
+        serializer = create_serializer("msgpack")
+
+        self.assertEqual(
+            serializer.loads(serializer.dumps({"id": 1})), {"id": 1})
+
+    def test_get_content_type_serializer(self):
+        serializer = get_content_type_serializer("application/json")
+
+        self.assertEqual(serializer.loads(b'{"id": 1}'), {"id": 1})
+
+        with self.assertRaises(SerializerError):
+            get_content_type_serializer("text/plain")
+
+
+if __name__ == "__main__":
+    main()
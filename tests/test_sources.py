@@ -1,12 +1,23 @@
+import asyncio
+from datetime import datetime, timezone
+from os.path import join
+from tempfile import TemporaryDirectory
 from unittest import TestCase, main
 from unittest.mock import patch
 
 from requests import RequestException
 import responses
 
-from hnac.sources import HackernewsStories, SourceError
-from hnac.models import HackernewsStoryItem
+from hnac.sources import (
+    HackernewsStories, AsyncHackernewsStories, IncrementalHackernewsStories,
+    PrioritizedHackernewsStories, BackfillHackernewsStories, SourceError,
+    create_source, create_backfill_source, aiohttp
+)
+from hnac.models import HackernewsStoryItem, StoryData
+from hnac.helpers import load_json_file, save_json_file
+from hnac.web.database import db
 
+from common import ModelTestCase
 from mock_data import story_1_data, story_2_data
 
 
@@ -61,6 +72,110 @@ class HackernewsStoriesItemRetrieval(TestCase):
         self.assertEqual(stories[1], HackernewsStoryItem(
             raw_data=story_2_data, **story_2_data))
 
+    @responses.activate
+    @patch("hnac.sources.sleep")
+    def test_get_items_concurrently_in_order(self, sleep_mock):
+        story_ids = []
+        for story_id in range(1, 11):
+            story_data = dict(story_1_data, id=story_id)
+            story_ids.append(story_id)
+            responses.add(
+                responses.GET,
+                f'https://hacker-news.firebaseio.com'
+                f'/v0/item/{story_id}.json',
+                json=story_data,
+                status=200
+            )
+
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/newstories.json',
+            json=story_ids,
+            status=200
+        )
+
+        source = HackernewsStories()
+        source.configure({"CRAWLER_WORKERS": 4, "CRAWLER_WAIT_TIME": 0.0})
+
+        stories = [story for story in source.items()]
+
+        self.assertEqual([story.id for story in stories], story_ids)
+
+    @responses.activate
+    @patch("hnac.sources.sleep")
+    def test_get_items_concurrently_in_completion_order(self, sleep_mock):
+        story_ids = []
+        for story_id in range(1, 11):
+            story_data = dict(story_1_data, id=story_id)
+            story_ids.append(story_id)
+            responses.add(
+                responses.GET,
+                f'https://hacker-news.firebaseio.com'
+                f'/v0/item/{story_id}.json',
+                json=story_data,
+                status=200
+            )
+
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/newstories.json',
+            json=story_ids,
+            status=200
+        )
+
+        source = HackernewsStories()
+        source.configure({
+            "CRAWLER_WORKERS": 4,
+            "CRAWLER_PRESERVE_ORDER": False,
+            "CRAWLER_WAIT_TIME": 0.0
+        })
+
+        stories = [story for story in source.items()]
+
+        self.assertCountEqual([story.id for story in stories], story_ids)
+
+    @responses.activate
+    def test_resume_from_checkpoint(self):
+        story_ids = [story_1_data["id"], story_2_data["id"]]
+
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/newstories.json',
+            json=story_ids,
+            status=200
+        )
+
+        for story_data in [story_1_data, story_2_data]:
+            responses.add(
+                responses.GET,
+                'https://hacker-news.firebaseio.com/v0/item/{}.json'.format(
+                    story_data["id"]),
+                json=story_data,
+                status=200
+            )
+
+        source = HackernewsStories()
+        source.configure({"CRAWLER_WAIT_TIME": 0.0})
+
+        items = source.items()
+        next(items)
+        checkpoint = source.checkpoint()
+        items.close()
+
+        self.assertEqual(
+            checkpoint,
+            {"story_ids": story_ids, "position": 1, "completed": []}
+        )
+
+        source = HackernewsStories()
+        source.configure({"CRAWLER_WAIT_TIME": 0.0})
+        source.restore(checkpoint)
+
+        stories = [story for story in source.items()]
+
+        self.assertEqual([story.id for story in stories], [story_2_data["id"]])
+        self.assertEqual(len(responses.calls), 3)
+
     @patch("hnac.sources.sleep")
     @patch("hnac.sources.HackernewsStories._execute_new_stories_request")
     def test_connection_retry_exceeded_while_retrieving_new_stories(
@@ -90,13 +205,139 @@ class HackernewsStoriesItemRetrieval(TestCase):
         configuration = {
             "CRAWLER_WAIT_TIME": 111,
             "CRAWLER_BACKOFF_TIME": 222,
-            "CRAWLER_ABORT_AFTER": 333
+            "CRAWLER_ABORT_AFTER": 333,
+            "CRAWLER_WORKERS": 444,
+            "CRAWLER_PRESERVE_ORDER": False,
+            "CRAWLER_REQUEST_TIMEOUT": 555,
+            "CRAWLER_POOL_SIZE": 666,
+            "CRAWLER_MAX_RETRIES": 777
         }
         source.configure(configuration)
 
         self.assertEqual(source.wait_time, 111)
         self.assertEqual(source.backoff_time, 222)
         self.assertEqual(source.abort_after, 333)
+        self.assertEqual(source.workers, 444)
+        self.assertFalse(source.preserve_order)
+        self.assertEqual(source.request_timeout, 555)
+        self.assertEqual(source.pool_size, 666)
+        self.assertEqual(source.max_retries, 777)
+
+    @responses.activate
+    def test_only_fetch_the_stories_of_the_shard(self):
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/newstories.json',
+            json=[10, 11, 12, 13],
+            status=200
+        )
+
+        for story_id in [11, 13]:
+            responses.add(
+                responses.GET,
+                'https://hacker-news.firebaseio.com/v0/item/{}.json'.format(
+                    story_id),
+                json=dict(story_1_data, id=story_id),
+                status=200
+            )
+
+        source = HackernewsStories()
+        source.configure({
+            "CRAWLER_WAIT_TIME": 0.0,
+            "CRAWLER_SHARD_INDEX": 1,
+            "CRAWLER_SHARD_COUNT": 2
+        })
+
+        stories = [story for story in source.items()]
+
+        self.assertEqual([story.id for story in stories], [11, 13])
+
+    def test_rate_budget_is_divided_between_the_shards(self):
+        source = HackernewsStories()
+        source.configure({
+            "CRAWLER_WAIT_TIME": 0.25,
+            "CRAWLER_MAX_REQUESTS_PER_SECOND": 8.0,
+            "CRAWLER_SHARD_INDEX": 0,
+            "CRAWLER_SHARD_COUNT": 4
+        })
+
+        self.assertEqual(source._rate_limiter.rate, 1.0)
+        self.assertEqual(source._rate_limiter.max_rate, 2.0)
+
+    def test_start_at_maximum_rate_without_wait_time(self):
+        source = HackernewsStories()
+        source.configure({
+            "CRAWLER_WAIT_TIME": 0.0,
+            "CRAWLER_MAX_REQUESTS_PER_SECOND": 8.0,
+            "CRAWLER_SHARD_INDEX": 0,
+            "CRAWLER_SHARD_COUNT": 4
+        })
+
+        self.assertEqual(source._rate_limiter.rate, 2.0)
+        self.assertEqual(source._rate_limiter.max_rate, 2.0)
+
+    def test_invalid_shard_index(self):
+        source = HackernewsStories()
+
+        with self.assertRaises(SourceError):
+            source.configure({
+                "CRAWLER_SHARD_INDEX": 2,
+                "CRAWLER_SHARD_COUNT": 2
+            })
+
+    @responses.activate
+    @patch("hnac.sources.sleep")
+    def test_decrease_request_rate_on_server_errors(self, sleep_mock):
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/newstories.json',
+            json=[story_1_data["id"]],
+            status=200
+        )
+        responses.add(
+            responses.GET,
+            f'https://hacker-news.firebaseio.com'
+            f'/v0/item/{story_1_data["id"]}.json',
+            status=503
+        )
+        responses.add(
+            responses.GET,
+            f'https://hacker-news.firebaseio.com'
+            f'/v0/item/{story_1_data["id"]}.json',
+            json=story_1_data,
+            status=200
+        )
+
+        source = HackernewsStories()
+        source.configure({
+            "CRAWLER_WAIT_TIME": 0.25,
+            "CRAWLER_MAX_REQUESTS_PER_SECOND": 10.0,
+            "CRAWLER_RATE_INCREASE": 0.0,
+            "CRAWLER_BURST": 10
+        })
+
+        stories = [story for story in source.items()]
+
+        self.assertEqual(len(stories), 1)
+        self.assertLess(source.metrics()["crawler_request_rate"], 4.0)
+
+    def test_http_session_is_reused(self):
+        source = HackernewsStories()
+        source.configure({
+            "CRAWLER_WORKERS": 20,
+            "CRAWLER_POOL_SIZE": 5,
+            "CRAWLER_MAX_RETRIES": 2
+        })
+
+        session = source._get_session()
+        self.assertIs(source._get_session(), session)
+
+        adapter = session.get_adapter("https://hacker-news.firebaseio.com")
+        self.assertEqual(adapter._pool_maxsize, 20)
+        self.assertEqual(adapter.max_retries.total, 2)
+
+        source.close()
+        self.assertIsNot(source._get_session(), session)
 
     @responses.activate
     @patch("hnac.sources.sleep")
@@ -141,5 +382,335 @@ class HackernewsStoriesItemRetrieval(TestCase):
             [item for item in source.items()]
 
 
+class IncrementalHackernewsStoriesItemRetrieval(TestCase):
+    def _add_item_response(self, item_id, item_data):
+        responses.add(
+            responses.GET,
+            f'https://hacker-news.firebaseio.com/v0/item/{item_id}.json',
+            json=item_data,
+            status=200
+        )
+
+    @responses.activate
+    @patch("hnac.sources.sleep")
+    def test_use_new_stories_on_first_run(self, sleep_mock):
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/maxitem.json',
+            json=12299134,
+            status=200
+        )
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/newstories.json',
+            json=[story_1_data["id"]],
+            status=200
+        )
+        self._add_item_response(story_1_data["id"], story_1_data)
+
+        source = IncrementalHackernewsStories()
+
+        stories = [story for story in source.items()]
+
+        self.assertEqual([story.id for story in stories], [story_1_data["id"]])
+        self.assertEqual(source.high_water_mark, 12299134)
+
+    @responses.activate
+    @patch("hnac.sources.sleep")
+    def test_fetch_new_and_updated_items(self, sleep_mock):
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/maxitem.json',
+            json=102,
+            status=200
+        )
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/updates.json',
+            json={"items": [50, 102], "profiles": ["user"]},
+            status=200
+        )
+        self._add_item_response(101, dict(story_1_data, id=101))
+        self._add_item_response(102, {"id": 102, "type": "comment"})
+        self._add_item_response(50, dict(story_2_data, id=50))
+
+        source = IncrementalHackernewsStories()
+        source.configure({"CRAWLER_WAIT_TIME": 0.0})
+        source.high_water_mark = 100
+
+        stories = [story for story in source.items()]
+
+        self.assertEqual([story.id for story in stories], [101, 50])
+        self.assertEqual(source.high_water_mark, 102)
+        requested_urls = [call.request.url for call in responses.calls]
+        self.assertNotIn(
+            "https://hacker-news.firebaseio.com/v0/newstories.json",
+            requested_urls
+        )
+
+    @patch("hnac.sources.logger")
+    def test_skip_non_story_items_without_warning(self, logger_mock):
+        source = IncrementalHackernewsStories()
+
+        self.assertIsNone(
+            source._create_story_item(102, {"id": 102, "type": "comment"}))
+        self.assertIsNone(source._create_story_item(103, None))
+        logger_mock.warning.assert_not_called()
+
+    @responses.activate
+    @patch("hnac.sources.sleep")
+    def test_high_water_mark_is_persisted(self, sleep_mock):
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/maxitem.json',
+            json=101,
+            status=200
+        )
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/updates.json',
+            json={"items": []},
+            status=200
+        )
+        self._add_item_response(101, dict(story_1_data, id=101))
+
+        with TemporaryDirectory() as directory:
+            state_file = join(directory, "state.json")
+            save_json_file(state_file, {"high_water_mark": 100})
+
+            source = IncrementalHackernewsStories()
+            source.configure({"CRAWLER_STATE_FILE": state_file})
+
+            stories = [story for story in source.items()]
+
+            self.assertEqual([story.id for story in stories], [101])
+            self.assertEqual(
+                load_json_file(state_file), {"high_water_mark": 101})
+
+
+class PrioritizedHackernewsStoriesTests(ModelTestCase):
+    def _add_new_stories_response(self, story_ids):
+        responses.add(
+            responses.GET,
+            'https://hacker-news.firebaseio.com/v0/newstories.json',
+            json=story_ids,
+            status=200
+        )
+
+    def _add_item_response(self, item_id, item_data):
+        responses.add(
+            responses.GET,
+            f'https://hacker-news.firebaseio.com/v0/item/{item_id}.json',
+            json=item_data,
+            status=200
+        )
+
+    def test_metrics_include_request_rate(self):
+        source = PrioritizedHackernewsStories()
+        source.configure({"CRAWLER_WAIT_TIME": 0.25})
+
+        metrics = source.metrics()
+
+        self.assertEqual(metrics["prioritized_tracked_stories"], 0)
+        self.assertIn("crawler_request_rate", metrics)
+
+    @responses.activate
+    @patch("hnac.sources.time")
+    def test_only_fetch_due_stories(self, time_mock):
+        time_mock.return_value = story_1_data["time"] + 60.0
+
+        self._add_new_stories_response([story_1_data["id"]])
+        self._add_item_response(story_1_data["id"], story_1_data)
+
+        source = PrioritizedHackernewsStories()
+        source.configure({"CRAWLER_WAIT_TIME": 0.0})
+
+        stories = [story for story in source.items()]
+        self.assertEqual([story.id for story in stories], [story_1_data["id"]])
+
+        stories = [story for story in source.items()]
+        self.assertEqual(stories, [])
+
+        time_mock.return_value += source.scheduler.max_interval
+        stories = [story for story in source.items()]
+        self.assertEqual([story.id for story in stories], [story_1_data["id"]])
+
+    @responses.activate
+    @patch("hnac.sources.time")
+    def test_load_story_history(self, time_mock):
+        now = datetime.utcnow()
+        time_mock.return_value = now.replace(tzinfo=timezone.utc).timestamp()
+
+        story_data = dict(story_2_data, time=int(time_mock.return_value))
+
+        with self.app.app_context():
+            StoryData.create_many(db.session, [(1, story_data)])
+            db.session.commit()
+
+            self._add_new_stories_response([story_2_data["id"]])
+
+            source = PrioritizedHackernewsStories(session=db.session())
+            source.configure({"CRAWLER_WAIT_TIME": 0.0})
+
+            # the story was downloaded just now so it isn't due yet
+            stories = [story for story in source.items()]
+
+        self.assertEqual(stories, [])
+        self.assertIn(story_2_data["id"], source.scheduler)
+
+
+class BackfillHackernewsStoriesTests(TestCase):
+    def _add_item_responses(self):
+        items = {
+            5: dict(story_1_data, id=5),
+            4: {"id": 4, "type": "comment"},
+            3: {"id": 3, "deleted": True},
+            2: dict(story_2_data, id=2),
+            1: {"id": 1, "type": "comment"}
+        }
+
+        for item_id, item_data in items.items():
+            responses.add(
+                responses.GET,
+                'https://hacker-news.firebaseio.com/v0/item/{}.json'.format(
+                    item_id),
+                json=item_data,
+                status=200
+            )
+
+    @responses.activate
+    def test_get_stories_in_range(self):
+        self._add_item_responses()
+
+        source = BackfillHackernewsStories(from_id=5, to_id=1)
+        source.configure({
+            "CRAWLER_WAIT_TIME": 0.0,
+            "CRAWLER_BACKFILL_WORKERS": 2
+        })
+
+        stories = [story for story in source.items()]
+
+        self.assertCountEqual([story.id for story in stories], [5, 2])
+        self.assertEqual(source.metrics()["backfill_retrieved_items"], 5)
+        self.assertEqual(
+            source.checkpoint(),
+            {"from_id": 5, "next_id": 0, "completed": []}
+        )
+
+    @responses.activate
+    def test_resume_from_checkpoint(self):
+        self._add_item_responses()
+
+        source = BackfillHackernewsStories(from_id=5, to_id=1)
+        source.configure({"CRAWLER_WAIT_TIME": 0.0})
+        source.restore({"from_id": 5, "next_id": 3, "completed": [1]})
+
+        stories = [story for story in source.items()]
+
+        self.assertEqual([story.id for story in stories], [2])
+        self.assertEqual(len(responses.calls), 2)
+
+    def test_invalid_range(self):
+        with self.assertRaises(SourceError):
+            BackfillHackernewsStories(from_id=1, to_id=5)
+
+    def test_request_rate_ceiling(self):
+        source = create_backfill_source(
+            {"CRAWLER_BACKFILL_MAX_REQUESTS_PER_SECOND": 20.0}, 5, 1)
+
+        self.assertEqual(source._rate_limiter.rate, 20.0)
+        self.assertEqual(source._rate_limiter.max_rate, 20.0)
+
+
+class CreateSourceTests(TestCase):
+    def test_create_default_source(self):
+        source = create_source({"CRAWLER_WORKERS": 3})
+
+        self.assertIs(type(source), HackernewsStories)
+        self.assertEqual(source.workers, 3)
+
+    def test_create_incremental_source(self):
+        source = create_source({"CRAWLER_MODE": "incremental"})
+
+        self.assertIsInstance(source, IncrementalHackernewsStories)
+
+    def test_create_async_source(self):
+        if aiohttp is None:
+            self.skipTest("aiohttp is not installed")
+
+        source = create_source({"CRAWLER_ASYNC": True})
+
+        self.assertIsInstance(source, AsyncHackernewsStories)
+
+    def test_create_prioritized_source(self):
+        session = object()
+
+        source = create_source({"CRAWLER_MODE": "prioritized"}, session)
+
+        self.assertIsInstance(source, PrioritizedHackernewsStories)
+        self.assertIs(source.session, session)
+
+    def test_fail_to_create_source_for_unknown_mode(self):
+        with self.assertRaises(SourceError):
+            create_source({"CRAWLER_MODE": "unknown"})
+
+
+class AsyncHackernewsStoriesItemRetrieval(TestCase):
+    def setUp(self):
+        if aiohttp is None:
+            self.skipTest("aiohttp is not installed")
+
+    def _collect_items(self, source):
+        async def collect():
+            return [item async for item in source.items()]
+
+        return asyncio.run(collect())
+
+    @patch("hnac.sources.AsyncHackernewsStories._execute_item_request")
+    @patch("hnac.sources.AsyncHackernewsStories._get_story_ids")
+    def test_get_items(self, get_story_ids_mock, execute_item_request_mock):
+        stories = {
+            story_1_data["id"]: story_1_data,
+            story_2_data["id"]: story_2_data,
+            1: {"hello": "world"}
+        }
+
+        async def execute_item_request(session, item_url):
+            story_id = int(item_url.rsplit("/", 1)[1].split(".")[0])
+            return stories[story_id]
+
+        get_story_ids_mock.return_value = [
+            story_1_data["id"], 1, story_2_data["id"]]
+        execute_item_request_mock.side_effect = execute_item_request
+
+        source = AsyncHackernewsStories()
+        source.configure({"CRAWLER_WAIT_TIME": 0.0, "CRAWLER_WORKERS": 2})
+
+        items = self._collect_items(source)
+
+        self.assertEqual(items, [
+            HackernewsStoryItem(raw_data=story_1_data, **story_1_data),
+            HackernewsStoryItem(raw_data=story_2_data, **story_2_data)
+        ])
+
+    @patch("hnac.sources.asyncio.sleep")
+    @patch("hnac.sources.AsyncHackernewsStories._execute_item_request")
+    @patch("hnac.sources.AsyncHackernewsStories._get_story_ids")
+    def test_abort_after_failing_to_retrieve_story(
+            self, get_story_ids_mock, execute_item_request_mock, sleep_mock):
+        get_story_ids_mock.return_value = [story_1_data["id"]]
+        execute_item_request_mock.side_effect = aiohttp.ClientError
+
+        async def sleep(delay):
+            pass
+
+        sleep_mock.side_effect = sleep
+
+        source = AsyncHackernewsStories()
+
+        with self.assertRaises(SourceError):
+            self._collect_items(source)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,106 @@
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+from hnac.messages import RawMessage
+from hnac.spool import MessageSpool
+
+
+class MessageSpoolTests(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_read_messages_in_order(self):
+        spool = MessageSpool(self.directory, segment_size=2)
+        self.assertTrue(spool.is_empty())
+
+        for i in range(5):
+            spool.append(RawMessage("message {}".format(i)))
+        spool.append(RawMessage("message 5", routing_key="stories.batch"))
+
+        self.assertFalse(spool.is_empty())
+
+        messages, position = spool.read(4)
+        self.assertEqual(
+            [message.body for message in messages],
+            [b"message 0", b"message 1"]
+        )
+        spool.commit(position)
+
+        messages, position = spool.read(4)
+        self.assertEqual(
+            [message.body for message in messages],
+            [b"message 2", b"message 3"]
+        )
+        spool.commit(position)
+
+        messages, position = spool.read(4)
+        self.assertEqual(
+            [message.body for message in messages],
+            [b"message 4", b"message 5"]
+        )
+        self.assertIsNone(messages[0].routing_key)
+        self.assertEqual(messages[1].routing_key, "stories.batch")
+        spool.commit(position)
+
+        self.assertTrue(spool.is_empty())
+
+        spool.close()
+
+    def test_uncommitted_messages_are_read_again(self):
+        spool = MessageSpool(self.directory)
+        spool.append(RawMessage("message"))
+
+        messages, _ = spool.read(10)
+        self.assertEqual(len(messages), 1)
+
+        messages, _ = spool.read(10)
+        self.assertEqual(len(messages), 1)
+
+        spool.close()
+
+    def test_resume_after_restart(self):
+        spool = MessageSpool(self.directory)
+        for i in range(3):
+            spool.append(RawMessage("message {}".format(i)))
+
+        messages, position = spool.read(1)
+        spool.commit(position)
+        spool.close()
+
+        spool = MessageSpool(self.directory)
+        spool.append(RawMessage("message 3"))
+
+        messages, position = spool.read(10)
+        self.assertEqual(
+            [message.body for message in messages],
+            [b"message 1", b"message 2"]
+        )
+        spool.commit(position)
+
+        messages, position = spool.read(10)
+        self.assertEqual(
+            [message.body for message in messages],
+            [b"message 3"]
+        )
+        spool.commit(position)
+
+        self.assertTrue(spool.is_empty())
+        self.assertEqual(
+            len([
+                filename
+                for filename in os.listdir(self.directory)
+                if filename.endswith(".spool")
+            ]),
+            1
+        )
+
+        spool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 from unittest import main
 from unittest.mock import patch, Mock
 
-from hnac.web.authentication import load_user, authentication_callback
-from hnac.models import User
+from hnac.web.authentication import (
+    load_user, authentication_callback, token_cache, TokenCache
+)
+from hnac.web.database import db
+from hnac.models import User, Token, TokenRevision
 
 from common import WebTestCaseWithUserAccount, ModelTestCaseWithMockData
 
@@ -38,5 +41,123 @@ class AuthenticationCallbackTests(ModelTestCaseWithMockData):
             self.assertEqual(token.value, self.test_token)
 
 
+class TokenCacheTests(ModelTestCaseWithMockData):
+    def test_cache_token(self):
+        with self.app.app_context():
+            authentication_callback(self.test_token)
+
+            with patch.object(Token, "get_by_value") as get_by_value_mock:
+                token = authentication_callback(self.test_token)
+
+            get_by_value_mock.assert_not_called()
+            self.assertEqual(token.id, self.test_token_id)
+            self.assertEqual(token.value, self.test_token)
+            self.assertTrue(token.is_active())
+
+    def test_cache_unknown_token(self):
+        with self.app.app_context():
+            self.assertIsNone(authentication_callback("unknown"))
+
+            with patch.object(Token, "get_by_value") as get_by_value_mock:
+                self.assertIsNone(authentication_callback("unknown"))
+
+            get_by_value_mock.assert_not_called()
+
+    def test_invalidate_deactivated_token(self):
+        with self.app.app_context():
+            authentication_callback(self.test_token)
+
+            token = Token.get_by_value(db.session, self.test_token)
+            token.active = False
+            db.session.commit()
+
+            token = authentication_callback(self.test_token)
+            self.assertFalse(token.is_active())
+
+    def test_invalidate_deleted_token(self):
+        with self.app.app_context():
+            authentication_callback(self.test_token)
+
+            token = Token.get_by_value(db.session, self.test_token)
+            token.delete(db.session)
+            db.session.commit()
+
+            self.assertIsNone(authentication_callback(self.test_token))
+
+    def test_invalidate_created_token(self):
+        with self.app.app_context():
+            self.assertIsNone(authentication_callback("new_token_value"))
+
+            token = Token.create(db.session, "new_token")
+            token.value = "new_token_value"
+            db.session.commit()
+
+            self.assertIsNotNone(authentication_callback("new_token_value"))
+
+    def test_disable_cache(self):
+        self.app.config["API_TOKEN_CACHE_TTL"] = 0
+        token_cache.init_app(self.app)
+
+        with self.app.app_context():
+            authentication_callback(self.test_token)
+
+            with patch.object(
+                    Token, "get_by_value",
+                    wraps=Token.get_by_value) as get_by_value_mock:
+                token = authentication_callback(self.test_token)
+
+            get_by_value_mock.assert_called_once()
+            self.assertIsInstance(token, Token)
+
+    def test_keep_cached_token_until_commit(self):
+        with self.app.app_context():
+            authentication_callback(self.test_token)
+
+            token = Token.get_by_value(db.session, self.test_token)
+            token.active = False
+            db.session.flush()
+
+            with patch.object(Token, "get_by_value") as get_by_value_mock:
+                token = authentication_callback(self.test_token)
+
+            get_by_value_mock.assert_not_called()
+            self.assertTrue(token.is_active())
+
+            db.session.rollback()
+
+    def test_increment_revision_when_token_is_modified(self):
+        with self.app.app_context():
+            revision = TokenRevision.get(db.session)
+
+            token = Token.get_by_value(db.session, self.test_token)
+            token.active = False
+            db.session.commit()
+
+            self.assertEqual(TokenRevision.get(db.session), revision + 1)
+
+    def test_detect_tokens_modified_by_other_processes(self):
+        self.time = 0.0
+        self.app.config["API_TOKEN_CACHE_REVISION_CHECK_INTERVAL"] = 2.0
+
+        cache = TokenCache(clock=lambda: self.time)
+        cache.init_app(self.app)
+
+        with self.app.app_context():
+            self.assertTrue(
+                cache.get_by_value(db.session, self.test_token).is_active())
+
+            # the mapper events aren't triggered by the core statements
+            db.session.execute(Token.__table__.update().values(active=False))
+            TokenRevision.increment(db.session.connection())
+            db.session.commit()
+
+            self.assertTrue(
+                cache.get_by_value(db.session, self.test_token).is_active())
+
+            self.time = 2.0
+            self.assertFalse(
+                cache.get_by_value(db.session, self.test_token).is_active())
+
+
 if __name__ == "__main__":
     main()
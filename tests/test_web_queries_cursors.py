@@ -0,0 +1,43 @@
+from unittest import TestCase, main
+
+from hnac.exceptions import InvalidCursor
+from hnac.web.queries.cursors import decode_cursor, encode_cursor
+
+
+class CursorTests(TestCase):
+    def test_decode_encoded_cursor(self):
+        cursor = encode_cursor("time", True, 1529613984, 12)
+
+        self.assertEqual(decode_cursor(cursor, "time", True), (1529613984, 12))
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor("score", False, 2 ** 40, 2 ** 40)
+
+        self.assertNotIn("+", cursor)
+        self.assertNotIn("/", cursor)
+        self.assertNotIn("=", cursor)
+
+    def test_fail_to_decode_cursor_with_different_ordering(self):
+        cursor = encode_cursor("time", True, 1529613984, 12)
+
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(cursor, "score", True)
+
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(cursor, "time", False)
+
+    def test_fail_to_decode_cursor_with_invalid_keys(self):
+        for value, id in [("x", 1), (1, "1"), (True, 1), (1, None)]:
+            cursor = encode_cursor("time", False, value, id)
+
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, "time", False)
+
+    def test_fail_to_decode_invalid_cursor(self):
+        for cursor in ["not a cursor", "bm90IGpzb24", "WzEsMl0"]:
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, "time", True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 from argparse import ArgumentParser
-import json
 
 from pika import BlockingConnection, URLParameters
 
+from hnac.compression import decompress
+from hnac.serializers import get_content_type_serializer
+
 
 def get_arguments():
     parser = ArgumentParser()
@@ -20,10 +22,19 @@ def get_arguments():
 
 
 def on_message(channel, method_frame, header_frame, body):
-    story_message = json.loads(body.decode("utf-8"))
-    for field in ["title", "url", "by"]:
-        print("{}: {}".format(field, story_message["data"][field]))
-    print()
+    serializer = get_content_type_serializer(header_frame.content_type)
+    story_message = serializer.loads(
+        decompress(body, header_frame.content_encoding))
+
+    if story_message["type"] == "story_batch":
+        stories = story_message["data"]
+    else:
+        stories = [story_message["data"]]
+
+    for story in stories:
+        for field in ["title", "url", "by"]:
+            print("{}: {}".format(field, story[field]))
+        print()
     channel.basic_ack(delivery_tag=method_frame.delivery_tag)
 
 